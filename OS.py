@@ -1,18 +1,27 @@
 import customtkinter as ctk
+import numpy as np
 import psutil
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from threading import Thread
+import base64
+import queue
 import time
+from collections import deque
 from datetime import datetime
-from tkinter import ttk
-from PIL import Image, ImageTk
-import numpy as np
-from matplotlib.animation import FuncAnimation
-import matplotlib.dates as mdates
+import tkinter as tk
+from tkinter import ttk, filedialog
 import os
 import platform
-import ctypes
+import weakref
+from collector import MetricsCollector, HISTORY_COLUMNS, history_values, network_column
+from history import open_history, TieredHistory
+from exporter import MetricsExporter
+from alerts import AlertEngine, Rule
+
+def format_rate(bytes_per_second):
+    for unit in ("B/s", "KB/s", "MB/s"):
+        if bytes_per_second < 1024:
+            return f"{bytes_per_second:.1f} {unit}"
+        bytes_per_second /= 1024
+    return f"{bytes_per_second:.1f} GB/s"
 
 # Add ThemeManager class to handle theme switching
 class ThemeManager:
@@ -28,6 +37,8 @@ class ThemeManager:
             "success": "#66BB6A",
             "warning": "#FFA726",
             "error": "#F44336",
+            "gauge_used": "#FF6347",
+            "gauge_free": "#32CD32",
             "gradient": ["#000", "#000"]  # Gradient colors
         }
 
@@ -42,18 +53,50 @@ class ThemeManager:
             "success": "#388E3C",
             "warning": "#F57C00",
             "error": "#C62828",
+            "gauge_used": "#E53935",
+            "gauge_free": "#43A047",
             "gradient": ["#fff", "#fff"]
         }
 
         self.current_theme = self.dark_theme
         self.is_dark = True
 
+        # Everything restyled on a theme switch. Held weakly, so a destroyed widget
+        # simply drops out instead of being kept alive by the registry.
+        self._widgets = []
+        self._callbacks = []
+
+    def register(self, widget, **options):
+        """Restyle ``widget`` on every theme switch, e.g. register(label, text_color="text")"""
+        self._widgets.append((weakref.ref(widget), options))
+        return widget
+
+    def register_callback(self, callback):
+        """Call ``callback(colors)`` on every theme switch, for widgets that restyle themselves"""
+        ref = weakref.WeakMethod(callback) if hasattr(callback, "__self__") else (lambda: callback)
+        self._callbacks.append(ref)
+
     def toggle_theme(self):
         self.is_dark = not self.is_dark
         self.current_theme = self.dark_theme if self.is_dark else self.light_theme
         return self.current_theme
+
+    def apply(self):
+        """Restyle everything registered with the current theme in one pass"""
+        colors = self.current_theme
+        self._widgets = [(ref, options) for ref, options in self._widgets if ref() is not None]
+        for ref, options in self._widgets:
+            ref().configure(**{option: colors[key] for option, key in options.items()})
+        self._callbacks = [ref for ref in self._callbacks if ref() is not None]
+        for ref in self._callbacks:
+            ref()(colors)
 # Define a MetricBox class to show Fsystindividual metrics
 class MetricBox(ctk.CTkFrame):
+    GRADIENT_HEIGHT = 4
+    # Gradient strips shared by every box, keyed by (width, start colour, end colour)
+    _gradients = {}
+    GRADIENT_CACHE_SIZE = 32
+
     def __init__(self, master, title, **kwargs):
         super().__init__(master, **kwargs)
         
@@ -67,33 +110,16 @@ class MetricBox(ctk.CTkFrame):
             border_color=colors["border"]
         )
         
-        # Create gradient effect
-        gradient_canvas = ctk.CTkCanvas(
+        # Gradient strip: a single image item, swapped for a cached image on resize
+        self.gradient_canvas = ctk.CTkCanvas(
             self,
-            height=4,
+            height=self.GRADIENT_HEIGHT,
             width=self.winfo_width(),
             highlightthickness=0
         )
-        gradient_canvas.pack(fill="x", side="top")
-        
-        # Create gradient effect
-        def create_gradient():
-            width = gradient_canvas.winfo_width()
-            height = 4
-            gradient_canvas.delete("gradient")
-            
-            # Create gradient colors
-            for i in range(width):
-                x = i / width
-                r1, g1, b1 = tuple(int(colors["gradient"][0].lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-                r2, g2, b2 = tuple(int(colors["gradient"][1].lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-                r = int(r1 + (r2-r1) * x)
-                g = int(g1 + (g2-g1) * x)
-                b = int(b1 + (b2-b1) * x)
-                color = f'#{r:02x}{g:02x}{b:02x}'
-                gradient_canvas.create_line(i, 0, i, height, fill=color, tags="gradient")
-        
-        gradient_canvas.bind('<Configure>', lambda e: create_gradient())
+        self.gradient_canvas.pack(fill="x", side="top")
+        self.gradient_item = self.gradient_canvas.create_image(0, 0, anchor="nw")
+        self.gradient_canvas.bind('<Configure>', lambda e: self.draw_gradient(e.width))
         
         # Icon mapping for different metrics
         icons = {
@@ -136,99 +162,166 @@ class MetricBox(ctk.CTkFrame):
         )
         self.value_label.pack()
 
-# Define a GraphFrame class for plotting graphs
-class GraphFrame(ctk.CTkFrame):
-    def __init__(self, master, title, ylabel, **kwargs):
+        # Alert state: None, or a theme colour key ("success", "warning", "error")
+        self.state = None
+        main_window.theme_manager.register_callback(self.apply_theme)
+
+    def apply_theme(self, colors):
+        self.configure(fg_color=colors["surface"])
+        self.title_label.configure(text_color=colors["accent"])
+        self.style_state(colors)
+        self.draw_gradient()
+
+    def set_state(self, state):
+        """Colour the box for an alert state; the widgets are only touched on a change"""
+        if state == self.state:
+            return
+        self.state = state
+        self.style_state(self.winfo_toplevel().colors)
+
+    def style_state(self, colors):
+        # Healthy boxes get a coloured border; firing ones also colour their value
+        self.configure(border_color=colors[self.state] if self.state else colors["border"])
+        alerting = self.state in ("warning", "error")
+        self.value_label.configure(text_color=colors[self.state] if alerting else colors["text"])
+
+    def draw_gradient(self, width=None):
+        """Show the theme's gradient at ``width`` pixels (default: the current width)"""
+        if width is None:
+            width = self.gradient_canvas.winfo_width()
+        if width <= 1:
+            return
+        start, end = self.winfo_toplevel().colors["gradient"]
+        # Keep a reference: Tk drops an image once Python's last reference is gone,
+        # and the shared cache may evict it
+        self.gradient = self.gradient_image(width, start, end)
+        self.gradient_canvas.itemconfigure(self.gradient_item, image=self.gradient)
+
+    def gradient_image(self, width, start, end):
+        key = (width, start, end)
+        image = self._gradients.get(key)
+        if image is None:
+            # winfo_rgb understands every Tk colour form ("#000", "#ffffff", "white") in 16-bit channels
+            first = np.array(self.winfo_rgb(start)) / 257
+            last = np.array(self.winfo_rgb(end)) / 257
+            row = (first + np.linspace(0.0, 1.0, width)[:, None] * (last - first)).round().astype(np.uint8)
+            pixels = np.broadcast_to(row, (self.GRADIENT_HEIGHT, width, 3)).tobytes()
+            ppm = f"P6 {width} {self.GRADIENT_HEIGHT} 255\n".encode() + pixels
+            image = tk.PhotoImage(master=self, data=base64.b64encode(ppm), format="PPM")
+            if len(self._gradients) >= self.GRADIENT_CACHE_SIZE:
+                # Drop the oldest strip; widths seen mid-resize are rarely needed again
+                del self._gradients[next(iter(self._gradients))]
+            self._gradients[key] = image
+        return image
+
+# Ring gauge on a plain Tk canvas: one arc item and one text item, updated in place
+class GaugeFrame(ctk.CTkFrame):
+    SIZE = 200
+    THICKNESS = 20
+
+    def __init__(self, master, title, caption="Used", **kwargs):
         super().__init__(master, **kwargs)
-        
+
         main_window = self.winfo_toplevel()
         colors = main_window.colors
-        
+
         self.configure(
             fg_color=colors["surface"],
             corner_radius=15,
             border_width=1,
             border_color=colors["border"]
         )
-        
-        # Modern header with gradient
-        header = ctk.CTkFrame(self, fg_color="transparent", height=40)
-        header.pack(fill="x", padx=15, pady=(15,5))
-        
-        title_label = ctk.CTkLabel(
-            header,
-            text=title,
-            font=ctk.CTkFont(size=16, weight="bold"),
-            text_color=colors["accent"]
-        )
-        title_label.pack(side="left")
-        
-        # Enhanced zoom controls
-        zoom_frame = ctk.CTkFrame(header, fg_color="transparent")
-        zoom_frame.pack(side="right")
-        
-        ranges = ["1m", "5m", "15m", "1h"]
-        self.time_buttons = {}
-        for r in ranges:
-            btn = ctk.CTkButton(
-                zoom_frame,
-                text=r,
-                width=45,
-                height=28,
-                corner_radius=8,
-                fg_color=colors["surface"],
-                hover_color=colors["accent"],
-                text_color=colors["text"],
-                font=ctk.CTkFont(size=12, weight="bold"),
-                border_width=1,
-                border_color=colors["border"]
-            )
-            btn.pack(side="left", padx=2)
-            self.time_buttons[r] = btn
-        
-        # Enhanced graph styling
-        plt.style.use('dark_background')
-        self.fig, self.ax = plt.subplots(figsize=(8, 4), dpi=100)
-        self.canvas = FigureCanvasTkAgg(self.fig, self)
-        self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=15, pady=15)
-        
-        # Modern graph styling
-        self.ax.set_facecolor(colors["surface"])
-        self.fig.patch.set_facecolor(colors["surface"])
-        
-        # Add grid with custom styling
-        self.ax.grid(True, linestyle='--', alpha=0.2, color=colors["border"])
-        self.ax.tick_params(colors=colors["text"], labelsize=9)
-        
-        # Custom spine colors
-        for spine in self.ax.spines.values():
-            spine.set_color(colors["border"])
-            spine.set_linewidth(0.5)
-
-# Define a PieChartFrame for Pie Chart visualization
-class PieChartFrame(ctk.CTkFrame):
-    def __init__(self, master, title, **kwargs):
-        super().__init__(master, **kwargs)
+
         self.title_label = ctk.CTkLabel(
-            self, 
+            self,
             text=title,
-            font=ctk.CTkFont(size=14, weight="bold")
+            font=ctk.CTkFont(size=14, weight="bold"),
+            text_color=colors["accent"]
         )
         self.title_label.pack(pady=10)
-        
-        self.fig, self.ax = plt.subplots(figsize=(4, 4))
-        self.canvas = FigureCanvasTkAgg(self.fig, self)
-        self.canvas.get_tk_widget().pack(fill="both", expand=True)
-        self.ax.axis('equal')  # Equal aspect ratio ensures the pie is drawn as a circle.
 
-    def update_chart(self, labels, sizes, colors):
-        self.ax.clear()
-        self.ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-        self.ax.set_title("Usage Distribution")
-        self.canvas.draw()
+        self.canvas = ctk.CTkCanvas(
+            self,
+            width=self.SIZE,
+            height=self.SIZE,
+            bg=colors["surface"],
+            highlightthickness=0
+        )
+        self.canvas.pack(padx=15, pady=(0, 15))
+
+        # The free share is a full ring; the used share is an arc drawn over it
+        inset = self.THICKNESS / 2 + 2
+        bounds = (inset, inset, self.SIZE - inset, self.SIZE - inset)
+        self.track = self.canvas.create_oval(*bounds, outline=colors["gauge_free"], width=self.THICKNESS)
+        self.arc = self.canvas.create_arc(
+            *bounds, start=90, extent=0, style="arc", outline=colors["gauge_used"], width=self.THICKNESS
+        )
+        center = self.SIZE / 2
+        self.value_text = self.canvas.create_text(
+            center, center - 8, text="--", fill=colors["text"], font=("Helvetica", 22, "bold")
+        )
+        self.caption_text = self.canvas.create_text(
+            center, center + 20, text=caption, fill=colors["text"], font=("Helvetica", 11)
+        )
+        self.value = None
+
+        main_window.theme_manager.register_callback(self.apply_theme)
+
+    def apply_theme(self, colors):
+        self.configure(fg_color=colors["surface"], border_color=colors["border"])
+        self.title_label.configure(text_color=colors["accent"])
+        self.canvas.configure(bg=colors["surface"])
+        self.canvas.itemconfigure(self.track, outline=colors["gauge_free"])
+        self.canvas.itemconfigure(self.arc, outline=colors["gauge_used"])
+        self.canvas.itemconfigure(self.value_text, fill=colors["text"])
+        self.canvas.itemconfigure(self.caption_text, fill=colors["text"])
+
+    def set_value(self, percent):
+        """Show ``percent`` used; the canvas is only touched when the shown value changes"""
+        percent = round(min(100.0, max(0.0, percent)), 1)
+        if percent == self.value:
+            return
+        self.value = percent
+        # Clockwise from twelve o'clock
+        self.canvas.itemconfigure(self.arc, extent=-3.6 * percent)
+        self.canvas.itemconfigure(self.value_text, text=f"{percent:.1f}%")
 
 # Main SystemMonitor application class
 class SystemMonitor(ctk.CTk):
+    # How often the Tk thread checks the collector queue for new samples
+    POLL_INTERVAL_MS = 100
+    # How much journaled history is reloaded on startup
+    RESTORE_HOURS = 24
+    # Port for the OpenMetrics /metrics endpoint, None to disable it
+    EXPORTER_PORT = None
+    # Seconds between samples, and slower rates for the costlier metric groups
+    SAMPLE_INTERVAL = 1.0
+    SAMPLE_RATES = {"disk_usage": 5.0, "cpu_freq": 5.0}
+    # Threshold alerts on history columns, and the metric boxes each column colours
+    ALERT_RULES = (
+        Rule("CPU above 90% for 30s", "cpu", ">", 90, duration=30, hysteresis=5, cooldown=300),
+        Rule("Memory above 95% for 10s", "memory", ">", 95, duration=10, hysteresis=3, cooldown=300,
+             severity="error"),
+        Rule("Disk above 90%", "disk", ">", 90, hysteresis=1, cooldown=3600),
+        Rule("Swapping in over 100 pages/s for 10s", "swap_in_rate", ">", 100, duration=10, hysteresis=50,
+             cooldown=300),
+        Rule("Memory pressure above 10% for 10s", "memory_pressure", ">", 10, duration=10, hysteresis=5,
+             cooldown=300, severity="error"),
+    )
+    # Port the fleet aggregator takes agents on, None to disable fleet mode. Listen on
+    # "0.0.0.0" to accept agents from other machines.
+    FLEET_PORT = None
+    FLEET_HOST = "127.0.0.1"
+    # Time ranges offered by the history export dialog, in seconds (None for everything kept)
+    EXPORT_RANGES = {"Last hour": 3600, "Last 24 hours": 86400, "Last 7 days": 7 * 86400, "Everything": None}
+    ALERT_BOXES = {
+        "cpu": (("overview_boxes", "CPU"), ("cpu_boxes", "CPU Usage")),
+        "memory": (("overview_boxes", "Memory"), ("mem_boxes", "Memory Percentage")),
+        "disk": (("overview_boxes", "Disk"), ("disk_boxes", "Disk Usage Percentage")),
+        "swap_in_rate": (("vm_boxes", "Swap In"),),
+        "memory_pressure": (("vm_boxes", "Memory Pressure"),)
+    }
+
     def __init__(self):
         super().__init__()
         
@@ -240,9 +333,35 @@ class SystemMonitor(ctk.CTk):
         self.colors = self.theme_manager.current_theme
         
         self.configure(fg_color=self.colors["bg"])
+        self.theme_manager.register(self, fg_color="bg")
+        # Tables share one ttk style, restyled with the rest of the theme
+        self.style_tables(self.colors)
+        self.theme_manager.register_callback(self.style_tables)
         
         # Initialize dictionaries for storing widgets
         self.overview_boxes = {}
+
+        # Rules are evaluated on the Tk thread as samples are recorded, off the sampling tick
+        self.local_alerts = self.alerts = AlertEngine(self.ALERT_RULES)
+
+        # Optional fleet aggregator; its hosts can then be picked in the sidebar
+        self.aggregator = None
+        if self.FLEET_PORT is not None:
+            # asyncio and the wire codec are only loaded when fleet mode is on
+            from fleet import FleetAggregator
+            self.aggregator = FleetAggregator(self.FLEET_HOST, self.FLEET_PORT)
+            try:
+                self.aggregator.start()
+            except OSError as e:
+                print(f"Fleet aggregator unavailable: {e}")
+                self.aggregator = None
+        # Fleet host on screen (None for this machine), and the queue of its new samples
+        self.host = None
+        self.host_queue = None
+        self.fleet_version = None
+        self.local_sample = None
+        # History export running in the background, if any
+        self.export_job = None
         
         # Configure gselrid
         self.grid_columnconfigure(1, weight=1)
@@ -253,21 +372,33 @@ class SystemMonitor(ctk.CTk):
         self.create_main_area()
         self.create_status_bar()
         
-        # Initialize data storage
-        self.history = {
-            'time': [],
-            'cpu': [],
-            'memory': [],
-            'virtual': [],
-            'disk': [],
-            'network_sent': [],
-            'network_recv': [],
-        }
-        
-        # Start monitoring thread
+        # Start the sampling engine; the UI drains its queue on the Tk thread
         self.running = True
-        self.monitor_thread = Thread(target=self.update_metrics, daemon=True)
-        self.monitor_thread.start()
+        self.collector = MetricsCollector(interval=self.SAMPLE_INTERVAL, sample_rates=self.SAMPLE_RATES)
+
+        # Initialize data storage: one hour of 1 Hz samples plus min/max/mean rollups
+        self.local_history = self.history = open_history(
+            HISTORY_COLUMNS,
+            capacity=3600,
+            resolution=self.collector.interval
+        )
+        self.journal = self.history.journal
+        # Bring back what was recorded before the last shutdown
+        self.history.restore(self.RESTORE_HOURS * 3600)
+        self.alerts.prime(self.history.raw)
+
+        # Optional OpenMetrics endpoint, refreshed on the collector thread
+        self.exporter = None
+        if self.EXPORTER_PORT is not None:
+            self.exporter = MetricsExporter(port=self.EXPORTER_PORT)
+            self.collector.listeners.append(self.exporter.update)
+            try:
+                self.exporter.start()
+            except OSError as e:
+                print(f"Metrics endpoint unavailable: {e}")
+
+        self.collector.start()
+        self.after(self.POLL_INTERVAL_MS, self.poll_samples)
 
     def create_sidebar(self):
         # Create sidebar frame
@@ -278,6 +409,8 @@ class SystemMonitor(ctk.CTk):
             corner_radius=0
         )
         self.sidebar.grid(row=0, column=0, sticky="nsew")
+        theme = self.theme_manager
+        theme.register(self.sidebar, fg_color="surface")
 
         # Logo header
         header_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
@@ -290,6 +423,7 @@ class SystemMonitor(ctk.CTk):
             text_color=self.colors["accent"]
         )
         logo_label.pack()
+        theme.register(logo_label, text_color="accent")
 
         # Theme switch toggle
         theme_switch = ctk.CTkSwitch(
@@ -302,8 +436,20 @@ class SystemMonitor(ctk.CTk):
             text_color=self.colors["text"]
         )
         theme_switch.pack(pady=10)
+        theme.register(
+            theme_switch,
+            progress_color="accent",
+            button_color="accent",
+            button_hover_color="accent",
+            text_color="text"
+        )
         theme_switch.select() if self.theme_manager.is_dark else theme_switch.deselect()
 
+        # Host picker for fleet mode
+        if self.aggregator is not None:
+            self.host_menu = ctk.CTkOptionMenu(header_frame, values=["Local"], command=self.select_host)
+            self.host_menu.pack(pady=(0, 10))
+
         # Separator line
         separator = ctk.CTkFrame(
             self.sidebar,
@@ -311,6 +457,7 @@ class SystemMonitor(ctk.CTk):
             fg_color=self.colors["accent"]
         )
         separator.grid(row=1, column=0, sticky="ew", padx=20, pady=10)
+        theme.register(separator, fg_color="accent")
 
         # Navigation buttons with icons and hover effects
         sections = {
@@ -319,8 +466,12 @@ class SystemMonitor(ctk.CTk):
             "Memory": "💾",
             "Virtual Memory": "📊",
             "Disk": "💿",
-            "Network": "🛜"
+            "Network": "🛜",
+            "Processes": "📋",
+            "Alerts": "🔔"
         }
+        if self.aggregator is not None:
+            sections["Fleet"] = "🌐"
 
         # Navigation frame container
         nav_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
@@ -342,6 +493,7 @@ class SystemMonitor(ctk.CTk):
                 border_color=self.colors["border"]
             )
             btn.pack(fill="x", pady=5)
+            theme.register(btn, hover_color="accent", text_color="text", border_color="border")
 
         # Footer Section
         footer_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
@@ -359,6 +511,19 @@ class SystemMonitor(ctk.CTk):
         )
         logout_btn.pack(fill="x", pady=10)
 
+        export_btn = ctk.CTkButton(
+            footer_frame,
+            text="Export History",
+            command=self.open_export_dialog,
+            fg_color=self.colors["surface"],
+            hover_color=self.colors["accent"],
+            font=ctk.CTkFont(size=14, weight="bold"),
+            text_color=self.colors["text"]
+        )
+        export_btn.pack(fill="x", pady=(0, 10), before=logout_btn)
+        theme.register(export_btn, fg_color="surface", hover_color="accent", text_color="text")
+        theme.register(logout_btn, fg_color="error", hover_color="error", text_color="text")
+
         # Add a little padding between sections to keep the layout clean
         self.sidebar.grid_rowconfigure(0, weight=1)  # Logo section takes space
         self.sidebar.grid_rowconfigure(2, weight=10)  # Navigation buttons take more space
@@ -392,23 +557,42 @@ class SystemMonitor(ctk.CTk):
         
         # Create sections (overview, cpu, memory, etc.)
         self.sections = {}
-        self.create_overview_section()  # Dashboard/Overview
-        self.create_cpu_section()  # CPU section
-        self.create_memory_section()  # Memory section
-        self.create_virtual_memory_section()  # Virtual Memory section
-        self.create_disk_section()  # Disk section
-        self.create_network_section()
+        self.current_section = None
+        # Only the visible section is rendered; the others wait here until shown
+        self.latest_sample = None
+        self.stale_sections = set()
+        self.section_renderers = {
+            "Overview": self.render_overview,
+            "CPU": self.render_cpu,
+            "Memory": self.render_memory,
+            "Virtual Memory": self.render_virtual_memory,
+            "Disk": self.render_disk,
+            "Network": self.render_network,
+            "Processes": self.render_processes,
+            "Alerts": self.render_alerts,
+            "Fleet": self.render_fleet
+        }
+        # Sections are built on their first visit, so startup only pays for the one shown
+        self.section_builders = {
+            "Overview": self.create_overview_section,
+            "CPU": self.create_cpu_section,
+            "Memory": self.create_memory_section,
+            "Virtual Memory": self.create_virtual_memory_section,
+            "Disk": self.create_disk_section,
+            "Network": self.create_network_section,
+            "Processes": self.create_process_section,
+            "Alerts": self.create_alerts_section,
+            "Fleet": self.create_fleet_section
+        }
+        # Recent per-core samples, replayed into the heatmap when the CPU section is built
+        self.per_cpu_recent = deque(maxlen=120)
         
         # Bind events for scrolling
         self.main_frame.bind("<Configure>", self.on_frame_configure)
         self.canvas.bind("<Configure>", self.on_canvas_configure)
         
-        # Show the initial section (Overview by default)
-        self.show_section("Overview")
-        
-        # Configure canvas scrolling area to match content size
-        self.main_frame.update_idletasks()  # Update idletasks to ensure content size
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
+        # Show the initial section (Overview by default) once the window is up
+        self.after_idle(self.show_section, "Overview")
 
     def on_frame_configure(self, event=None):
         """Reset the scroll region to encompass the inner frame"""
@@ -421,6 +605,7 @@ class SystemMonitor(ctk.CTk):
             self.canvas.itemconfig(self.canvas_window, width=event.width)
 
     def create_virtual_memory_section(self):
+        from charts import GraphFrame
         section = ctk.CTkFrame(self.main_frame)
         section.grid_columnconfigure((0, 1, 2), weight=1)
         
@@ -434,7 +619,11 @@ class SystemMonitor(ctk.CTk):
             "Commit Charge",
             "Commit Limit",
             "Peak Commit",
-            "Page Faults"
+            "Page Faults",
+            "Major Faults",
+            "Swap In",
+            "Swap Out",
+            "Memory Pressure"
         ]
         
         for i, metric in enumerate(metrics):
@@ -442,23 +631,25 @@ class SystemMonitor(ctk.CTk):
             box.grid(row=i//3, column=i%3, padx=10, pady=10, sticky="ew")
             self.vm_boxes[metric] = box
         
-        # Create a frame to split the pie chart and graph
+        # Create a frame to split the gauge and graph
         vm_graph_frame = ctk.CTkFrame(section)
         vm_graph_frame.grid(row=4, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
-        vm_graph_frame.grid_columnconfigure(0, weight=1)  # Left column (pie chart)
+        vm_graph_frame.grid_columnconfigure(0, weight=1)  # Left column (gauge)
         vm_graph_frame.grid_columnconfigure(1, weight=1)  # Right column (line graph)
         
-        # Virtual memory pie chart (left side)
-        self.vm_pie = PieChartFrame(vm_graph_frame, "Virtual Memory Usage")
-        self.vm_pie.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        # Virtual memory gauge (left side)
+        self.vm_gauge = GaugeFrame(vm_graph_frame, "Virtual Memory Usage")
+        self.vm_gauge.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
         
         # Virtual memory line graph (right side)
-        self.vm_graph = GraphFrame(vm_graph_frame, "Virtual Memory Usage", "Percentage (%)")
+        self.vm_graph = GraphFrame(vm_graph_frame, "Virtual Memory Usage", "Memory Usage (%)", ylim=(0, 100))
+        self.vm_graph.add_line('virtual', "Virtual Memory Usage", "yellowgreen")
         self.vm_graph.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
         
         self.sections["Virtual Memory"] = section
 
     def create_cpu_section(self):
+        from charts import GraphFrame, HeatmapFrame
         section = ctk.CTkFrame(self.main_frame)
         section.grid_columnconfigure((0, 1, 2), weight=1)
         
@@ -468,7 +659,11 @@ class SystemMonitor(ctk.CTk):
             "CPU Usage",
             "CPU Frequency",
             "Core Count",
-            "Thread Count"
+            "Thread Count",
+            "User Time",
+            "System Time",
+            "Idle Time",
+            "I/O Wait"
         ]
         
         for i, metric in enumerate(metrics):
@@ -476,23 +671,32 @@ class SystemMonitor(ctk.CTk):
             box.grid(row=i//3, column=i%3, padx=10, pady=10, sticky="ew")
             self.cpu_boxes[metric] = box
             
-        # Create a frame to split the pie chart and graph
+        # Create a frame to split the gauge and graph
         cpu_graph_frame = ctk.CTkFrame(section)
         cpu_graph_frame.grid(row=4, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
-        cpu_graph_frame.grid_columnconfigure(0, weight=1)  # Left column (pie chart)
+        cpu_graph_frame.grid_columnconfigure(0, weight=1)  # Left column (gauge)
         cpu_graph_frame.grid_columnconfigure(1, weight=1)  # Right column (line graph)
         
-        # CPU usage pie chart (left side)
-        self.cpu_pie = PieChartFrame(cpu_graph_frame, "CPU Usage")
-        self.cpu_pie.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        # CPU usage gauge (left side)
+        self.cpu_gauge = GaugeFrame(cpu_graph_frame, "CPU Usage")
+        self.cpu_gauge.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
         
         # CPU usage line graph (right side)
-        self.cpu_graph = GraphFrame(cpu_graph_frame, "CPU Usage", "Percentage (%)")
+        self.cpu_graph = GraphFrame(cpu_graph_frame, "CPU Usage", "CPU Usage (%)", ylim=(0, 100))
+        self.cpu_graph.add_line('cpu', "CPU Usage", "tomato")
         self.cpu_graph.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
+
+        # Per-core heatmap, so hot cores are not hidden behind the aggregate
+        cores = len(self.per_cpu_recent[-1]) if self.per_cpu_recent else psutil.cpu_count()
+        self.cpu_heatmap = HeatmapFrame(section, "Per-Core Usage", cores)
+        self.cpu_heatmap.grid(row=5, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
+        for per_cpu in self.per_cpu_recent:
+            self.cpu_heatmap.push(per_cpu)
         
         self.sections["CPU"] = section
 
     def create_network_section(self):
+        from charts import GraphFrame
         # Create the Network section frame
         section = ctk.CTkFrame(self.main_frame)
         section.grid_columnconfigure((0, 1), weight=1)  # Configure columns to be flexible
@@ -501,7 +705,9 @@ class SystemMonitor(ctk.CTk):
         self.net_boxes = {}
         metrics = [
             "Bytes Sent",
-            "Bytes Received"
+            "Bytes Received",
+            "Upload Rate",
+            "Download Rate"
         ]
         
         for i, metric in enumerate(metrics):
@@ -509,20 +715,143 @@ class SystemMonitor(ctk.CTk):
             box.grid(row=i//2, column=i%2, padx=10, pady=10, sticky="ew")
             self.net_boxes[metric] = box
         
-        # Create a frame to split the pie chart and graph
+        # Create a frame to split the gauge and graph
         net_graph_frame = ctk.CTkFrame(section)
-        net_graph_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
-        net_graph_frame.grid_columnconfigure(0, weight=1)  # Left column (pie chart)
+        net_graph_frame.grid(row=3, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
+        net_graph_frame.grid_columnconfigure(0, weight=1)  # Left column (gauge)
         net_graph_frame.grid_columnconfigure(1, weight=1)  # Right column (line graph)
         
-        # Network usage line graph (right side)
-        self.net_graph = GraphFrame(net_graph_frame, "Network Usage", "MB")
+        # Interface picker and per-interface details (left side)
+        nic_frame = ctk.CTkFrame(net_graph_frame, fg_color=self.colors["surface"])
+        nic_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        self.theme_manager.register(nic_frame, fg_color="surface")
+
+        self.net_interface = "All"
+        self.net_interface_menu = ctk.CTkOptionMenu(
+            nic_frame,
+            values=["All"],
+            command=self.set_network_interface
+        )
+        self.net_interface_menu.pack(padx=15, pady=15, fill="x")
+
+        self.nic_labels = {}
+        for field in ("Packets Sent", "Packets Received", "Errors", "Drops"):
+            label = ctk.CTkLabel(
+                nic_frame,
+                text=f"{field}: --",
+                font=ctk.CTkFont(size=14),
+                text_color=self.colors["text"]
+            )
+            label.pack(padx=15, pady=5, anchor="w")
+            self.theme_manager.register(label, text_color="text")
+            self.nic_labels[field] = label
+
+        # Network throughput line graph (right side)
+        self.net_graph = GraphFrame(net_graph_frame, "Network Throughput", "Bytes/s")
+        self.net_graph.add_line('net_sent_rate', "Sent", "orange")
+        self.net_graph.add_line('net_recv_rate', "Received", "blue")
         self.net_graph.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
         
         self.sections["Network"] = section
 
 
+    def set_network_interface(self, nic):
+        self.net_interface = nic
+        if nic == "All":
+            self.net_graph.rebind_lines(['net_sent_rate', 'net_recv_rate'])
+        else:
+            self.net_graph.rebind_lines([network_column(nic, 'bytes_sent'), network_column(nic, 'bytes_recv')])
+        self.stale_sections.add("Network")
+        self.render_section("Network")
+
+    def style_tables(self, colors):
+        ttk.Style(self).configure(
+            "Monitor.Treeview",
+            background=colors["surface"],
+            fieldbackground=colors["surface"],
+            foreground=colors["text"],
+            rowheight=26
+        )
+
+    def create_table(self, parent, headings, height, wide_columns=()):
+        tree = ttk.Treeview(
+            parent,
+            columns=headings,
+            show="headings",
+            height=height,
+            style="Monitor.Treeview"
+        )
+        for heading in headings:
+            tree.heading(heading, text=heading)
+            tree.column(heading, width=220 if heading in wide_columns else 100, anchor="w")
+        return tree
+
+    def update_table(self, tree, rows):
+        # Rows are keyed by position and edited in place instead of rebuilt every tick
+        for index, values in enumerate(rows):
+            iid = str(index)
+            if tree.exists(iid):
+                tree.item(iid, values=values)
+            else:
+                tree.insert("", "end", iid=iid, values=values)
+        for iid in tree.get_children()[len(rows):]:
+            tree.delete(iid)
+
+    def create_process_section(self):
+        section = ctk.CTkFrame(self.main_frame)
+        section.grid_columnconfigure(0, weight=1)
+
+        # Sort selector: which top-N list the table shows
+        self.process_sort = "cpu"
+        sort_buttons = ctk.CTkSegmentedButton(
+            section,
+            values=["CPU", "Memory", "I/O"],
+            command=self.set_process_sort,
+            font=ctk.CTkFont(size=14, weight="bold")
+        )
+        sort_buttons.set("CPU")
+        sort_buttons.grid(row=0, column=0, padx=10, pady=10, sticky="w")
+
+        self.process_tree = self.create_table(
+            section,
+            ("PID", "Name", "User", "CPU %", "Memory", "I/O"),
+            height=15,
+            wide_columns=("Name",)
+        )
+        self.process_tree.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
+
+        self.sections["Processes"] = section
+
+    def create_alerts_section(self):
+        section = ctk.CTkFrame(self.main_frame)
+        section.grid_columnconfigure(0, weight=1)
+
+        self.alert_table = self.create_table(
+            section,
+            ("Time", "Rule", "State", "Value"),
+            height=20,
+            wide_columns=("Rule",)
+        )
+        self.alert_table.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        # Newest alert in the table, so an unchanged log is not re-rendered every tick
+        self.shown_alert = None
+
+        self.sections["Alerts"] = section
+
+    def create_fleet_section(self):
+        section = ctk.CTkFrame(self.main_frame)
+        section.grid_columnconfigure((0, 1, 2, 3), weight=1)
+        # One box per host, added as hosts connect; a click shows that host
+        self.fleet_boxes = {}
+        self.sections["Fleet"] = section
+
+    def set_process_sort(self, value):
+        self.process_sort = {"CPU": "cpu", "Memory": "rss", "I/O": "io"}[value]
+        self.stale_sections.add("Processes")
+        self.render_section("Processes")
+
     def create_memory_section(self):
+        from charts import GraphFrame
         section = ctk.CTkFrame(self.main_frame)
         section.grid_columnconfigure((0, 1, 2), weight=1)
         
@@ -540,24 +869,26 @@ class SystemMonitor(ctk.CTk):
             box.grid(row=i//3, column=i%3, padx=10, pady=10, sticky="ew")
             self.mem_boxes[metric] = box
         
-        # Create a frame to split the pie chart and graph
+        # Create a frame to split the gauge and graph
         mem_graph_frame = ctk.CTkFrame(section)
         mem_graph_frame.grid(row=4, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
-        mem_graph_frame.grid_columnconfigure(0, weight=1)  # Left column (pie chart)
+        mem_graph_frame.grid_columnconfigure(0, weight=1)  # Left column (gauge)
         mem_graph_frame.grid_columnconfigure(1, weight=1)  # Right column (line graph)
         
-        # Memory usage pie chart (left side)
-        self.mem_pie = PieChartFrame(mem_graph_frame, "Memory Usage")
-        self.mem_pie.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        # Memory usage gauge (left side)
+        self.mem_gauge = GaugeFrame(mem_graph_frame, "Memory Usage")
+        self.mem_gauge.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
         
         # Memory usage line graph (right side)
-        self.mem_graph = GraphFrame(mem_graph_frame, "Memory Usage", "Percentage (%)")
+        self.mem_graph = GraphFrame(mem_graph_frame, "Memory Usage", "Memory Usage (%)", ylim=(0, 100))
+        self.mem_graph.add_line('memory', "Memory Usage", "coral")
         self.mem_graph.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
         
         self.sections["Memory"] = section
 
 
     def create_disk_section(self):
+        from charts import GraphFrame
         section = ctk.CTkFrame(self.main_frame)
         section.grid_columnconfigure((0, 1, 2), weight=1)
         
@@ -575,29 +906,54 @@ class SystemMonitor(ctk.CTk):
             box.grid(row=i//3, column=i%3, padx=10, pady=10, sticky="ew")
             self.disk_boxes[metric] = box
         
-        # Create a frame to split the pie chart and graph
+        # Create a frame to split the gauge and graph
         disk_graph_frame = ctk.CTkFrame(section)
         disk_graph_frame.grid(row=4, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
-        disk_graph_frame.grid_columnconfigure(0, weight=1)  # Left column (pie chart)
+        disk_graph_frame.grid_columnconfigure(0, weight=1)  # Left column (gauge)
         disk_graph_frame.grid_columnconfigure(1, weight=1)  # Right column (line graph)
         
-        # Disk usage pie chart (left side)
-        self.disk_pie = PieChartFrame(disk_graph_frame, "Disk Usage")
-        self.disk_pie.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        # Disk usage gauge (left side)
+        self.disk_gauge = GaugeFrame(disk_graph_frame, "Disk Usage")
+        self.disk_gauge.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
         
         # Disk usage line graph (right side)
-        self.disk_graph = GraphFrame(disk_graph_frame, "Disk Usage Over Time", "Percentage (%)")
+        self.disk_graph = GraphFrame(disk_graph_frame, "Disk Usage Over Time", "Disk Usage (%)", ylim=(0, 100))
+        self.disk_graph.add_line('disk', "Disk Usage", "dodgerblue")
         self.disk_graph.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
+
+        # Every mounted filesystem, not just /
+        self.mount_table = self.create_table(
+            section,
+            ("Mount", "Device", "Type", "Total", "Used", "Free", "Usage"),
+            height=6,
+            wide_columns=("Mount", "Device")
+        )
+        self.mount_table.grid(row=5, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
+
+        # Per-device throughput, IOPS and busy time
+        self.disk_io_table = self.create_table(
+            section,
+            ("Device", "Read", "Write", "IOPS", "Busy"),
+            height=6
+        )
+        self.disk_io_table.grid(row=6, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
+
+        self.disk_io_graph = GraphFrame(section, "Disk I/O", "Bytes/s")
+        self.disk_io_graph.add_line('disk_read_rate', "Read", "mediumseagreen")
+        self.disk_io_graph.add_line('disk_write_rate', "Write", "orchid")
+        self.disk_io_graph.grid(row=7, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
         
         self.sections["Disk"] = section
 
     def create_overview_section(self):
+        from charts import GraphFrame
         section = ctk.CTkFrame(self.main_frame, fg_color="transparent")
         section.grid_columnconfigure((0, 1), weight=1)
 
     # System Overview Header
         sys_frame = ctk.CTkFrame(section, fg_color=self.colors["surface"])
         sys_frame.grid(row=0, column=0, columnspan=2, padx=10, pady=10, sticky="ew")
+        self.theme_manager.register(sys_frame, fg_color="surface")
 
     # System Info with more details
         sys_info = (
@@ -614,6 +970,7 @@ class SystemMonitor(ctk.CTk):
             text_color=self.colors["text"]
         )
         sys_title.pack(pady=15)
+        self.theme_manager.register(sys_title, text_color="text")
 
     # Initialize overview boxes dictionary if not exists
         if not hasattr(self, 'overview_boxes'):
@@ -638,7 +995,10 @@ class SystemMonitor(ctk.CTk):
         details_graph_frame.grid_columnconfigure((0, 1), weight=1)
 
     # Performance Graph on the right
-        perf_graph = GraphFrame(details_graph_frame, "System Performance Overview", "Usage (%)")
+        perf_graph = GraphFrame(details_graph_frame, "System Performance Overview", "Usage (%)", ylim=(0, 100))
+        perf_graph.add_line('cpu', "CPU", "#00A9FF", linewidth=2)
+        perf_graph.add_line('memory', "Memory", "#FF6B6B", linewidth=2)
+        perf_graph.add_line('disk', "Disk", "#32CD32", linewidth=2)
         perf_graph.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
         self.overview_boxes["Performance"] = perf_graph
 
@@ -646,6 +1006,7 @@ class SystemMonitor(ctk.CTk):
         details_frame = ctk.CTkFrame(details_graph_frame, fg_color=self.colors["surface"])
         details_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
         details_frame.grid_columnconfigure(0, weight=1)
+        self.theme_manager.register(details_frame, fg_color="surface")
 
     # Add system details
         details = {
@@ -663,6 +1024,7 @@ class SystemMonitor(ctk.CTk):
                  text_color=self.colors["accent"]
             )
             label.grid(row=i, column=0, padx=10, pady=5, sticky="w")
+            self.theme_manager.register(label, text_color="accent")
 
             value_label = ctk.CTkLabel(
                 details_frame,
@@ -671,235 +1033,500 @@ class SystemMonitor(ctk.CTk):
                 text_color=self.colors["text"]
             )
             value_label.grid(row=i, column=1, padx=10, pady=5, sticky="e")
+            self.theme_manager.register(value_label, text_color="text")
 
         self.sections["Overview"] = section
 
 
     def show_section(self, section_name):
+        if section_name not in self.sections:
+            self.section_builders[section_name]()
+            self.stale_sections.add(section_name)
+            self.apply_alert_states()
         for section in self.sections.values():
             section.grid_remove()
         self.sections[section_name].grid(row=0, column=0, sticky="nsew")
+        self.current_section = section_name
         
         # Reset scroll to top when switching sections
         self.canvas.yview_moveto(0)
 
-    def update_metrics(self):
-        while self.running:
+        # Catch up with whatever was sampled while the section was hidden
+        try:
+            self.render_section(section_name)
+        except Exception as e:
+            print(f"Error updating metrics: {e}")
+
+    def poll_samples(self):
+        """Drain the collector queue on the Tk thread and render the newest sample"""
+        try:
+            self.drain_samples()
+        finally:
+            # Whatever went wrong with this batch, the next one still gets polled
+            if self.running:
+                self.after(self.POLL_INTERVAL_MS, self.poll_samples)
+
+    def drain_samples(self):
+        latest = None
+        local = None
+        while True:
             try:
-                # Get system metrics using psutil
-                cpu_percent = psutil.cpu_percent()
-                cpu_freq = psutil.cpu_freq().current
-                core_count = psutil.cpu_count(logical=False)
-                thread_count = psutil.cpu_count(logical=True)
-                virtual = psutil.virtual_memory()
-                swap = psutil.swap_memory()
-                current_time = datetime.now()
-                disk = psutil.disk_usage('/')
-                process = psutil.Process()
-                net_io = psutil.net_io_counters()
-                bytes_sent = net_io.bytes_sent / (1024**2)  # Convert to MB
-                bytes_recv = net_io.bytes_recv / (1024**2) 
-                # Update history with current data
-                self.history['time'].append(current_time)
-                self.history['cpu'].append(cpu_percent)
-                self.history['memory'].append(virtual.percent)
-                self.history['virtual'].append(virtual.percent)
-                self.history['disk'].append(psutil.disk_usage('/').percent)
-                self.history['network_sent'].append(bytes_sent)
-                self.history['network_recv'].append(bytes_recv)
-
-# Keep last 60 data points for network
-                if len(self.history['network_sent']) > 60:
-                    self.history['network_sent'].pop(0)
-                    self.history['network_recv'].pop(0)
-                # Keep last 60 data points
-                if len(self.history['time']) > 60:
-                    for key in self.history:
-                        self.history[key].pop(0)
-
-                # Update Overview section metrics
-                if hasattr(self, 'overview_boxes'):
-                    if "CPU" in self.overview_boxes:
-                        self.overview_boxes["CPU"].value_label.configure(text=f"{cpu_percent:.1f}%")
-                    if "Memory" in self.overview_boxes:
-                        self.overview_boxes["Memory"].value_label.configure(text=f"{virtual.percent:.1f}%")
-                    if "Disk" in self.overview_boxes:
-                        self.overview_boxes["Disk"].value_label.configure(text=f"{psutil.disk_usage('/').percent:.1f}%")
-                    if "Virtual Memory" in self.overview_boxes:
-                        self.overview_boxes["Virtual Memory"].value_label.configure(text=f"{virtual.percent:.1f}%")
-                    
-                    # Update overview performance graph
-                    if "Performance" in self.overview_boxes:
-                        perf_graph = self.overview_boxes["Performance"]
-                        perf_graph.ax.clear()
-                        
-                        # Set graph style
-                        perf_graph.ax.set_facecolor("#1E2137")
-                        perf_graph.ax.grid(True, linestyle='--', alpha=0.2, color="#4A5B7A")
-                        perf_graph.ax.tick_params(colors="#B0B9D0", labelsize=9)
-                        
-                        # Plot data with better colors
-                        perf_graph.ax.plot(self.history['time'], self.history['cpu'], 
-                                         label="CPU", color="#00A9FF", linewidth=2)
-                        perf_graph.ax.plot(self.history['time'], self.history['memory'], 
-                                         label="Memory", color="#FF6B6B", linewidth=2)
-                        perf_graph.ax.plot(self.history['time'], self.history['disk'], 
-                                         label="Disk", color="#32CD32", linewidth=2)
-                        
-                        # Customize legend
-                        perf_graph.ax.legend(loc='upper right', facecolor="#1E2137", 
-                                           edgecolor="#4A5B7A", labelcolor="#B0B9D0")
-                        
-                        # Format time axis
-                        perf_graph.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-                        perf_graph.ax.set_xlabel("Time", color="#B0B9D0", labelpad=10)
-                        perf_graph.ax.set_ylabel("Usage (%)", color="#B0B9D0", labelpad=10)
-                        
-                        # Update the graph
-                        perf_graph.canvas.draw()
-
-                # Update CPU metrics boxes
-                self.cpu_boxes["CPU Usage"].value_label.configure(text=f"{cpu_percent:.1f}%")
-                self.cpu_boxes["CPU Frequency"].value_label.configure(text=f"{cpu_freq} MHz")
-                self.cpu_boxes["Core Count"].value_label.configure(text=f"{core_count} Cores")
-                self.cpu_boxes["Thread Count"].value_label.configure(text=f"{thread_count} Threads")
-                
-                # Update Pie chart for CPU
-                self.cpu_pie.update_chart(
-                    ["Used", "Idle"], [cpu_percent, 100 - cpu_percent], ["#FF6347", "#32CD32"]
-                )
-                
-                # Update Graph for CPU usage
-                self.cpu_graph.ax.clear()
-                self.cpu_graph.ax.plot(self.history['time'], self.history['cpu'], label="CPU Usage", color="tomato")
-                self.cpu_graph.ax.legend()
-                self.cpu_graph.ax.set_xlabel("Time (s)", labelpad=10, color='white')
-                self.cpu_graph.ax.set_ylabel("CPU Usage (%)", labelpad=10, color='white')
-                self.cpu_graph.canvas.draw()
-
-                # Update Virtual Memory metrics
-                self.vm_boxes["Total Virtual Memory"].value_label.configure(
-                    text=f"{(virtual.total + swap.total) / (1024**3):.2f} GB"
-                )
-                self.vm_boxes["Used Virtual Memory"].value_label.configure(
-                    text=f"{swap.used / (1024**3):.2f} GB"
-                )
-                self.vm_boxes["Available Virtual Memory"].value_label.configure(
-                    text=f"{(virtual.available + swap.free) / (1024**3):.2f} GB"
-                )
-                self.vm_boxes["Page File Usage"].value_label.configure(
-                    text=f"{swap.percent:.1f}%"
-                )
-                self.vm_boxes["Commit Charge"].value_label.configure(
-                    text=f"{process.memory_info().private / (1024**3):.2f} GB"
-                )
-                self.vm_boxes["Commit Limit"].value_label.configure(
-                    text=f"{(virtual.total + swap.total) / (1024**3):.2f} GB"
-                )
-                self.vm_boxes["Peak Commit"].value_label.configure(
-                    text=f"{process.memory_info().peak_wset / (1024**3):.2f} GB"
-                )
-                self.vm_boxes["Page Faults"].value_label.configure(
-                    text=f"{process.memory_info().num_page_faults:,}"
-                )
-
-                # Update Pie chart for Virtual Memory
-                self.vm_pie.update_chart(
-                    ["Used", "Free"], [virtual.percent, 100 - virtual.percent], ["#FF6347", "#32CD32"]
-                )
-
-                # Update Graph for Virtual Memory
-                self.vm_graph.ax.clear()
-                self.vm_graph.ax.plot(self.history['time'], self.history['virtual'], label="Virtual Memory Usage", color="yellowgreen")
-                self.vm_graph.ax.legend()
-                self.vm_graph.ax.set_xlabel("Time (s)", labelpad=10, color='white')
-                self.vm_graph.ax.set_ylabel("Memory Usage (%)", labelpad=10, color='white')
-                self.vm_graph.canvas.draw()
-
-                # Update Memory metrics
-                self.mem_boxes["Total Memory"].value_label.configure(
-                    text=f"{virtual.total / (1024**3):.2f} GB"
-                )
-                self.mem_boxes["Used Memory"].value_label.configure(
-                    text=f"{virtual.used / (1024**3):.2f} GB"
-                )
-                self.mem_boxes["Available Memory"].value_label.configure(
-                    text=f"{virtual.available / (1024**3):.2f} GB"
-                )
-                self.mem_boxes["Memory Percentage"].value_label.configure(
-                    text=f"{virtual.percent:.1f}%"
-                )
-
-                  # Update Memory Pie Chart
-                self.mem_pie.update_chart(
-                    ["Used", "Free"],
-                    [virtual.percent, 100 - virtual.percent],
-                    ["#FF6347", "#32CD32"]
-                )
-                # Dynamic y-axis limits for Memory Graph
-                current_value = virtual.percent
-                y_min = max(0, current_value - 5)
-                y_max = min(100, current_value + 5)
-
-                # Update Memory Graph
-                self.mem_graph.ax.clear()
-                self.mem_graph.ax.plot(self.history['time'], self.history['memory'], 
-                                     label="Memory Usage", color="coral")
-                self.mem_graph.ax.legend()
-                self.mem_graph.ax.set_xlabel("Time", labelpad=10, color='white')
-                self.mem_graph.ax.set_ylabel("Memory Usage (%)", labelpad=10, color='white')
-                self.mem_graph.canvas.draw()
-
-                # Update Disk metrics
+                sample = self.collector.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.record_sample(sample, self.local_history, self.local_alerts)
+            local = sample
+        if local is not None:
+            self.local_sample = local
+            self.update_monitor_status(local.monitor)
+            if self.host is None:
+                latest = local
+
+        # New samples from the fleet host on screen
+        while self.host_queue is not None:
+            try:
+                sample = self.host_queue.get_nowait()
+            except queue.Empty:
+                break
+            # The host's recent history may already hold it
+            if self.history.last_time is None or sample.time > self.history.last_time:
+                self.record_sample(sample, self.history, self.alerts)
+                latest = sample
+        if self.aggregator is not None:
+            self.refresh_hosts()
+            # The fleet grid follows this machine's ticks, whichever host is on screen
+            if latest is None and local is not None and self.current_section == "Fleet":
+                self.stale_sections.add("Fleet")
                 try:
-                    self.disk_boxes["Total Disk Space"].value_label.configure(
-                        text=f"{disk.total / (1024**3):.2f} GB"
-                    )
-                    self.disk_boxes["Used Disk Space"].value_label.configure(
-                        text=f"{disk.used / (1024**3):.2f} GB"
-                    )
-                    self.disk_boxes["Free Disk Space"].value_label.configure(
-                        text=f"{disk.free / (1024**3):.2f} GB"
-                    )
-                    self.disk_boxes["Disk Usage Percentage"].value_label.configure(
-                        text=f"{disk.percent:.1f}%"
-                    )
-                except AttributeError as e:
-                    print(f"Disk metrics error: {e}")
-
-                # Update Pie chart for Disk Usage
-                self.disk_pie.update_chart(
-                    ["Used", "Free"], [disk.percent, 100 - disk.percent], ["#FF6347", "#32CD32"]
-                )
-
-                # Update Graph for Disk usage
-                self.disk_graph.ax.clear()
-                self.disk_graph.ax.plot(self.history['time'], self.history['disk'], label="Disk Usage", color="dodgerblue")
-                self.disk_graph.ax.legend()
-                self.disk_graph.ax.set_xlabel("Time (s)", labelpad=10, color='white')
-                self.disk_graph.ax.set_ylabel("Disk Usage (%)", labelpad=10, color='white')
-                self.disk_graph.canvas.draw()
-
-                self.net_boxes["Bytes Sent"].value_label.configure(text=f"{bytes_sent:.2f} MB")
-                self.net_boxes["Bytes Received"].value_label.configure(text=f"{bytes_recv:.2f} MB")
-
-# Update Graph for Network Usage
-                self.net_graph.ax.clear()
-                self.net_graph.ax.plot(self.history['time'], self.history['network_sent'], label="Bytes Sent", color="orange")
-                self.net_graph.ax.plot(self.history['time'], self.history['network_recv'], label="Bytes Received", color="blue")
-                self.net_graph.ax.legend()
-                self.net_graph.ax.set_xlabel("Time", labelpad=10, color='white')
-                self.net_graph.ax.set_ylabel("Network (MB)", labelpad=10, color='white')
-                self.net_graph.canvas.draw()
-
-                time.sleep(1)
+                    self.render_section("Fleet")
+                except Exception as e:
+                    print(f"Error updating fleet: {e}")
 
+        # Only the newest sample is rendered; older ones just land in history
+        if latest is not None:
+            started = time.perf_counter()
+            try:
+                self.update_metrics(latest)
             except Exception as e:
                 print(f"Error updating metrics: {e}")
-                time.sleep(1)
+            self.collector.record_render(time.perf_counter() - started)
+
+    def record_sample(self, sample, history, alerts):
+        # Update history with current data
+        values = history_values(sample)
+        try:
+            history.append(sample.time, values)
+            if alerts.update(sample.time, values) and alerts is self.alerts:
+                self.apply_alert_states()
+        except Exception as e:
+            print(f"Error recording sample: {e}")
+        if history is not self.history:
+            return
+        self.per_cpu_recent.append(sample.per_cpu)
+        if "CPU" in self.sections:
+            if len(sample.per_cpu) != len(self.cpu_heatmap.buffer):
+                self.cpu_heatmap.reset(len(sample.per_cpu))
+            self.cpu_heatmap.push(sample.per_cpu)
+
+    def refresh_hosts(self):
+        # The host list only changes when a host connects or disconnects
+        if self.aggregator.version == self.fleet_version:
+            return
+        self.fleet_version = self.aggregator.version
+        self.host_menu.configure(values=["Local"] + [host.name for host in self.aggregator.summary()])
+
+    def select_host(self, name):
+        """Show fleet host ``name``, or this machine for "Local" """
+        host = None if name == "Local" else name
+        if host == self.host:
+            return
+        if self.host_queue is not None:
+            self.aggregator.unsubscribe(self.host, self.host_queue)
+            self.host_queue = None
+        self.host = host
+        if host is None:
+            self.history = self.local_history
+            self.alerts = self.local_alerts
+            self.latest_sample = self.local_sample
+            self.title("System Resourse Monitor ")
+        else:
+            # Subscribe first, so nothing falls between the recent history and the queue
+            self.host_queue = self.aggregator.subscribe(host)
+            self.history = TieredHistory(HISTORY_COLUMNS, capacity=3600, resolution=self.collector.interval)
+            self.history.extend(*self.aggregator.recent(host))
+            self.alerts = AlertEngine(self.ALERT_RULES)
+            self.alerts.prime(self.history.raw)
+            self.latest_sample = self.aggregator.latest(host)
+            self.title(f"System Resourse Monitor - {host}")
+        self.host_menu.set(name)
+
+        # Per-core samples and the picked interface belong to the previous host
+        self.per_cpu_recent.clear()
+        if "Network" in self.sections and self.net_interface != "All":
+            self.net_interface = "All"
+            self.net_interface_menu.set("All")
+            self.net_graph.rebind_lines(['net_sent_rate', 'net_recv_rate'])
+        if "CPU" in self.sections and self.latest_sample is not None:
+            self.cpu_heatmap.reset(len(self.latest_sample.per_cpu))
+        self.apply_alert_states()
+        self.stale_sections.update(self.sections)
+        self.render_section(self.current_section)
+
+    def apply_alert_states(self):
+        """Colour the metric boxes of every alerted column, for the sections built so far"""
+        for column, state in self.alerts.column_states().items():
+            for attr, name in self.ALERT_BOXES.get(column, ()):
+                box = getattr(self, attr, {}).get(name)
+                if box is not None:
+                    box.set_state(state)
+
+    def update_metrics(self, sample):
+        """Render a new sample; hidden sections are only marked stale"""
+        self.latest_sample = sample
+        self.stale_sections.update(self.sections)
+        self.render_section(self.current_section)
+
+    def render_section(self, section_name):
+        if self.latest_sample is None or section_name not in self.stale_sections:
+            return
+        self.stale_sections.discard(section_name)
+        self.section_renderers[section_name](self.latest_sample)
+
+    def render_overview(self, sample):
+        cpu_percent = sample.cpu_percent
+        virtual = sample.virtual
+        disk = sample.disk
+
+        # Update Overview section metrics
+        if hasattr(self, 'overview_boxes'):
+            if "CPU" in self.overview_boxes:
+                self.overview_boxes["CPU"].value_label.configure(text=f"{cpu_percent:.1f}%")
+            if "Memory" in self.overview_boxes:
+                self.overview_boxes["Memory"].value_label.configure(text=f"{virtual.percent:.1f}%")
+            if "Disk" in self.overview_boxes:
+                self.overview_boxes["Disk"].value_label.configure(text=f"{disk.percent:.1f}%")
+            if "Virtual Memory" in self.overview_boxes:
+                self.overview_boxes["Virtual Memory"].value_label.configure(text=f"{virtual.percent:.1f}%")
+            
+            # Update overview performance graph
+            if "Performance" in self.overview_boxes:
+                perf_graph = self.overview_boxes["Performance"]
+                perf_graph.plot_history(self.history)
+
+    def render_cpu(self, sample):
+        cpu_percent = sample.cpu_percent
+        cpu_freq = sample.cpu_freq
+        core_count = sample.core_count
+        thread_count = sample.thread_count
+
+        # Update CPU metrics boxes
+        self.cpu_boxes["CPU Usage"].value_label.configure(text=f"{cpu_percent:.1f}%")
+        self.cpu_boxes["CPU Frequency"].value_label.configure(text=f"{cpu_freq} MHz")
+        self.cpu_boxes["Core Count"].value_label.configure(text=f"{core_count} Cores")
+        self.cpu_boxes["Thread Count"].value_label.configure(text=f"{thread_count} Threads")
+
+        # Time breakdown; iowait only exists on Linux
+        cpu_times = sample.cpu_times_percent
+        self.cpu_boxes["User Time"].value_label.configure(text=f"{cpu_times.user:.1f}%")
+        self.cpu_boxes["System Time"].value_label.configure(text=f"{cpu_times.system:.1f}%")
+        self.cpu_boxes["Idle Time"].value_label.configure(text=f"{cpu_times.idle:.1f}%")
+        iowait = getattr(cpu_times, 'iowait', None)
+        self.cpu_boxes["I/O Wait"].value_label.configure(text=f"{iowait:.1f}%" if iowait is not None else "--")
+        
+        # Update gauge for CPU
+        self.cpu_gauge.set_value(cpu_percent)
+        
+        # Update Graph for CPU usage
+        self.cpu_graph.plot_history(self.history)
+        self.cpu_heatmap.redraw()
+
+    def render_virtual_memory(self, sample):
+        virtual = sample.virtual
+        swap = sample.swap
+        process_memory = sample.process_memory
+
+        # Update Virtual Memory metrics
+        self.vm_boxes["Total Virtual Memory"].value_label.configure(
+            text=f"{(virtual.total + swap.total) / (1024**3):.2f} GB"
+        )
+        self.vm_boxes["Used Virtual Memory"].value_label.configure(
+            text=f"{swap.used / (1024**3):.2f} GB"
+        )
+        self.vm_boxes["Available Virtual Memory"].value_label.configure(
+            text=f"{(virtual.available + swap.free) / (1024**3):.2f} GB"
+        )
+        self.vm_boxes["Page File Usage"].value_label.configure(
+            text=f"{swap.percent:.1f}%"
+        )
+        vm = sample.vm
+        if vm is not None:
+            # Linux: system-wide figures from /proc
+            commit_charge = vm.committed
+            commit_limit = vm.commit_limit
+            peak_commit = vm.peak_committed
+            page_faults = f"{vm.page_faults:,.0f}/s"
+            self.vm_boxes["Major Faults"].value_label.configure(text=f"{vm.major_faults:,.1f}/s")
+            self.vm_boxes["Swap In"].value_label.configure(text=f"{vm.swap_in:,.1f} pages/s")
+            self.vm_boxes["Swap Out"].value_label.configure(text=f"{vm.swap_out:,.1f} pages/s")
+            self.vm_boxes["Memory Pressure"].value_label.configure(
+                text=f"{vm.pressure_some:.2f}%" if vm.pressure_some is not None else "--"
+            )
+        else:
+            # Windows exposes these per process; other platforms have none of them
+            commit_charge = getattr(process_memory, 'private', None)
+            commit_limit = virtual.total + swap.total
+            peak_commit = getattr(process_memory, 'peak_wset', None)
+            num_page_faults = getattr(process_memory, 'num_page_faults', None)
+            page_faults = f"{num_page_faults:,}" if num_page_faults is not None else "--"
+
+        self.vm_boxes["Commit Charge"].value_label.configure(
+            text=f"{commit_charge / (1024**3):.2f} GB" if commit_charge is not None else "--"
+        )
+        self.vm_boxes["Commit Limit"].value_label.configure(
+            text=f"{commit_limit / (1024**3):.2f} GB"
+        )
+        self.vm_boxes["Peak Commit"].value_label.configure(
+            text=f"{peak_commit / (1024**3):.2f} GB" if peak_commit is not None else "--"
+        )
+        self.vm_boxes["Page Faults"].value_label.configure(text=page_faults)
+
+        # Update gauge for Virtual Memory
+        self.vm_gauge.set_value(virtual.percent)
+
+        # Update Graph for Virtual Memory
+        self.vm_graph.plot_history(self.history)
+
+    def render_memory(self, sample):
+        virtual = sample.virtual
+
+        # Update Memory metrics
+        self.mem_boxes["Total Memory"].value_label.configure(
+            text=f"{virtual.total / (1024**3):.2f} GB"
+        )
+        self.mem_boxes["Used Memory"].value_label.configure(
+            text=f"{virtual.used / (1024**3):.2f} GB"
+        )
+        self.mem_boxes["Available Memory"].value_label.configure(
+            text=f"{virtual.available / (1024**3):.2f} GB"
+        )
+        self.mem_boxes["Memory Percentage"].value_label.configure(
+            text=f"{virtual.percent:.1f}%"
+        )
+
+        # Update Memory gauge
+        self.mem_gauge.set_value(virtual.percent)
+
+        # Update Memory Graph
+        self.mem_graph.plot_history(self.history)
+
+    def render_disk(self, sample):
+        disk = sample.disk
+
+        # Update Disk metrics
+        try:
+            self.disk_boxes["Total Disk Space"].value_label.configure(
+                text=f"{disk.total / (1024**3):.2f} GB"
+            )
+            self.disk_boxes["Used Disk Space"].value_label.configure(
+                text=f"{disk.used / (1024**3):.2f} GB"
+            )
+            self.disk_boxes["Free Disk Space"].value_label.configure(
+                text=f"{disk.free / (1024**3):.2f} GB"
+            )
+            self.disk_boxes["Disk Usage Percentage"].value_label.configure(
+                text=f"{disk.percent:.1f}%"
+            )
+        except AttributeError as e:
+            print(f"Disk metrics error: {e}")
+
+        # Update gauge for Disk Usage
+        self.disk_gauge.set_value(disk.percent)
+
+        # Update Graph for Disk usage
+        self.disk_graph.plot_history(self.history)
+
+        usage = sample.disk_usage
+        self.update_table(self.mount_table, [
+            (
+                partition.mountpoint,
+                partition.device,
+                partition.fstype,
+                f"{usage[partition.mountpoint].total / (1024**3):.2f} GB",
+                f"{usage[partition.mountpoint].used / (1024**3):.2f} GB",
+                f"{usage[partition.mountpoint].free / (1024**3):.2f} GB",
+                f"{usage[partition.mountpoint].percent:.1f}%"
+            )
+            for partition in sample.disk_partitions
+            if partition.mountpoint in usage
+        ])
+        self.update_table(self.disk_io_table, [
+            (device, format_rate(rates.read_bytes), format_rate(rates.write_bytes),
+             f"{rates.iops:.0f}", f"{rates.busy:.0f}%")
+            for device, rates in sorted(sample.disk_io.items())
+        ])
+        self.disk_io_graph.plot_history(self.history)
+
+    def render_network(self, sample):
+        bytes_sent = sample.bytes_sent
+        bytes_recv = sample.bytes_recv
+
+        rates = sample.net_rates
+
+        self.net_boxes["Bytes Sent"].value_label.configure(text=f"{bytes_sent:.2f} MB")
+        self.net_boxes["Bytes Received"].value_label.configure(text=f"{bytes_recv:.2f} MB")
+        self.net_boxes["Upload Rate"].value_label.configure(text=format_rate(sample.net_sent_rate))
+        self.net_boxes["Download Rate"].value_label.configure(text=format_rate(sample.net_recv_rate))
+
+        # Keep the picker in sync with hot-plugged interfaces
+        interfaces = ["All"] + sorted(rates)
+        if interfaces != self.net_interface_menu.cget("values"):
+            self.net_interface_menu.configure(values=interfaces)
+
+        if self.net_interface == "All":
+            selected = list(rates.values())
+        else:
+            selected = [rates[self.net_interface]] if self.net_interface in rates else []
+        if selected:
+            packets_sent = sum(r.packets_sent for r in selected)
+            packets_recv = sum(r.packets_recv for r in selected)
+            errors = sum(r.errors for r in selected)
+            drops = sum(r.drops for r in selected)
+            self.nic_labels["Packets Sent"].configure(text=f"Packets Sent: {packets_sent:.0f}/s")
+            self.nic_labels["Packets Received"].configure(text=f"Packets Received: {packets_recv:.0f}/s")
+            self.nic_labels["Errors"].configure(text=f"Errors: {errors:.1f}/s")
+            self.nic_labels["Drops"].configure(text=f"Drops: {drops:.1f}/s")
+
+        # Update Graph for Network Usage
+        self.net_graph.plot_history(self.history)
+
+    def render_processes(self, sample):
+        self.update_table(self.process_tree, [
+            (
+                row.pid,
+                row.name,
+                row.username,
+                f"{row.cpu_percent:.1f}",
+                f"{row.rss / (1024**2):.1f} MB",
+                format_rate(row.io_rate)
+            )
+            for row in sample.processes[self.process_sort]
+        ])
+
+    def render_alerts(self, sample):
+        log = self.alerts.log
+        newest = log[-1] if log else None
+        if newest is self.shown_alert:
+            return
+        self.shown_alert = newest
+        self.update_table(self.alert_table, [
+            (
+                datetime.fromtimestamp(alert.time).strftime("%H:%M:%S"),
+                alert.rule.name,
+                f"{alert.rule.severity} {alert.state}",
+                f"{alert.value:,.1f}"
+            )
+            for alert in reversed(log)
+        ])
+
+    def render_fleet(self, sample):
+        now = time.time()
+        for host in self.aggregator.summary():
+            box = self.fleet_boxes.get(host.name)
+            if box is None:
+                box = MetricBox(self.sections["Fleet"], host.name)
+                index = len(self.fleet_boxes)
+                box.grid(row=index // 4, column=index % 4, padx=10, pady=10, sticky="ew")
+                for widget in (box, box.title_label, box.value_label):
+                    widget.bind("<Button-1>", lambda e, name=host.name: self.select_host(name))
+                self.fleet_boxes[host.name] = box
+            latest = host.latest
+            box.value_label.configure(
+                text=f"CPU {latest.cpu_percent:.0f}% | Mem {latest.virtual.percent:.0f}%" if latest else "--"
+            )
+            if not host.connected:
+                box.set_state("error")
+            elif self.aggregator.is_stale(host, now):
+                box.set_state("warning")
+            else:
+                box.set_state("success")
+
+    def open_export_dialog(self):
+        if self.export_job is not None and self.export_job.running:
+            return
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Export History")
+        dialog.configure(fg_color=self.colors["bg"])
+        dialog.transient(self)
+
+        ctk.CTkLabel(dialog, text="Time range", text_color=self.colors["text"]).grid(
+            row=0, column=0, padx=15, pady=(15, 5), sticky="w")
+        range_menu = ctk.CTkOptionMenu(dialog, values=list(self.EXPORT_RANGES))
+        range_menu.set("Last 24 hours")
+        range_menu.grid(row=0, column=1, padx=15, pady=(15, 5), sticky="ew")
+
+        ctk.CTkLabel(dialog, text="Columns", text_color=self.colors["text"]).grid(
+            row=1, column=0, padx=15, pady=5, sticky="w")
+        columns_entry = ctk.CTkEntry(dialog, placeholder_text="all, or e.g. cpu, memory, net.*", width=260)
+        columns_entry.grid(row=1, column=1, padx=15, pady=5, sticky="ew")
+
+        error_label = ctk.CTkLabel(dialog, text="", text_color=self.colors["error"])
+        error_label.grid(row=2, column=0, columnspan=2, padx=15, sticky="w")
+
+        def export():
+            try:
+                self.start_export(self.EXPORT_RANGES[range_menu.get()], columns_entry.get(), parent=dialog)
+            except (ValueError, ImportError, OSError) as e:
+                error_label.configure(text=str(e))
+                return
+            dialog.destroy()
+
+        ctk.CTkButton(dialog, text="Export...", command=export).grid(
+            row=3, column=0, columnspan=2, padx=15, pady=15, sticky="ew")
+        dialog.grid_columnconfigure(1, weight=1)
+
+    def start_export(self, seconds, patterns, parent=None):
+        """Export the history on screen, from ``seconds`` ago (None for all of it), to a file picked by the user"""
+        path = filedialog.asksaveasfilename(
+            parent=parent,
+            title="Export History",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet"), ("Arrow", "*.arrow")]
+        )
+        if not path:
+            return
+        from history_export import ExportJob, history_segments, available_columns, select_columns
+        segments = history_segments(self.history)
+        columns = select_columns(available_columns(segments), patterns)
+        start = None if seconds is None else time.time() - seconds
+        job = ExportJob(segments, path, columns, start=start)
+        self.export_job = job
+        job.start()
+        self.poll_export()
+
+    def poll_export(self):
+        job = self.export_job
+        if job is None:
+            return
+        name = os.path.basename(job.path)
+        if job.running:
+            self.export_label.configure(text=f"Exporting {name}: {job.progress:.0%}")
+            self.after(500, self.poll_export)
+        elif job.error is not None:
+            self.export_label.configure(text=f"Export of {name} failed: {job.error}")
+        else:
+            self.export_label.configure(text=f"Exported {job.rows_written:,} rows to {name}")
 
     def on_closing(self):
         self.running = False
+        if self.export_job is not None:
+            self.export_job.cancel()
+        self.collector.close()
+        if self.aggregator is not None:
+            self.aggregator.stop()
+        if self.exporter is not None:
+            self.exporter.stop()
+        if self.journal is not None:
+            self.journal.close()
         self.destroy()
 
     def create_status_bar(self):
@@ -909,6 +1536,7 @@ class SystemMonitor(ctk.CTk):
             fg_color=self.colors["surface"]
         )
         self.status_bar.grid(row=1, column=0, columnspan=2, sticky="ew")
+        self.theme_manager.register(self.status_bar, fg_color="surface")
         
         # System info
         sys_info = ctk.CTkLabel(
@@ -918,6 +1546,27 @@ class SystemMonitor(ctk.CTk):
             text_color=self.colors["text_secondary"]
         )
         sys_info.pack(side="left", padx=15)
+        self.theme_manager.register(sys_info, text_color="text_secondary")
+
+        # The monitor's own footprint, so its overhead is never a guess
+        self.monitor_label = ctk.CTkLabel(
+            self.status_bar,
+            text="",
+            font=ctk.CTkFont(size=12),
+            text_color=self.colors["text_secondary"]
+        )
+        self.monitor_label.pack(side="left", padx=15)
+        self.theme_manager.register(self.monitor_label, text_color="text_secondary")
+
+        # Progress of a running history export
+        self.export_label = ctk.CTkLabel(
+            self.status_bar,
+            text="",
+            font=ctk.CTkFont(size=12),
+            text_color=self.colors["text_secondary"]
+        )
+        self.export_label.pack(side="left", padx=15)
+        self.theme_manager.register(self.export_label, text_color="text_secondary")
         
         # Add live clock
         self.clock_label = ctk.CTkLabel(
@@ -927,8 +1576,20 @@ class SystemMonitor(ctk.CTk):
             text_color=self.colors["text_secondary"]
         )
         self.clock_label.pack(side="right", padx=15)
+        self.theme_manager.register(self.clock_label, text_color="text_secondary")
         self.update_clock()
 
+    def update_monitor_status(self, monitor):
+        def ms(seconds):
+            return f"{seconds * 1000:.1f}" if seconds is not None else "--"
+
+        self.monitor_label.configure(text=(
+            f"Monitor: CPU {monitor.cpu_percent:.1f}% | RSS {monitor.rss / (1024**2):.0f} MB | "
+            f"Tick p50/p99 {ms(monitor.tick_p50)}/{ms(monitor.tick_p99)} ms | "
+            f"Render p50/p99 {ms(monitor.render_p50)}/{ms(monitor.render_p99)} ms | "
+            f"Missed {monitor.missed_ticks} | Queue {monitor.queue_depth}"
+        ))
+
     def update_clock(self):
         current_time = datetime.now().strftime("%H:%M:%S")
         self.clock_label.configure(text=current_time)
@@ -937,68 +1598,19 @@ class SystemMonitor(ctk.CTk):
     def toggle_theme(self):
         self.colors = self.theme_manager.toggle_theme()
         ctk.set_appearance_mode("dark" if self.theme_manager.is_dark else "light")
-        
+
         try:
-            # Update main window
-            self.configure(fg_color=self.colors["bg"])
-            
-            # Update sidebar
-            self.sidebar.configure(fg_color=self.colors["surface"])
-            
-            # Update navigation buttons
-            for child in self.sidebar.winfo_children():
-                if isinstance(child, ctk.CTkFrame):  # Nav frame
-                    for button in child.winfo_children():
-                        if isinstance(button, ctk.CTkButton):
-                            button.configure(
-                                text_color=self.colors["text"],
-                                hover_color=self.colors["accent"],
-                                border_color=self.colors["border"]
-                            )
-            
-            # Update theme switch
-            for child in self.sidebar.winfo_children():
-                if isinstance(child, ctk.CTkSwitch):
-                    child.configure(
-                        text_color=self.colors["text"],
-                        progress_color=self.colors["accent"],
-                        button_color=self.colors["accent"]
-                    )
-            
-            # Update all metric boxes
-            for box in self.overview_boxes.values():
-                if isinstance(box, MetricBox):
-                    box.configure(
-                        fg_color=self.colors["surface"],
-                        border_color=self.colors["border"]
-                    )
-                    box.title_label.configure(text_color=self.colors["accent"])
-                    box.value_label.configure(text_color=self.colors["text"])
-            
-            # Update all graphs
-            for section in self.sections.values():
-                for child in section.winfo_children():
-                    if isinstance(child, GraphFrame):
-                        child.configure(fg_color=self.colors["surface"])
-                        if hasattr(child, 'ax') and hasattr(child, 'fig'):
-                            child.ax.set_facecolor(self.colors["surface"])
-                            child.fig.patch.set_facecolor(self.colors["surface"])
-                            child.ax.tick_params(colors=self.colors["text"])
-                            for spine in child.ax.spines.values():
-                                spine.set_color(self.colors["text_secondary"])
-                            child.canvas.draw()
-            
-            # Update status bar
-            if hasattr(self, 'status_bar'):
-                self.status_bar.configure(fg_color=self.colors["surface"])
-                if hasattr(self, 'status_label'):
-                    self.status_label.configure(text_color=self.colors["text_secondary"])
-                if hasattr(self, 'time_label'):
-                    self.time_label.configure(text_color=self.colors["text_secondary"])
-        
+            # One pass over the registered widgets; charts only restyle their artists
+            self.theme_manager.apply()
         except Exception as e:
             print(f"Error updating theme: {e}")
 
+        # Redraw the visible section once, when idle. Hidden charts dropped their cached
+        # background, so they redraw in full the next time they are shown.
+        if self.current_section is not None:
+            self.stale_sections.add(self.current_section)
+            self.after_idle(self.render_section, self.current_section)
+
 # Run the application
 if __name__ == "__main__":
     app = SystemMonitor()
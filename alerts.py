@@ -0,0 +1,156 @@
+import re
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+
+# A threshold rule on one history column, e.g. Rule("High CPU", "cpu", ">", 90, duration=30).
+# It fires once the value has stayed past ``threshold`` for ``duration`` seconds, resolves
+# only after the value is back past ``threshold`` by ``hysteresis``, and does not fire
+# again until ``cooldown`` seconds after it last fired.
+Rule = namedtuple('Rule', [
+    'name', 'column', 'op', 'threshold', 'duration', 'hysteresis', 'cooldown', 'severity'
+], defaults=(0.0, 0.0, 0.0, 'warning'))
+
+# A rule changing state; ``state`` is "firing" or "resolved"
+Alert = namedtuple('Alert', ['time', 'rule', 'state', 'value'])
+
+# Severities double as ThemeManager colour keys, mildest first
+SEVERITIES = ('warning', 'error')
+
+_RULE = re.compile(
+    r'^\s*(?P<column>[\w.]+)\s*(?P<op>[<>])\s*(?P<threshold>-?[\d.]+)%?'
+    r'(?:\s+for\s+(?P<duration>[\d.]+[smh]?))?'
+    r'(?:\s+hysteresis\s+(?P<hysteresis>[\d.]+)%?)?'
+    r'(?:\s+cooldown\s+(?P<cooldown>[\d.]+[smh]?))?'
+    r'(?:\s+(?P<severity>warning|error))?\s*$'
+)
+_UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+
+def _seconds(text):
+    if not text:
+        return 0.0
+    if text[-1] in _UNITS:
+        return float(text[:-1]) * _UNITS[text[-1]]
+    return float(text)
+
+
+def parse_rule(text):
+    """Rule from e.g. "cpu > 90% for 30s hysteresis 5 cooldown 5m error" """
+    match = _RULE.match(text)
+    if match is None:
+        raise ValueError(f"Cannot parse alert rule: {text!r}")
+    return Rule(
+        text.strip(),
+        match['column'],
+        match['op'],
+        float(match['threshold']),
+        _seconds(match['duration']),
+        float(match['hysteresis'] or 0.0),
+        _seconds(match['cooldown']),
+        match['severity'] or 'warning'
+    )
+
+
+# Evaluates every rule on each sample as a handful of NumPy operations over per-rule
+# state arrays, so the per-sample cost hardly grows with the number of rules. Python
+# only runs per column read and per state change, never per rule.
+class AlertEngine:
+    LOG_SIZE = 500
+
+    def __init__(self, rules=()):
+        self.log = deque(maxlen=self.LOG_SIZE)
+        self.set_rules(rules)
+
+    def set_rules(self, rules):
+        self.rules = tuple(rules)
+        for rule in self.rules:
+            if rule.op not in ('>', '<'):
+                raise ValueError(f"Unknown operator {rule.op!r} in rule {rule.name!r}")
+            if rule.severity not in SEVERITIES:
+                raise ValueError(f"Unknown severity {rule.severity!r} in rule {rule.name!r}")
+        self.columns = tuple(dict.fromkeys(rule.column for rule in self.rules))
+        index = {column: i for i, column in enumerate(self.columns)}
+        self._column = np.array([index[rule.column] for rule in self.rules], dtype=np.intp)
+
+        # Rules are compared as sign * value > sign * threshold, so "<" rules need no branch
+        self._sign = np.array([1.0 if rule.op == '>' else -1.0 for rule in self.rules])
+        self._trigger = self._sign * np.array([rule.threshold for rule in self.rules], dtype=float)
+        self._clear = self._trigger - np.array([rule.hysteresis for rule in self.rules], dtype=float)
+        self._duration = np.array([rule.duration for rule in self.rules], dtype=float)
+        self._cooldown = np.array([rule.cooldown for rule in self.rules], dtype=float)
+        self._severity = np.array([SEVERITIES.index(rule.severity) for rule in self.rules], dtype=np.intp)
+
+        # Per-rule state: when the current breach began (NaN if none), whether it is firing,
+        # and when it last fired
+        self._since = np.full(len(self.rules), np.nan)
+        self.active = np.zeros(len(self.rules), dtype=bool)
+        self._fired = np.full(len(self.rules), -np.inf)
+
+    def prime(self, store, now=None):
+        """Pick up breaches already running in a HistoryStore, e.g. one restored from the journal"""
+        if not self.rules or not len(store):
+            return
+        now = time.time() if now is None else now
+        # Only the samples that can still count towards the longest duration
+        count = store.count_since(now - self._duration.max())
+        if not count:
+            return
+        times = store.times(count)
+        columns = np.array([
+            store.column(column, count) if column in store._index else np.full(count, np.nan)
+            for column in self.columns
+        ])
+        values = columns[self._column]
+        with np.errstate(invalid='ignore'):
+            breach = self._sign[:, None] * values > self._trigger[:, None]
+        # As in update(), a missing value neither ends a breach nor starts one: the breach
+        # runs from the first breaching sample after the last known non-breaching one
+        positions = np.arange(count)
+        last_clear = np.where(~np.isnan(values) & ~breach, positions, -1).max(axis=1)
+        after = breach & (positions > last_clear[:, None])
+        running = after.any(axis=1)
+        self._since = np.where(running, times[after.argmax(axis=1)], np.nan)
+
+    def update(self, timestamp, values):
+        """Evaluate every rule against one sample's history values; returns the new Alerts"""
+        if not self.rules:
+            return []
+        value = np.array([values.get(column, np.nan) for column in self.columns], dtype=float)[self._column]
+        signed = self._sign * value
+        known = ~np.isnan(value)
+        with np.errstate(invalid='ignore'):
+            breach = signed > self._trigger
+            clear = known & (signed <= self._clear)
+
+        # Missing values leave a breach running; a known value below the trigger ends it
+        self._since = np.where(breach, np.fmin(self._since, timestamp), np.where(known, np.nan, self._since))
+        fire = (
+            ~self.active & breach
+            & (timestamp - self._since >= self._duration)
+            & (timestamp - self._fired >= self._cooldown)
+        )
+        resolve = self.active & clear
+        if not (fire.any() or resolve.any()):
+            return []
+
+        self.active = (self.active | fire) & ~resolve
+        self._fired[fire] = timestamp
+        alerts = [
+            Alert(timestamp, self.rules[i], 'firing' if fire[i] else 'resolved', float(value[i]))
+            for i in np.flatnonzero(fire | resolve)
+        ]
+        self.log.extend(alerts)
+        return alerts
+
+    def column_states(self):
+        """Worst firing severity per column, "success" for columns whose rules are all quiet"""
+        states = dict.fromkeys(self.columns, 'success')
+        for i in np.flatnonzero(self.active):
+            column = self.rules[i].column
+            severity = SEVERITIES[self._severity[i]]
+            if states[column] == 'success' or SEVERITIES.index(severity) > SEVERITIES.index(states[column]):
+                states[column] = severity
+        return states
@@ -0,0 +1,560 @@
+"""Benchmark one dashboard tick: collection, history and every section's render path.
+
+Sampling runs against a deterministic fake psutil (or the real providers), and the
+charts draw on offscreen Agg canvases, so no display is needed. Results are JSON.
+
+    python bench.py --ticks 300 > bench_output.txt
+    python bench.py --provider procfs --processes 0
+    python bench.py --no-startup --no-allocations
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import zlib
+from collections import defaultdict, namedtuple
+from functools import partial
+from types import SimpleNamespace
+
+import psutil
+
+import collector
+from alerts import AlertEngine, Rule
+from collector import MetricsCollector, HISTORY_COLUMNS, history_values
+
+
+scputimes = namedtuple('scputimes', [
+    'user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal', 'guest', 'guest_nice'
+])
+scpufreq = namedtuple('scpufreq', ['current', 'min', 'max'])
+svmem = namedtuple('svmem', [
+    'total', 'available', 'percent', 'used', 'free', 'active', 'inactive', 'buffers', 'cached', 'shared', 'slab'
+])
+sswap = namedtuple('sswap', ['total', 'used', 'free', 'percent', 'sin', 'sout'])
+snetio = namedtuple('snetio', [
+    'bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv', 'errin', 'errout', 'dropin', 'dropout'
+])
+sdiskio = namedtuple('sdiskio', [
+    'read_count', 'write_count', 'read_bytes', 'write_bytes', 'read_time', 'write_time',
+    'read_merged_count', 'write_merged_count', 'busy_time'
+])
+sdiskpart = namedtuple('sdiskpart', ['device', 'mountpoint', 'fstype', 'opts'])
+sdiskusage = namedtuple('sdiskusage', ['total', 'used', 'free', 'percent'])
+pmem = namedtuple('pmem', ['rss', 'vms'])
+pcputimes = namedtuple('pcputimes', ['user', 'system'])
+pio = namedtuple('pio', ['read_count', 'write_count', 'read_bytes', 'write_bytes'])
+
+GiB = 1024 ** 3
+
+
+class _FakeProcess:
+    def __init__(self, fake, pid):
+        self.fake = fake
+        self.pid = pid
+        self.info = {'pid': pid, 'name': f"proc-{pid}", 'username': f"user{pid % 7}"}
+
+    def _check(self):
+        # pid 0 stands for the monitor itself, which never exits
+        if self.pid and self.pid not in self.fake.alive:
+            raise psutil.NoSuchProcess(self.pid)
+
+    def oneshot(self):
+        return self.fake.oneshot
+
+    def as_dict(self, attrs):
+        self._check()
+        return {name: self.info[name] for name in attrs}
+
+    def cpu_percent(self, interval=None):
+        self._check()
+        return self.fake.value(self.pid, 100.0)
+
+    def cpu_times(self):
+        self._check()
+        return pcputimes(self.fake.tick * 0.01, self.fake.tick * 0.005)
+
+    def memory_info(self):
+        self._check()
+        return pmem(int(self.fake.value(self.pid + 1, 512 * 1024 ** 2)), 2 * GiB)
+
+    def io_counters(self):
+        self._check()
+        total = self.fake.tick * int(self.fake.value(self.pid + 2, 1024 ** 2))
+        return pio(self.fake.tick, self.fake.tick, total, total)
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+# Deterministic stand-in for the parts of psutil the collector calls. Every value is a
+# function of (seed, tick), so two runs with the same arguments see identical samples.
+class FakePsutil:
+    Error = psutil.Error
+    NoSuchProcess = psutil.NoSuchProcess
+    AccessDenied = psutil.AccessDenied
+
+    def __init__(self, seed=0, cores=8, nics=4, disks=4, processes=300):
+        self.seed = seed
+        self.cores = cores
+        self.nics = [f"eth{i}" for i in range(nics)]
+        self.disks = [f"sd{chr(ord('a') + i)}" for i in range(disks)]
+        self.mounts = ["/"] + [f"/mnt/{disk}" for disk in self.disks[1:]]
+        self.alive = set(range(1, processes + 1))
+        self.next_pid = processes + 1
+        self.tick = 0
+        self.oneshot = _NullContext()
+
+    def value(self, key, scale):
+        """Pseudo-random in [0, scale), fixed for a given key and tick"""
+        # crc32 rather than hash(), which is salted per interpreter for strings
+        return zlib.crc32(f"{self.seed}:{self.tick}:{key}".encode()) / 2 ** 32 * scale
+
+    def advance(self):
+        """Move to the next tick; a few processes exit and start every tick"""
+        self.tick += 1
+        churn = random.Random(f"{self.seed}:{self.tick}").sample(sorted(self.alive), min(2, len(self.alive)))
+        self.alive.difference_update(churn)
+        for _ in churn:
+            self.alive.add(self.next_pid)
+            self.next_pid += 1
+
+    def cpu_count(self, logical=True):
+        return self.cores if logical else max(1, self.cores // 2)
+
+    def cpu_percent(self, interval=None, percpu=False):
+        if percpu:
+            return [round(self.value(('cpu', core), 100.0), 1) for core in range(self.cores)]
+        return round(self.value('cpu', 100.0), 1)
+
+    def cpu_times_percent(self, interval=None, percpu=False):
+        user = round(self.value('user', 60.0), 1)
+        system = round(self.value('system', 30.0), 1)
+        iowait = round(self.value('iowait', 10.0), 1)
+        return scputimes(user, 0.0, system, round(100.0 - user - system - iowait, 1), iowait, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+    def cpu_freq(self):
+        return scpufreq(2000.0 + self.value('freq', 1500.0), 800.0, 3500.0)
+
+    def boot_time(self):
+        return 1700000000.0
+
+    def virtual_memory(self):
+        total = 16 * GiB
+        available = int(total * (0.2 + self.value('mem', 0.6)))
+        used = total - available
+        return svmem(total, available, round(used / total * 100, 1), used, available // 2,
+                     used // 2, used // 4, GiB // 8, GiB, GiB // 16, GiB // 32)
+
+    def swap_memory(self):
+        total = 4 * GiB
+        used = int(self.value('swap', total / 4))
+        return sswap(total, used, total - used, round(used / total * 100, 1), self.tick * 4096, self.tick * 4096)
+
+    def net_io_counters(self, pernic=False, nowrap=True):
+        counters = {
+            nic: snetio(self.tick * 125000 * (i + 1), self.tick * 250000 * (i + 1), self.tick * 100,
+                        self.tick * 200, 0, 0, self.tick // 100, 0)
+            for i, nic in enumerate(self.nics)
+        }
+        return counters if pernic else snetio(*map(sum, zip(*counters.values())))
+
+    def disk_io_counters(self, perdisk=False, nowrap=True):
+        counters = {
+            disk: sdiskio(self.tick * 50, self.tick * 80, self.tick * 2 * 1024 ** 2 * (i + 1),
+                          self.tick * 3 * 1024 ** 2 * (i + 1), self.tick, self.tick, 0, 0, self.tick * 300)
+            for i, disk in enumerate(self.disks)
+        }
+        return counters if perdisk else sdiskio(*map(sum, zip(*counters.values())))
+
+    def disk_partitions(self, all=False):
+        return [sdiskpart(f"/dev/{disk}1", mount, "ext4", "rw") for disk, mount in zip(self.disks, self.mounts)]
+
+    def disk_usage(self, path):
+        total = 512 * GiB
+        used = int(total * (0.3 + self.value(('disk', path), 0.01)))
+        return sdiskusage(total, used, total - used, round(used / total * 100, 1))
+
+    def pids(self):
+        return sorted(self.alive)
+
+    def process_iter(self, attrs=None):
+        return [_FakeProcess(self, pid) for pid in sorted(self.alive)]
+
+    def Process(self, pid=None):
+        if pid is None:
+            return _FakeProcess(self, 0)
+        if pid not in self.alive:
+            raise psutil.NoSuchProcess(pid)
+        return _FakeProcess(self, pid)
+
+
+def install_fake(fake):
+    """Point the collector at ``fake`` instead of psutil and the /proc backends"""
+    fake.alive.add(0)  # The monitor's own process
+    collector.psutil = fake
+    collector.LinuxVirtualMemory = None
+    collector.ProcSource = None
+
+
+class _StubLabel:
+    def __init__(self):
+        self.options = {}
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    def cget(self, name):
+        return self.options.get(name)
+
+
+class _StubBox:
+    def __init__(self):
+        self.value_label = _StubLabel()
+        self.state = None
+
+    def set_state(self, state):
+        self.state = state
+
+
+class _StubGauge:
+    # GaugeFrame is plain Tk canvas items; only its bookkeeping runs here
+    def __init__(self):
+        self.value = None
+
+    def set_value(self, percent):
+        self.value = round(min(100.0, max(0.0, percent)), 1)
+
+
+class _StubTree:
+    def __init__(self):
+        self.rows = {}
+
+    def exists(self, iid):
+        return iid in self.rows
+
+    def item(self, iid, values):
+        self.rows[iid] = values
+
+    def insert(self, parent, index, iid, values):
+        self.rows[iid] = values
+
+    def get_children(self):
+        return list(self.rows)
+
+    def delete(self, iid):
+        del self.rows[iid]
+
+
+def offscreen_charts():
+    """GraphFrame and HeatmapFrame drawing on Agg canvases, no Tk widgets"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from charts import GraphFrame, HeatmapFrame
+    from OS import ThemeManager
+
+    colors = ThemeManager().current_theme
+
+    # The Tk frame is never created; the charts set up the same Matplotlib state on an Agg canvas
+    class OffscreenGraph(GraphFrame):
+        def __init__(self, ylim=None, window=60):
+            fig = Figure(figsize=(8, 4), dpi=100)
+            self.setup_plot(fig, fig.add_subplot(), FigureCanvasAgg(fig), colors, "", ylim, window)
+
+    class OffscreenHeatmap(HeatmapFrame):
+        def __init__(self, rows, width=120):
+            fig = Figure(figsize=(8, 3), dpi=100)
+            self.setup_plot(fig, fig.add_subplot(), FigureCanvasAgg(fig), colors, rows, width)
+
+    return OffscreenGraph, OffscreenHeatmap
+
+
+def synthetic_rules(count):
+    """``count`` alert rules spread over the history columns, some of which will fire"""
+    return [
+        Rule(f"rule {i}", HISTORY_COLUMNS[i % len(HISTORY_COLUMNS)], ">" if i % 2 else "<",
+             (i * 37) % 100, duration=(i % 4) * 5, hysteresis=2, cooldown=30)
+        for i in range(count)
+    ]
+
+
+def build_dashboard(history, cores):
+    """Stand-in for SystemMonitor with the attributes the render_* methods read"""
+    OffscreenGraph, OffscreenHeatmap = offscreen_charts()
+
+    def graph(lines, ylim=None):
+        chart = OffscreenGraph(ylim)
+        for key in lines:
+            chart.add_line(key, key, "tab:blue")
+        return chart
+
+    dashboard = SimpleNamespace(
+        history=history,
+        overview_boxes={name: _StubBox() for name in ("CPU", "Memory", "Disk", "Virtual Memory")},
+        cpu_boxes=defaultdict(_StubBox), vm_boxes=defaultdict(_StubBox), mem_boxes=defaultdict(_StubBox),
+        disk_boxes=defaultdict(_StubBox), net_boxes=defaultdict(_StubBox),
+        cpu_gauge=_StubGauge(), vm_gauge=_StubGauge(), mem_gauge=_StubGauge(), disk_gauge=_StubGauge(),
+        cpu_graph=graph(['cpu'], (0, 100)),
+        cpu_heatmap=OffscreenHeatmap(cores),
+        vm_graph=graph(['virtual'], (0, 100)),
+        mem_graph=graph(['memory'], (0, 100)),
+        disk_graph=graph(['disk'], (0, 100)),
+        disk_io_graph=graph(['disk_read_rate', 'disk_write_rate']),
+        net_graph=graph(['net_sent_rate', 'net_recv_rate']),
+        mount_table=_StubTree(), disk_io_table=_StubTree(), process_tree=_StubTree(),
+        net_interface="All", net_interface_menu=_StubLabel(), nic_labels=defaultdict(_StubLabel),
+        process_sort="cpu", alert_table=_StubTree(), shown_alert=None
+    )
+    dashboard.overview_boxes["Performance"] = graph(['cpu', 'memory', 'disk'], (0, 100))
+    return dashboard
+
+
+class StageTimer:
+    """Wall-clock samples per stage, in seconds"""
+    def __init__(self):
+        self.samples = defaultdict(list)
+        # Time spent in wrapped chart methods since the last reset, for splitting renders
+        self.drawn = 0.0
+
+    def wrap(self, stage, function):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.samples[stage].append(elapsed)
+                self.drawn += elapsed
+        return timed
+
+    def summary(self):
+        result = {}
+        for stage, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            result[stage] = {
+                "count": len(ordered),
+                "mean_ms": sum(ordered) / len(ordered) * 1e3,
+                "p50_ms": ordered[len(ordered) // 2] * 1e3,
+                "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e3,
+                "max_ms": ordered[-1] * 1e3
+            }
+        return result
+
+
+# (stage name, SystemMonitor render method, dashboard attributes holding its charts)
+SECTIONS = (
+    ("overview", "render_overview", ()),
+    ("cpu", "render_cpu", ("cpu_graph", "cpu_heatmap")),
+    ("memory", "render_memory", ("mem_graph",)),
+    ("virtual_memory", "render_virtual_memory", ("vm_graph",)),
+    ("disk", "render_disk", ("disk_graph", "disk_io_graph")),
+    ("network", "render_network", ("net_graph",)),
+    ("processes", "render_processes", ()),
+    ("alerts", "render_alerts", ())
+)
+CHART_METHODS = ("plot_history", "redraw")
+
+
+class TickBench:
+    """One collector, history and dashboard, driven a tick at a time"""
+    def __init__(self, args):
+        from history import TieredHistory
+        from OS import SystemMonitor
+
+        self.fake = None
+        if args.provider == "fake":
+            self.fake = FakePsutil(args.seed, args.cores, args.nics, args.disks, args.processes)
+            install_fake(self.fake)
+        self.interval = args.interval
+        self.collector = MetricsCollector(interval=args.interval, fast_path=args.provider == "procfs")
+        if args.processes == 0:
+            self.collector.process_table.refresh = lambda: {'cpu': [], 'rss': [], 'io': []}
+        self.history = TieredHistory(HISTORY_COLUMNS, capacity=3600, resolution=args.interval)
+        self.dashboard = build_dashboard(self.history, self.collector.thread_count)
+        self.dashboard.update_table = partial(SystemMonitor.update_table, self.dashboard)
+        self.dashboard.alerts = AlertEngine(synthetic_rules(args.rules))
+        self.dashboard.ALERT_BOXES = SystemMonitor.ALERT_BOXES
+        self.dashboard.apply_alert_states = partial(SystemMonitor.apply_alert_states, self.dashboard)
+
+        self.timer = StageTimer()
+        self._time_chart("overview_graph", self.dashboard.overview_boxes["Performance"])
+        self.renderers = []
+        for stage, method, charts in SECTIONS:
+            for attr in charts:
+                self._time_chart(attr, getattr(self.dashboard, attr))
+            self.renderers.append((stage, partial(getattr(SystemMonitor, method), self.dashboard)))
+        self.origin = time.monotonic()
+        self.tick = 0
+
+    def _time_chart(self, name, chart):
+        for method in CHART_METHODS:
+            if hasattr(chart, method):
+                setattr(chart, method, self.timer.wrap(f"draw.{name}", getattr(chart, method)))
+
+    def _collect(self):
+        if self.fake is not None:
+            self.fake.advance()
+        # Timestamps advance by exactly one interval per tick, as with the real scheduler
+        sample = self.collector.collect(self.tick, self.origin + self.tick * self.interval)
+        self.tick += 1
+        return sample
+
+    def _record(self, sample):
+        values = history_values(sample)
+        self.history.append(sample.time, values)
+        self.dashboard.cpu_heatmap.push(sample.per_cpu)
+        return values
+
+    def _alert(self, sample, values):
+        if self.dashboard.alerts.update(sample.time, values):
+            self.dashboard.apply_alert_states()
+
+    def run_tick(self):
+        """One full tick, with its stage timings added to the timer"""
+        samples = self.timer.samples
+        tick_started = started = time.perf_counter()
+        sample = self._collect()
+        samples["collect"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        values = self._record(sample)
+        samples["history_append"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        self._alert(sample, values)
+        samples["alerts"].append(time.perf_counter() - started)
+
+        for stage, render in self.renderers:
+            self.timer.drawn = 0.0
+            started = time.perf_counter()
+            render(sample)
+            elapsed = time.perf_counter() - started
+            samples[f"render.{stage}"].append(elapsed)
+            # Label and table updates: whatever the render did besides drawing charts
+            samples[f"labels.{stage}"].append(elapsed - self.timer.drawn)
+        samples["tick"].append(time.perf_counter() - tick_started)
+
+    def allocations(self, ticks):
+        """Net allocated blocks and peak traced bytes per tick, per stage"""
+        blocks = defaultdict(list)
+        peaks = defaultdict(list)
+
+        def traced(stage, function, *args):
+            before = sys.getallocatedblocks()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            result = function(*args)
+            blocks[stage].append(sys.getallocatedblocks() - before)
+            peaks[stage].append(tracemalloc.get_traced_memory()[1] - base)
+            return result
+
+        def tick():
+            sample = traced("collect", self._collect)
+            values = traced("history_append", self._record, sample)
+            traced("alerts", self._alert, sample, values)
+            for stage, render in self.renderers:
+                traced(f"render.{stage}", render, sample)
+
+        tracemalloc.start()
+        try:
+            for _ in range(ticks):
+                traced("tick", tick)
+        finally:
+            tracemalloc.stop()
+        return {
+            stage: {
+                "net_blocks_per_tick": sum(blocks[stage]) / len(blocks[stage]),
+                "peak_bytes": max(peaks[stage])
+            }
+            for stage in sorted(blocks)
+        }
+
+
+def import_time(module):
+    """Seconds to import ``module`` in a fresh interpreter"""
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    # Run beside the modules, so it works from any directory
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def startup(args):
+    results = {
+        "import_dashboard_s": import_time("OS"),
+        "import_charts_s": import_time("charts"),
+        "import_collector_s": import_time("collector")
+    }
+    started = time.perf_counter()
+    bench = TickBench(args)
+    results["construct_s"] = time.perf_counter() - started
+    started = time.perf_counter()
+    bench.run_tick()
+    results["first_tick_s"] = time.perf_counter() - started
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the per-tick cost of the dashboard")
+    parser.add_argument("--ticks", type=int, default=300, help="measured ticks")
+    parser.add_argument("--warmup", type=int, default=20, help="ticks run before measuring")
+    parser.add_argument("--interval", type=float, default=1.0, help="simulated seconds between samples")
+    parser.add_argument("--provider", choices=("fake", "psutil", "procfs"), default="fake",
+                        help="where samples come from; only 'fake' is deterministic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cores", type=int, default=8)
+    parser.add_argument("--nics", type=int, default=4)
+    parser.add_argument("--disks", type=int, default=4)
+    parser.add_argument("--processes", type=int, default=300, help="0 skips the process table")
+    parser.add_argument("--rules", type=int, default=200, help="synthetic alert rules evaluated per tick")
+    parser.add_argument("--allocation-ticks", type=int, default=50)
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--no-startup", action="store_true", help="skip the import and startup timings")
+    parser.add_argument("--output", default="-", help="JSON file to write, '-' for stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {
+        "config": vars(args).copy(),
+        "python": sys.version.split()[0],
+        "platform": sys.platform
+    }
+    if not args.no_startup:
+        results["startup"] = startup(args)
+
+    bench = TickBench(args)
+    for _ in range(args.warmup):
+        bench.run_tick()
+    bench.timer.samples.clear()
+    for _ in range(args.ticks):
+        bench.run_tick()
+    results["stages"] = bench.timer.summary()
+    if not args.no_allocations:
+        results["allocations"] = bench.allocations(args.allocation_ticks)
+    bench.collector.close()
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import customtkinter as ctk
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import matplotlib.dates as mdates
+import numpy as np
+from datetime import datetime
+
+# Matplotlib-backed widgets. Imported when the first section with a chart is built,
+# so the window can appear before Matplotlib has loaded.
+
+# Define a GraphFrame class for plotting graphs
+class GraphFrame(ctk.CTkFrame):
+    # Extra room past the newest sample so the x-axis only relayouts now and then
+    X_SLACK = 0.25
+    # Zoom buttons and the time span (seconds) each one shows
+    RANGES = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600}
+
+    def __init__(self, master, title, ylabel, ylim=None, window=60, **kwargs):
+        super().__init__(master, **kwargs)
+        
+        main_window = self.winfo_toplevel()
+        colors = main_window.colors
+        
+        self.configure(
+            fg_color=colors["surface"],
+            corner_radius=15,
+            border_width=1,
+            border_color=colors["border"]
+        )
+        
+        # Modern header with gradient
+        header = ctk.CTkFrame(self, fg_color="transparent", height=40)
+        header.pack(fill="x", padx=15, pady=(15,5))
+        
+        self.title_label = ctk.CTkLabel(
+            header,
+            text=title,
+            font=ctk.CTkFont(size=16, weight="bold"),
+            text_color=colors["accent"]
+        )
+        self.title_label.pack(side="left")
+        
+        # Enhanced zoom controls
+        zoom_frame = ctk.CTkFrame(header, fg_color="transparent")
+        zoom_frame.pack(side="right")
+        
+        self.time_buttons = {}
+        self.selected_range = None
+        for r in self.RANGES:
+            btn = ctk.CTkButton(
+                zoom_frame,
+                text=r,
+                command=lambda r=r: self.set_range(r),
+                width=45,
+                height=28,
+                corner_radius=8,
+                fg_color=colors["surface"],
+                hover_color=colors["accent"],
+                text_color=colors["text"],
+                font=ctk.CTkFont(size=12, weight="bold"),
+                border_width=1,
+                border_color=colors["border"]
+            )
+            btn.pack(side="left", padx=2)
+            self.time_buttons[r] = btn
+        
+        # Enhanced graph styling
+        plt.style.use('dark_background')
+        fig, ax = plt.subplots(figsize=(8, 4), dpi=100)
+        canvas = FigureCanvasTkAgg(fig, self)
+        canvas.get_tk_widget().pack(fill="both", expand=True, padx=15, pady=15)
+        self.setup_plot(fig, ax, canvas, colors, ylabel, ylim, window)
+
+        main_window.theme_manager.register_callback(self.apply_theme)
+
+    def setup_plot(self, fig, ax, canvas, colors, ylabel, ylim=None, window=60):
+        """Matplotlib state of the chart drawn by ``canvas``; also used by bench.py's offscreen charts"""
+        self.fig, self.ax, self.canvas = fig, ax, canvas
+
+        # Static axes decoration is set up once, not on every tick
+        local_tz = datetime.now().astimezone().tzinfo
+        self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S', tz=local_tz))
+        self.ax.set_xlabel("Time", labelpad=10)
+        self.ax.set_ylabel(ylabel, labelpad=10)
+        self.colors = colors
+        self.style_axes(colors)
+
+        # Long-lived line artists, updated in place and blitted over a cached background
+        self.lines = {}
+        self.window = window  # Visible time span in seconds
+        self.fixed_ylim = ylim
+        if ylim is not None:
+            self.ax.set_ylim(*ylim)
+        self._xlim_window = None
+        self._background = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def add_line(self, key, label, color, linewidth=1.5):
+        line, = self.ax.plot([], [], label=label, color=color, linewidth=linewidth, animated=True)
+        self.lines[key] = line
+        self.ax.legend(
+            loc='upper right',
+            facecolor=self.colors["surface"],
+            edgecolor=self.colors["border"],
+            labelcolor=self.colors["text"]
+        )
+        return line
+
+    def style_axes(self, colors):
+        """Colour the figure, grid, ticks, spines, labels and legend from the theme"""
+        self.ax.set_facecolor(colors["surface"])
+        self.fig.patch.set_facecolor(colors["surface"])
+        self.ax.grid(True, linestyle='--', alpha=0.2, color=colors["border"])
+        self.ax.tick_params(colors=colors["text"], labelsize=9)
+        for spine in self.ax.spines.values():
+            spine.set_color(colors["border"])
+            spine.set_linewidth(0.5)
+        self.ax.xaxis.label.set_color(colors["text"])
+        self.ax.yaxis.label.set_color(colors["text"])
+        legend = self.ax.get_legend()
+        if legend is not None:
+            legend.get_frame().set_facecolor(colors["surface"])
+            legend.get_frame().set_edgecolor(colors["border"])
+            for text in legend.get_texts():
+                text.set_color(colors["text"])
+
+    def apply_theme(self, colors):
+        """Restyle for a new theme without drawing; the next update_lines redraws in full"""
+        self.colors = colors
+        self.configure(fg_color=colors["surface"], border_color=colors["border"])
+        self.title_label.configure(text_color=colors["accent"])
+        for name, btn in self.time_buttons.items():
+            btn.configure(
+                fg_color=colors["accent_secondary"] if name == self.selected_range else colors["surface"],
+                hover_color=colors["accent"],
+                text_color=colors["text"],
+                border_color=colors["border"]
+            )
+        self.style_axes(colors)
+        # The cached background still has the old colours
+        self._background = None
+
+    def rebind_lines(self, keys):
+        """Point the existing lines at other history columns, in order"""
+        self.lines = dict(zip(keys, self.lines.values()))
+
+    def set_range(self, range_name):
+        colors = self.winfo_toplevel().colors
+        self.window = self.RANGES[range_name]
+        self.selected_range = range_name
+        for name, btn in self.time_buttons.items():
+            btn.configure(fg_color=colors["accent_secondary"] if name == range_name else colors["surface"])
+
+        # Redraw right away from the history store instead of waiting for the next sample
+        history = getattr(self.winfo_toplevel(), 'history', None)
+        if history is not None:
+            self.plot_history(history)
+
+    def plot_history(self, history):
+        """Plot this graph's lines from the matching columns of the history store"""
+        # Longer ranges come from pre-aggregated rollups, so the point count stays bounded
+        times, series = history.window(self.window, [key for key in self.lines if key in history.columns])
+        # Columns the store does not have (e.g. an interface another host lacks) plot as gaps
+        for key in self.lines.keys() - series.keys():
+            series[key] = np.full(len(times), np.nan)
+        self.update_lines(times, series)
+
+    def update_lines(self, times, series):
+        """Move the line artists to new data, relayouting the axes only when needed"""
+        x = np.asarray(times) / 86400.0  # Epoch seconds to Matplotlib date numbers
+        for key, values in series.items():
+            self.lines[key].set_data(x, values)
+
+        if self._relayout(x, series.values()) or self._background is None:
+            # Ticks or limits changed: full draw, which also refreshes the background
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_lines()
+            self.canvas.blit(self.ax.bbox)
+
+    def _relayout(self, x, series):
+        if len(x) == 0:
+            return False
+        changed = False
+
+        # Scroll the time window in steps instead of on every sample
+        span = self.window / 86400  # Date numbers are in days
+        x_min, x_max = self.ax.get_xlim()
+        if x[-1] > x_max or x[-1] < x_min or self._xlim_window != self.window:
+            self.ax.set_xlim(x[-1] - span, x[-1] + span * self.X_SLACK)
+            self._xlim_window = self.window
+            changed = True
+
+        if self.fixed_ylim is None:
+            # Series with no readings in view (all NaN) have no range to fit
+            series = [values for values in series if np.isfinite(values).any()]
+            if series:
+                lo = min(float(np.nanmin(values)) for values in series)
+                hi = max(float(np.nanmax(values)) for values in series)
+                y_min, y_max = self.ax.get_ylim()
+                # Grow when data leaves the range, shrink when it only fills a sliver of it
+                pad = max((hi - lo) * 0.1, 1.0)
+                if lo < y_min or hi > y_max or (hi - lo + 2 * pad) < 0.25 * (y_max - y_min):
+                    self.ax.set_ylim(lo - pad, hi + pad)
+                    changed = True
+        return changed
+
+    def _on_draw(self, event):
+        # Cache everything but the lines, then draw the lines on top
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+# Core-by-time heatmap drawn as one image from a 2-D NumPy buffer
+class HeatmapFrame(ctk.CTkFrame):
+    def __init__(self, master, title, rows, width=120, **kwargs):
+        super().__init__(master, **kwargs)
+
+        main_window = self.winfo_toplevel()
+        colors = main_window.colors
+
+        self.configure(
+            fg_color=colors["surface"],
+            corner_radius=15,
+            border_width=1,
+            border_color=colors["border"]
+        )
+
+        self.title_label = ctk.CTkLabel(
+            self,
+            text=title,
+            font=ctk.CTkFont(size=16, weight="bold"),
+            text_color=colors["accent"]
+        )
+        self.title_label.pack(anchor="w", padx=15, pady=(15, 5))
+
+        fig, ax = plt.subplots(figsize=(8, 3), dpi=100)
+        canvas = FigureCanvasTkAgg(fig, self)
+        canvas.get_tk_widget().pack(fill="both", expand=True, padx=15, pady=15)
+        self.setup_plot(fig, ax, canvas, colors, rows, width)
+
+        main_window.theme_manager.register_callback(self.apply_theme)
+
+    def setup_plot(self, fig, ax, canvas, colors, rows, width=120):
+        """Matplotlib state of the heatmap drawn by ``canvas``; also used by bench.py's offscreen charts"""
+        self.fig, self.ax, self.canvas = fig, ax, canvas
+        # One row per core, one column per sample; the newest sample is on the right
+        self.buffer = np.zeros((rows, width))
+
+        self.ax.set_xlabel("Samples", labelpad=10)
+        self.ax.set_ylabel("Core", labelpad=10)
+
+        self.image = self.ax.imshow(
+            self.buffer, aspect='auto', origin='lower', cmap='inferno',
+            vmin=0, vmax=100, interpolation='nearest', animated=True,
+            extent=(-width, 0, -0.5, rows - 0.5)
+        )
+        self.colorbar = self.fig.colorbar(self.image, ax=self.ax, label="%")
+        self.style_axes(colors)
+
+        self._background = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def style_axes(self, colors):
+        self.fig.patch.set_facecolor(colors["surface"])
+        for ax in (self.ax, self.colorbar.ax):
+            ax.set_facecolor(colors["surface"])
+            ax.tick_params(colors=colors["text"], labelsize=9)
+            ax.xaxis.label.set_color(colors["text"])
+            ax.yaxis.label.set_color(colors["text"])
+
+    def apply_theme(self, colors):
+        """Restyle for a new theme without drawing; the next redraw is a full one"""
+        self.configure(fg_color=colors["surface"], border_color=colors["border"])
+        self.title_label.configure(text_color=colors["accent"])
+        self.style_axes(colors)
+        self._background = None
+
+    def reset(self, rows):
+        """Start over with ``rows`` cores, e.g. after switching to another host"""
+        width = self.buffer.shape[1]
+        self.buffer = np.zeros((rows, width))
+        self.image.set_data(self.buffer)
+        self.image.set_extent((-width, 0, -0.5, rows - 0.5))
+        self.ax.set_ylim(-0.5, rows - 0.5)
+        self._background = None
+
+    def push(self, values):
+        """Shift the buffer one column left and write the newest sample"""
+        self.buffer[:, :-1] = self.buffer[:, 1:]
+        self.buffer[:, -1] = values
+
+    def redraw(self):
+        self.image.set_data(self.buffer)
+        if self._background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.image)
+        self.canvas.blit(self.ax.bbox)
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.image)
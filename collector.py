@@ -0,0 +1,606 @@
+import heapq
+import os
+import queue
+import select
+import sys
+import time
+from collections import deque, namedtuple
+from threading import Thread, Event
+
+import psutil
+
+from scheduler import TickScheduler
+
+if sys.platform.startswith('linux'):
+    from procfs import LinuxVirtualMemory, ProcSource
+else:
+    LinuxVirtualMemory = ProcSource = None
+
+
+# Columns recorded into the history store and journal, in storage order.
+# Per-interface ("net.<nic>.<field>") and per-device ("disk.<device>.<field>")
+# series are added as interfaces and devices show up.
+HISTORY_COLUMNS = (
+    'cpu', 'memory', 'virtual', 'disk', 'net_sent_rate', 'net_recv_rate',
+    'disk_read_rate', 'disk_write_rate'
+)
+
+
+def network_column(nic, field):
+    return f"net.{nic}.{field}"
+
+
+def disk_column(device, field):
+    return f"disk.{device}.{field}"
+
+
+def history_values(sample):
+    """Map a Snapshot onto history columns"""
+    values = {
+        'cpu': sample.cpu_percent,
+        'memory': sample.virtual.percent,
+        'virtual': sample.virtual.percent,
+        'disk': sample.disk.percent,
+        'net_sent_rate': sample.net_sent_rate,
+        'net_recv_rate': sample.net_recv_rate,
+        'disk_read_rate': sample.disk_read_rate,
+        'disk_write_rate': sample.disk_write_rate
+    }
+    for nic, rates in sample.net_rates.items():
+        for field, value in zip(NicRates._fields, rates):
+            values[network_column(nic, field)] = value
+    for device, rates in sample.disk_io.items():
+        for field, value in zip(DiskRates._fields, rates):
+            values[disk_column(device, field)] = value
+    if sample.vm is not None:
+        values.update({
+            'page_fault_rate': sample.vm.page_faults,
+            'major_fault_rate': sample.vm.major_faults,
+            'swap_in_rate': sample.vm.swap_in,
+            'swap_out_rate': sample.vm.swap_out,
+            'memory_pressure': sample.vm.pressure_some
+        })
+    return values
+
+
+def _plain(value):
+    if hasattr(value, '_asdict'):
+        return {key: _plain(item) for key, item in value._asdict().items()}
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def sample_to_record(sample):
+    """Flatten a Snapshot into plain JSON-serialisable values"""
+    return _plain(sample)
+
+
+# Everything collected in one tick. Built once and shared read-only by every
+# section, the history store and the exporters, so they all see the same instant.
+Snapshot = namedtuple('Snapshot', [
+    'time', 'cpu_percent', 'per_cpu', 'cpu_times_percent', 'cpu_freq', 'core_count', 'thread_count',
+    'virtual', 'swap', 'vm', 'disk', 'disk_usage', 'disk_partitions', 'disk_io', 'disk_read_rate',
+    'disk_write_rate', 'process_memory', 'bytes_sent', 'bytes_recv', 'net_pernic', 'net_rates',
+    'net_sent_rate', 'net_recv_rate', 'processes', 'monitor'
+])
+
+
+# The monitor's own footprint. Durations are seconds over the most recent ticks and
+# renders (None until there are any); missed_ticks counts since the collector started.
+MonitorStats = namedtuple('MonitorStats', [
+    'cpu_percent', 'rss', 'tick_p50', 'tick_p99', 'render_p50', 'render_p99', 'missed_ticks', 'queue_depth'
+])
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+# Per-second rates for one network interface
+NicRates = namedtuple('NicRates', ['bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv', 'errors', 'drops'])
+
+
+# Turns cumulative per-interface counters into rates between two samples
+class NetworkRates:
+    def __init__(self):
+        self._last = {}
+        self._last_time = None
+
+    @staticmethod
+    def _delta(new, old):
+        # A counter that went backwards wrapped or was reset (interface re-created);
+        # count from zero instead of reporting a huge negative rate
+        return new - old if new >= old else new
+
+    def update(self, counters, now):
+        """Rates for every interface seen in both this and the previous call"""
+        current = {
+            nic: (c.bytes_sent, c.bytes_recv, c.packets_sent, c.packets_recv,
+                  c.errin + c.errout, c.dropin + c.dropout)
+            for nic, c in counters.items()
+        }
+        rates = {}
+        if self._last_time is not None and now > self._last_time:
+            elapsed = now - self._last_time
+            for nic, values in current.items():
+                previous = self._last.get(nic)
+                # Hot-plugged interfaces get rates from their second sample on
+                if previous is not None:
+                    rates[nic] = NicRates(*(self._delta(new, old) / elapsed for new, old in zip(values, previous)))
+        # Interfaces that disappeared are forgotten here
+        self._last = current
+        self._last_time = now
+        return rates
+
+
+# Per-second I/O for one block device; busy is the percentage of time with I/O in flight
+DiskRates = namedtuple('DiskRates', ['read_bytes', 'write_bytes', 'iops', 'busy'])
+
+
+# Usage for every mounted filesystem plus per-device I/O rates
+class DiskMonitor:
+    MOUNTS_FILE = "/proc/self/mounts"
+    # Where the kernel cannot signal mount changes, rescan this often (seconds)
+    RESCAN_INTERVAL = 30.0
+
+    def __init__(self):
+        self.partitions = []
+        self._mountpoints = []
+        self._scanned_at = None
+        self._last_io = {}
+        self._last_time = None
+        self._whole_disk = {}
+
+        # On Linux, poll() on the mount table reports POLLPRI/POLLERR after a change
+        self._mount_poll = None
+        self._mounts_fd = None
+        if os.path.exists(self.MOUNTS_FILE) and hasattr(select, 'poll'):
+            self._mounts_fd = os.open(self.MOUNTS_FILE, os.O_RDONLY)
+            self._mount_poll = select.poll()
+            self._mount_poll.register(self._mounts_fd, select.POLLPRI | select.POLLERR)
+
+    def _mounts_changed(self, now):
+        if self._scanned_at is None:
+            return True
+        if self._mount_poll is None:
+            return now - self._scanned_at >= self.RESCAN_INTERVAL
+        if not self._mount_poll.poll(0):
+            return False
+        # Reading the file to the end re-arms the notification
+        os.lseek(self._mounts_fd, 0, os.SEEK_SET)
+        while os.read(self._mounts_fd, 65536):
+            pass
+        return True
+
+    def close(self):
+        if self._mounts_fd is not None:
+            self._mount_poll.unregister(self._mounts_fd)
+            os.close(self._mounts_fd)
+            # Any later use falls back to rescanning on a timer
+            self._mounts_fd = None
+            self._mount_poll = None
+
+    def usage(self, now):
+        """One disk_usage() per mounted filesystem and for "/", keyed by mount point"""
+        if self._mounts_changed(now):
+            self.partitions = psutil.disk_partitions(all=False)
+            self._mountpoints = [partition.mountpoint for partition in self.partitions]
+            # The overview shows "/", which containers often leave out of the physical partitions
+            if '/' not in self._mountpoints:
+                self._mountpoints.append('/')
+            self._scanned_at = now
+        usage = {}
+        for mountpoint in self._mountpoints:
+            try:
+                usage[mountpoint] = psutil.disk_usage(mountpoint)
+            except OSError:
+                # Unmounted since the last scan, or not readable (e.g. an empty drive)
+                pass
+        return usage
+
+    def is_whole_disk(self, device):
+        """False for partitions (sda1 next to sda), so totals do not count bytes twice"""
+        if device not in self._whole_disk:
+            # Only whole block devices have an entry in /sys/block; elsewhere count everything
+            self._whole_disk[device] = not os.path.isdir("/sys/block") or os.path.exists(f"/sys/block/{device}")
+        return self._whole_disk[device]
+
+    def io_rates(self, counters, now):
+        """Per-device rates between this and the previous set of counters"""
+        current = {
+            device: (c.read_bytes, c.write_bytes, c.read_count + c.write_count, getattr(c, 'busy_time', 0))
+            for device, c in counters.items()
+        }
+        rates = {}
+        if self._last_time is not None and now > self._last_time:
+            elapsed = now - self._last_time
+            for device, values in current.items():
+                previous = self._last_io.get(device)
+                if previous is None:
+                    continue
+                read_bytes, write_bytes, ops, busy = (max(0, new - old) for new, old in zip(values, previous))
+                rates[device] = DiskRates(
+                    read_bytes / elapsed,
+                    write_bytes / elapsed,
+                    ops / elapsed,
+                    min(100.0, busy / (elapsed * 10))  # busy_time is in milliseconds
+                )
+        self._last_io = current
+        self._last_time = now
+        return rates
+
+
+ProcessRow = namedtuple('ProcessRow', ['pid', 'name', 'username', 'cpu_percent', 'rss', 'io_rate'])
+
+
+class _ProcessEntry:
+    __slots__ = ('process', 'name', 'username', 'cpu_percent', 'rss', 'io_bytes', 'io_rate', 'io_time')
+
+    def __init__(self, process, name, username):
+        self.process = process
+        self.name = name
+        self.username = username
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.io_bytes = None
+        self.io_rate = 0.0
+        self.io_time = None
+
+
+# Top-N process table that reuses psutil.Process handles between ticks
+class ProcessTable:
+    # Read once, when a PID first shows up
+    STATIC_ATTRS = ['pid', 'name', 'username']
+    # Sort keys for the three top-N lists
+    SORT_KEYS = {'cpu': 'cpu_percent', 'rss': 'rss', 'io': 'io_rate'}
+
+    def __init__(self, top_n=15, sweep_budget=50):
+        self.top_n = top_n
+        # The current leaders are re-read on every tick, plus the next `sweep_budget`
+        # other processes in round-robin order, so a full pass takes len / sweep_budget
+        # ticks and the per-tick cost does not grow with the process count
+        self.sweep_budget = sweep_budget
+        self._entries = {}
+        self._sweep = deque()
+        self._queued = set()
+        self._hot = set()
+        # PIDs added since the last refresh, ranked along with the re-read ones
+        self._new = set()
+        self._primed = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _add(self, pid, info, process):
+        entry = _ProcessEntry(process, info.get('name') or '', info.get('username') or '')
+        try:
+            # The first call only sets the baseline for later CPU deltas
+            process.cpu_percent(None)
+        except psutil.Error:
+            return
+        self._entries[pid] = entry
+        self._new.add(pid)
+        if pid not in self._queued:
+            self._queued.add(pid)
+            self._sweep.append(pid)
+
+    def _add_pid(self, pid):
+        try:
+            process = psutil.Process(pid)
+            self._add(pid, process.as_dict(self.STATIC_ATTRS), process)
+        except psutil.Error:
+            pass
+
+    def _remove(self, pid):
+        # Its place in the sweep is dropped when the sweep reaches it
+        self._entries.pop(pid, None)
+        self._hot.discard(pid)
+        self._new.discard(pid)
+
+    def _sync_pids(self):
+        if not self._primed:
+            for process in psutil.process_iter(self.STATIC_ATTRS):
+                self._add(process.info['pid'], process.info, process)
+            self._primed = True
+            return
+
+        # Only new and exited PIDs cost anything beyond a directory listing
+        pids = set(psutil.pids())
+        known = self._entries.keys()
+        for pid in known - pids:
+            self._remove(pid)
+        for pid in pids - known:
+            self._add_pid(pid)
+
+    def _update(self, pid, now):
+        entry = self._entries.get(pid)
+        if entry is None:
+            return
+        process = entry.process
+        # Between two listings a PID can pass to a new process; psutil tells them apart
+        # by creation time, and the new one starts over with its own name and baselines
+        if not process.is_running():
+            self._remove(pid)
+            self._add_pid(pid)
+            return
+        try:
+            with process.oneshot():
+                entry.cpu_percent = process.cpu_percent(None)
+                entry.rss = process.memory_info().rss
+                try:
+                    io = process.io_counters()
+                    io_bytes = io.read_bytes + io.write_bytes
+                except (psutil.AccessDenied, AttributeError):
+                    io_bytes = None
+        except psutil.NoSuchProcess:
+            self._remove(pid)
+            return
+        except psutil.AccessDenied:
+            return
+
+        if io_bytes is not None and entry.io_bytes is not None and now > entry.io_time:
+            entry.io_rate = max(0.0, (io_bytes - entry.io_bytes) / (now - entry.io_time))
+        entry.io_bytes = io_bytes
+        entry.io_time = now
+
+    def _next_cold(self):
+        """The next ``sweep_budget`` live PIDs in the sweep, which move to its back"""
+        pids = []
+        for _ in range(len(self._sweep)):
+            if len(pids) >= self.sweep_budget:
+                break
+            pid = self._sweep.popleft()
+            if pid not in self._entries:
+                self._queued.discard(pid)
+                continue
+            self._sweep.append(pid)
+            if pid not in self._hot:
+                pids.append(pid)
+        return pids
+
+    def refresh(self):
+        """Update the table and return the top-N rows for every sort key"""
+        self._sync_pids()
+        now = time.monotonic()
+        updated = self._hot | set(self._next_cold())
+        for pid in updated:
+            self._update(pid, now)
+
+        # Values only change for the processes read this tick, so only they (and new
+        # ones) can overtake the leaders; the rest are ranked when the sweep reaches them
+        candidates = (updated | self._new) & self._entries.keys()
+        self._new = set()
+        top = {}
+        self._hot = set()
+        for key, attr in self.SORT_KEYS.items():
+            leaders = heapq.nlargest(
+                self.top_n, ((pid, self._entries[pid]) for pid in candidates),
+                key=lambda item: getattr(item[1], attr)
+            )
+            top[key] = [
+                ProcessRow(pid, entry.name, entry.username, entry.cpu_percent, entry.rss, entry.io_rate)
+                for pid, entry in leaders
+            ]
+            self._hot.update(pid for pid, _ in leaders)
+        return top
+
+
+# Hot-tick metrics through psutil; procfs.ProcSource is the Linux fast path with the same interface
+class PsutilSource:
+    def __init__(self):
+        # Commit charge, fault and swap rates come from /proc on Linux; None elsewhere
+        self.vm_backend = LinuxVirtualMemory() if LinuxVirtualMemory is not None else None
+
+    def cpu(self):
+        """(overall percent, per-CPU percents, CPU time percentages) since the previous call"""
+        return psutil.cpu_percent(), psutil.cpu_percent(percpu=True), psutil.cpu_times_percent()
+
+    def memory(self, now):
+        vm = self.vm_backend.sample(now) if self.vm_backend is not None else None
+        return psutil.virtual_memory(), psutil.swap_memory(), vm
+
+    def net_io_counters(self):
+        return psutil.net_io_counters(pernic=True, nowrap=True)
+
+    def disk_io_counters(self):
+        return psutil.disk_io_counters(perdisk=True, nowrap=True) or {}
+
+    def close(self):
+        if self.vm_backend is not None:
+            self.vm_backend.close()
+
+
+def open_source(fast_path=True):
+    """The /proc fast path where it is available, psutil otherwise"""
+    if fast_path and ProcSource is not None:
+        try:
+            return ProcSource()
+        except OSError as e:
+            print(f"/proc fast path unavailable, using psutil: {e}")
+    return PsutilSource()
+
+
+# Tk-free sampling engine. It only produces samples; rendering happens elsewhere.
+class MetricsCollector:
+    # Metrics that can be given their own sample rate; between readings a Snapshot
+    # carries the group's last values
+    SAMPLE_GROUPS = ('cpu', 'cpu_freq', 'memory', 'network', 'disk_io', 'disk_usage', 'processes')
+    # How many recent ticks and renders the self-instrumentation percentiles cover
+    STATS_WINDOW = 300
+    # Own CPU use is averaged over this many seconds; CPU time advances in whole
+    # scheduler ticks, so a per-interval figure would flicker between 0 and 5%
+    CPU_WINDOW = 10.0
+
+    def __init__(self, interval=1.0, maxsize=120, fast_path=True, sample_rates=None):
+        self.interval = interval
+        # Seconds between readings per group, rounded to whole ticks; the rest every tick
+        self.sample_every = {}
+        for group, seconds in (sample_rates or {}).items():
+            if group not in self.SAMPLE_GROUPS:
+                raise ValueError(f"Unknown metric group: {group}")
+            self.sample_every[group] = max(1, round(seconds / interval))
+        self.scheduler = TickScheduler(interval)
+        # Samples waiting to be consumed by the UI (or any other reader)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.process = psutil.Process()
+        # Fixed for the life of the process, so not re-read every tick
+        self.core_count = psutil.cpu_count(logical=False)
+        self.thread_count = psutil.cpu_count(logical=True)
+        self.process_table = ProcessTable()
+        self.network_rates = NetworkRates()
+        self.disk_monitor = DiskMonitor()
+        # Where CPU, memory, network and disk counters are read from
+        self.source = open_source(fast_path)
+        # Called with every sample on the collector thread (exporters and the like)
+        self.listeners = []
+        self._stop_event = Event()
+        self._thread = None
+        # Durations of recent ticks (collect, publish, listeners) and of UI renders
+        self.tick_durations = deque(maxlen=self.STATS_WINDOW)
+        self.render_durations = deque(maxlen=self.STATS_WINDOW)
+        self._cpu_times = deque(maxlen=max(2, round(self.CPU_WINDOW / interval) + 1))
+        # Last reading and the tick it was taken on, per group
+        self._readings = {}
+        self._read_at = {}
+        # Wall-clock anchor for timestamps that advance on the monotonic clock
+        self._wall_anchor = time.time()
+        self._monotonic_anchor = time.monotonic()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name="metrics-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def close(self):
+        """Stop sampling for good and release the open /proc descriptors"""
+        self.stop()
+        self.source.close()
+        self.disk_monitor.close()
+
+    def timestamp(self, monotonic=None):
+        """Epoch seconds that never jump when the system clock is adjusted"""
+        if monotonic is None:
+            monotonic = time.monotonic()
+        return self._wall_anchor + (monotonic - self._monotonic_anchor)
+
+    def _sample(self, group, tick, read):
+        # Re-read a group once its interval has passed; ticks may be skipped, so not tick % every
+        last = self._read_at.get(group)
+        if last is None or tick is None or tick - last >= self.sample_every.get(group, 1) or tick < last:
+            self._readings[group] = read()
+            self._read_at[group] = tick
+        return self._readings[group]
+
+    def _network(self, now):
+        # One read of the per-interface counters feeds both totals and rates
+        net_pernic = self.source.net_io_counters()
+        return net_pernic, self.network_rates.update(net_pernic, now)
+
+    def collect(self, tick=None, scheduled=None):
+        """Take one Snapshot of every metric the dashboard shows
+
+        ``tick`` is the scheduler tick, used for per-group sample rates (None reads
+        everything); ``scheduled`` is the monotonic time the tick was due, used as the
+        sample's timestamp so samples are evenly spaced.
+        """
+        now = time.monotonic()
+        net_pernic, net_rates = self._sample('network', tick, lambda: self._network(now))
+        disk_usage = self._sample('disk_usage', tick, lambda: self.disk_monitor.usage(now))
+        disk_io = self._sample(
+            'disk_io', tick, lambda: self.disk_monitor.io_rates(self.source.disk_io_counters(), now)
+        )
+        cpu_percent, per_cpu, cpu_times_percent = self._sample('cpu', tick, self.source.cpu)
+        virtual, swap, vm = self._sample('memory', tick, lambda: self.source.memory(now))
+        process_memory = self.process.memory_info()
+        return Snapshot(
+            time=self.timestamp(now if scheduled is None else scheduled),
+            cpu_percent=cpu_percent,
+            per_cpu=per_cpu,
+            cpu_times_percent=cpu_times_percent,
+            cpu_freq=self._sample('cpu_freq', tick, lambda: psutil.cpu_freq().current),
+            core_count=self.core_count,
+            thread_count=self.thread_count,
+            virtual=virtual,
+            swap=swap,
+            vm=vm,
+            disk=disk_usage['/'],
+            disk_usage=disk_usage,
+            disk_partitions=self.disk_monitor.partitions,
+            disk_io=disk_io,
+            disk_read_rate=sum(r.read_bytes for d, r in disk_io.items() if self.disk_monitor.is_whole_disk(d)),
+            disk_write_rate=sum(r.write_bytes for d, r in disk_io.items() if self.disk_monitor.is_whole_disk(d)),
+            process_memory=process_memory,
+            bytes_sent=sum(c.bytes_sent for c in net_pernic.values()) / (1024**2),  # Convert to MB
+            bytes_recv=sum(c.bytes_recv for c in net_pernic.values()) / (1024**2),
+            net_pernic=net_pernic,
+            net_rates=net_rates,
+            net_sent_rate=sum(r.bytes_sent for r in net_rates.values()),
+            net_recv_rate=sum(r.bytes_recv for r in net_rates.values()),
+            processes=self._sample('processes', tick, self.process_table.refresh),
+            monitor=self.monitor_stats(process_memory.rss)
+        )
+
+    def monitor_stats(self, rss):
+        # Copies, since the UI thread appends render durations concurrently
+        ticks = list(self.tick_durations)
+        renders = list(self.render_durations)
+        cpu_times = self.process.cpu_times()
+        self._cpu_times.append((time.monotonic(), cpu_times.user + cpu_times.system))
+        (first_time, first_cpu), (last_time, last_cpu) = self._cpu_times[0], self._cpu_times[-1]
+        cpu_percent = (last_cpu - first_cpu) / (last_time - first_time) * 100 if last_time > first_time else 0.0
+        return MonitorStats(
+            cpu_percent=cpu_percent,
+            rss=rss,
+            tick_p50=percentile(ticks, 0.5),
+            tick_p99=percentile(ticks, 0.99),
+            render_p50=percentile(renders, 0.5),
+            render_p99=percentile(renders, 0.99),
+            missed_ticks=self.scheduler.missed,
+            queue_depth=self.queue.qsize()
+        )
+
+    def record_render(self, seconds):
+        """Report how long a consumer took to render one sample"""
+        self.render_durations.append(seconds)
+
+    def publish(self, sample):
+        # Never block the sampler: if the consumer falls behind, drop the oldest sample
+        while True:
+            try:
+                self.queue.put_nowait(sample)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        # Put ticks on whole multiples of the interval in epoch time, so samples from
+        # several hosts (or other tools) line up
+        now = time.monotonic()
+        self.scheduler.start(now + (-self.timestamp(now)) % self.interval)
+        while self.scheduler.wait(self._stop_event):
+            started = time.perf_counter()
+            try:
+                sample = self.collect(self.scheduler.tick, self.scheduler.deadline)
+                self.publish(sample)
+                for listener in self.listeners:
+                    listener(sample)
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+            self.tick_durations.append(time.perf_counter() - started)
@@ -0,0 +1,145 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _label(value):
+    # Label values are quoted; backslashes, quotes and newlines must be escaped
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_openmetrics(sample):
+    """Render one collector sample in the OpenMetrics text format"""
+    virtual = sample.virtual
+    swap = sample.swap
+    disk_usage = sorted(sample.disk_usage.items())
+    net_pernic = sorted(sample.net_pernic.items())
+    families = [
+        ("system_cpu_usage_percent", "gauge", "CPU utilisation across all cores", [
+            ("", "", sample.cpu_percent)]),
+        ("system_cpu_frequency_hertz", "gauge", "Current CPU frequency", [
+            ("", "", sample.cpu_freq * 1e6)]),
+        ("system_cpu_cores", "gauge", "Number of CPU cores", [
+            ("", '{kind="physical"}', sample.core_count),
+            ("", '{kind="logical"}', sample.thread_count)]),
+        ("system_memory_bytes", "gauge", "Physical memory", [
+            ("", '{state="total"}', virtual.total),
+            ("", '{state="available"}', virtual.available),
+            ("", '{state="used"}', virtual.used)]),
+        ("system_memory_usage_percent", "gauge", "Physical memory in use", [
+            ("", "", virtual.percent)]),
+        ("system_swap_bytes", "gauge", "Swap space", [
+            ("", '{state="total"}', swap.total),
+            ("", '{state="used"}', swap.used),
+            ("", '{state="free"}', swap.free)]),
+        ("system_swap_usage_percent", "gauge", "Swap space in use", [
+            ("", "", swap.percent)]),
+        ("system_disk_bytes", "gauge", "Disk space per mount point", [
+            ("", f'{{mountpoint="{_label(mount)}",state="{state}"}}', getattr(usage, state))
+            for mount, usage in disk_usage for state in ("total", "used", "free")]),
+        ("system_disk_usage_percent", "gauge", "Disk space in use per mount point", [
+            ("", f'{{mountpoint="{_label(mount)}"}}', usage.percent) for mount, usage in disk_usage]),
+        ("system_network_sent_bytes", "counter", "Bytes sent per interface", [
+            ("_total", f'{{interface="{_label(nic)}"}}', c.bytes_sent) for nic, c in net_pernic]),
+        ("system_network_received_bytes", "counter", "Bytes received per interface", [
+            ("_total", f'{{interface="{_label(nic)}"}}', c.bytes_recv) for nic, c in net_pernic]),
+        ("system_network_sent_packets", "counter", "Packets sent per interface", [
+            ("_total", f'{{interface="{_label(nic)}"}}', c.packets_sent) for nic, c in net_pernic]),
+        ("system_network_received_packets", "counter", "Packets received per interface", [
+            ("_total", f'{{interface="{_label(nic)}"}}', c.packets_recv) for nic, c in net_pernic]),
+        ("system_network_errors", "counter", "Receive and transmit errors per interface", [
+            ("_total", f'{{interface="{_label(nic)}"}}', c.errin + c.errout) for nic, c in net_pernic]),
+        ("system_network_dropped_packets", "counter", "Dropped packets per interface", [
+            ("_total", f'{{interface="{_label(nic)}"}}', c.dropin + c.dropout) for nic, c in net_pernic]),
+    ]
+    monitor = sample.monitor
+    families += [
+        ("system_monitor_cpu_usage_percent", "gauge", "CPU used by the monitor itself", [
+            ("", "", monitor.cpu_percent)]),
+        ("system_monitor_resident_memory_bytes", "gauge", "Resident memory of the monitor itself", [
+            ("", "", monitor.rss)]),
+        ("system_monitor_missed_ticks", "counter", "Sampling ticks skipped because a tick overran", [
+            ("_total", "", monitor.missed_ticks)]),
+        ("system_monitor_queue_depth", "gauge", "Samples waiting for the consumer", [
+            ("", "", monitor.queue_depth)]),
+    ]
+    for name, help_text, p50, p99 in (
+            ("system_monitor_tick_duration_seconds", "Time to collect and publish one sample",
+             monitor.tick_p50, monitor.tick_p99),
+            ("system_monitor_render_duration_seconds", "Time for the dashboard to render one sample",
+             monitor.render_p50, monitor.render_p99)):
+        if p50 is not None:
+            families.append((name, "gauge", help_text, [
+                ("", '{quantile="0.5"}', p50),
+                ("", '{quantile="0.99"}', p99)]))
+    vm = sample.vm
+    if vm is not None:
+        families += [
+            ("system_memory_committed_bytes", "gauge", "Committed virtual memory", [
+                ("", '{state="committed"}', vm.committed),
+                ("", '{state="limit"}', vm.commit_limit)]),
+            ("system_paging_faults_rate", "gauge", "Page faults per second", [
+                ("", '{type="minor"}', vm.page_faults - vm.major_faults),
+                ("", '{type="major"}', vm.major_faults)]),
+            ("system_swap_io_pages_rate", "gauge", "Pages swapped per second", [
+                ("", '{direction="in"}', vm.swap_in),
+                ("", '{direction="out"}', vm.swap_out)]),
+        ]
+        if vm.pressure_some is not None:
+            families.append(("system_memory_pressure_percent", "gauge", "Memory pressure stall, 10 second average", [
+                ("", '{kind="some"}', vm.pressure_some),
+                ("", '{kind="full"}', vm.pressure_full)]))
+
+    lines = []
+    for name, kind, help_text, samples in families:
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"# HELP {name} {help_text}.")
+        for suffix, labels, value in samples:
+            lines.append(f"{name}{suffix}{labels} {value}")
+    lines.append("# EOF")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# Serves the latest pre-rendered snapshot; scrapes never touch psutil
+class MetricsExporter:
+    def __init__(self, host="127.0.0.1", port=9464):
+        self.host = host
+        self.port = port
+        self.snapshot = b"# EOF\n"
+        self._server = None
+        self._thread = None
+
+    def update(self, sample):
+        # Rendered once per sample; swapping the reference is atomic for readers
+        self.snapshot = render_openmetrics(sample)
+
+    def start(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.snapshot
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = Thread(target=self._server.serve_forever, name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
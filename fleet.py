@@ -0,0 +1,673 @@
+"""Fleet mode: agents stream snapshots over TCP to one aggregator the dashboard reads.
+
+    python headless.py --output /dev/null --agent monitor-host:9470   # on every monitored machine
+    python fleet.py aggregator --port 9470                           # standalone, prints the fleet
+    python fleet.py loadtest --agents 200 --duration 30 --restart-after 10
+
+Wire format: frames of [kind: u8][length: u32][payload]. An agent opens with HELLO,
+then sends BATCH frames (sequence number + zlib-compressed snapshots); the aggregator
+answers each batch with an ACK once it has been stored. Snapshots are encoded by
+position, and each namedtuple type's field names travel once per connection.
+"""
+import argparse
+import asyncio
+import keyword
+import queue
+import random
+import select
+import socket
+import struct
+import sys
+import time
+import zlib
+from collections import deque, namedtuple
+from threading import Thread, Event, Lock
+
+from collector import (
+    MetricsCollector, HISTORY_COLUMNS, Snapshot, MonitorStats, NicRates, DiskRates, ProcessRow, history_values
+)
+
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 9470
+
+HELLO = 1
+BATCH = 2
+ACK = 3
+
+_HEADER = struct.Struct('<BI')
+_SEQ = struct.Struct('<I')
+_LEN = struct.Struct('<I')
+_INT = struct.Struct('<q')
+_FLOAT = struct.Struct('<d')
+
+# Largest frame either side accepts, compressed or not
+MAX_FRAME = 16 * 1024 * 1024
+
+
+def frame(kind, payload):
+    return _HEADER.pack(kind, len(payload)) + payload
+
+
+# Compact binary encoding of the values a Snapshot is made of: None, bools, ints,
+# floats, strings, lists, dicts and namedtuples
+class Encoder:
+    def __init__(self):
+        # namedtuple class -> id; definitions are sent the first time a type is used
+        self.types = {}
+
+    def encode(self, value):
+        out = bytearray()
+        self._write(out, value)
+        return bytes(out)
+
+    def _write(self, out, value):
+        if value is None:
+            out += b'N'
+        elif value is True:
+            out += b'T'
+        elif value is False:
+            out += b'F'
+        elif isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+            out += b'i' + _INT.pack(value)
+        elif isinstance(value, (int, float)):
+            out += b'd' + _FLOAT.pack(value)
+        elif isinstance(value, str):
+            data = value.encode('utf-8')
+            out += b's' + _LEN.pack(len(data)) + data
+        elif hasattr(value, '_fields'):
+            cls = type(value)
+            type_id = self.types.get(cls)
+            if type_id is None:
+                type_id = self.types[cls] = len(self.types)
+                out += b'D' + _LEN.pack(type_id)
+                self._write(out, cls.__name__)
+                self._write(out, list(cls._fields))
+            out += b'r' + _LEN.pack(type_id)
+            for item in value:
+                self._write(out, item)
+        elif isinstance(value, (list, tuple)):
+            out += b'l' + _LEN.pack(len(value))
+            for item in value:
+                self._write(out, item)
+        elif isinstance(value, dict):
+            out += b'm' + _LEN.pack(len(value))
+            for key, item in value.items():
+                self._write(out, key)
+                self._write(out, item)
+        elif hasattr(value, '__index__'):
+            # NumPy integers
+            self._write(out, int(value))
+        elif hasattr(value, '__float__'):
+            self._write(out, float(value))
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+# Types decoded as the local class when the field names match, so remote samples
+# are the same Snapshot objects the dashboard renders locally
+_KNOWN_TYPES = {cls.__name__: cls for cls in (Snapshot, MonitorStats, NicRates, DiskRates, ProcessRow)}
+_remote_types = {}
+
+
+def _record_type(name, fields):
+    known = _KNOWN_TYPES.get(name)
+    if known is not None and known._fields == fields:
+        return known
+    cls = _remote_types.get((name, fields))
+    if cls is None:
+        typename = name if name.isidentifier() and not keyword.iskeyword(name) else 'Record'
+        cls = namedtuple(typename, fields, rename=True)
+        # Bounded, since the names come off the network
+        if len(_remote_types) < 1024:
+            _remote_types[(name, fields)] = cls
+    return cls
+
+
+class Decoder:
+    MAX_DEPTH = 16
+    MAX_TYPES = 256
+
+    def __init__(self):
+        # Types defined so far on this connection, by id
+        self.types = []
+
+    def decode(self, data):
+        """Value encoded by Encoder; ValueError if ``data`` is malformed"""
+        self._data = data
+        self._pos = 0
+        try:
+            value = self._read(0)
+        except (IndexError, struct.error, UnicodeDecodeError, TypeError) as e:
+            raise ValueError(f"Malformed payload: {e}") from None
+        if self._pos != len(data):
+            raise ValueError("Trailing bytes in payload")
+        return value
+
+    def _unpack(self, fmt):
+        value, = fmt.unpack_from(self._data, self._pos)
+        self._pos += fmt.size
+        return value
+
+    def _read(self, depth):
+        if depth > self.MAX_DEPTH:
+            raise ValueError("Payload nested too deeply")
+        tag = self._data[self._pos:self._pos + 1]
+        self._pos += 1
+        if tag == b'N':
+            return None
+        if tag == b'T':
+            return True
+        if tag == b'F':
+            return False
+        if tag == b'i':
+            return self._unpack(_INT)
+        if tag == b'd':
+            return self._unpack(_FLOAT)
+        if tag == b's':
+            length = self._unpack(_LEN)
+            if self._pos + length > len(self._data):
+                raise ValueError("Truncated string")
+            value = bytes(self._data[self._pos:self._pos + length]).decode('utf-8')
+            self._pos += length
+            return value
+        if tag == b'l':
+            return [self._read(depth + 1) for _ in range(self._length())]
+        if tag == b'm':
+            return {self._read(depth + 1): self._read(depth + 1) for _ in range(self._length())}
+        if tag == b'D':
+            type_id = self._unpack(_LEN)
+            name = self._read(depth + 1)
+            fields = self._read(depth + 1)
+            if type_id != len(self.types) or type_id >= self.MAX_TYPES:
+                raise ValueError("Unexpected type definition")
+            if not isinstance(name, str) or not fields or not all(isinstance(f, str) for f in fields):
+                raise ValueError("Bad type definition")
+            self.types.append(_record_type(name, tuple(fields)))
+            return self._read(depth)
+        if tag == b'r':
+            cls = self.types[self._unpack(_LEN)]
+            return cls._make([self._read(depth + 1) for _ in cls._fields])
+        raise ValueError(f"Unknown tag {tag!r}")
+
+    def _length(self):
+        length = self._unpack(_LEN)
+        # Every item takes at least one byte, so a longer count is corrupt
+        if length > len(self._data) - self._pos:
+            raise ValueError("Truncated container")
+        return length
+
+
+def decompress(data):
+    inflater = zlib.decompressobj()
+    payload = inflater.decompress(data, MAX_FRAME)
+    if inflater.unconsumed_tail:
+        raise ValueError("Batch too large")
+    return payload
+
+
+def _offer(q, item):
+    # Same policy as MetricsCollector.publish: a slow reader loses the oldest items
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+# Streams samples to an aggregator from a background thread. ``update`` is a collector
+# listener and never blocks: samples wait in a bounded backlog that drops the oldest
+# when the aggregator cannot keep up, and at most MAX_IN_FLIGHT batches go unacknowledged.
+class FleetAgent:
+    BATCH_SIZE = 30
+    MAX_IN_FLIGHT = 4
+    BACKLOG = 600
+    # Reconnect delays double from RECONNECT_MIN up to RECONNECT_MAX, with jitter
+    RECONNECT_MIN = 0.5
+    RECONNECT_MAX = 30.0
+    # A connection with batches unacknowledged for this long is considered dead
+    ACK_TIMEOUT = 30.0
+    SEND_TIMEOUT = 10.0
+
+    def __init__(self, host, port=DEFAULT_PORT, name=None, linger=0.0):
+        self.address = (host, port)
+        self.name = name or socket.gethostname()
+        # Seconds to wait for more samples before sending a batch; 0 sends as they come
+        self.linger = linger
+        self.connected = False
+        self.connects = 0
+        self.sent = 0
+        self.dropped = 0
+        self._pending = deque(maxlen=self.BACKLOG)
+        self._in_flight = {}
+        self._lock = Lock()
+        self._ready = Event()
+        self._stop_event = Event()
+        self._thread = None
+
+    def update(self, sample):
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(sample)
+        self._ready.set()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name="fleet-agent", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        self._ready.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        delay = self.RECONNECT_MIN
+        while not self._stop_event.is_set():
+            try:
+                sock = socket.create_connection(self.address, timeout=self.SEND_TIMEOUT)
+            except OSError:
+                # Jitter keeps a fleet that lost its aggregator from reconnecting in lockstep
+                self._stop_event.wait(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, self.RECONNECT_MAX)
+                continue
+            delay = self.RECONNECT_MIN
+            self.connected = True
+            self.connects += 1
+            try:
+                self._stream(sock)
+            except (OSError, ValueError):
+                pass
+            finally:
+                self.connected = False
+                sock.close()
+                self._requeue()
+
+    def _stream(self, sock):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Type definitions are per connection, so every connection starts a fresh encoder
+        encoder = Encoder()
+        sock.sendall(frame(HELLO, encoder.encode({'host': self.name, 'version': PROTOCOL_VERSION})))
+        acks = bytearray()
+        seq = 0
+        last_ack = time.monotonic()
+        while not self._stop_event.is_set():
+            window_full = len(self._in_flight) >= self.MAX_IN_FLIGHT
+            if self._read_acks(sock, acks, 0.5 if window_full else 0.0):
+                last_ack = time.monotonic()
+            if not self._in_flight:
+                last_ack = time.monotonic()
+            elif time.monotonic() - last_ack > self.ACK_TIMEOUT:
+                raise ConnectionError("Aggregator stopped acknowledging")
+            if window_full:
+                continue
+
+            batch = self._take_batch()
+            if not batch:
+                continue
+            seq = (seq + 1) % 2 ** 32
+            self._in_flight[seq] = batch
+            payload = _SEQ.pack(seq) + zlib.compress(encoder.encode(batch), 1)
+            sock.sendall(frame(BATCH, payload))
+            self.sent += len(batch)
+
+    def _read_acks(self, sock, buffer, timeout):
+        """Consume whatever ACK frames have arrived; True if any did"""
+        acked = False
+        while select.select([sock], [], [], timeout)[0]:
+            data = sock.recv(65536)
+            if not data:
+                raise ConnectionError("Aggregator closed the connection")
+            buffer += data
+            timeout = 0.0
+            while len(buffer) >= _HEADER.size:
+                kind, length = _HEADER.unpack_from(buffer)
+                if len(buffer) < _HEADER.size + length:
+                    break
+                if kind == ACK and length == _SEQ.size:
+                    self._in_flight.pop(_SEQ.unpack_from(buffer, _HEADER.size)[0], None)
+                    acked = True
+                del buffer[:_HEADER.size + length]
+        return acked
+
+    def _take_batch(self):
+        if not self._ready.wait(0.5):
+            return None
+        if self.linger:
+            self._stop_event.wait(self.linger)
+        with self._lock:
+            batch = [self._pending.popleft() for _ in range(min(self.BATCH_SIZE, len(self._pending)))]
+            if not self._pending:
+                self._ready.clear()
+        return batch
+
+    def _requeue(self):
+        # Unacknowledged batches go back in front of the backlog; the aggregator skips
+        # any it did store, by timestamp
+        with self._lock:
+            unacked = [sample for seq in sorted(self._in_flight) for sample in self._in_flight[seq]]
+            self._in_flight.clear()
+            room = self._pending.maxlen - len(self._pending)
+            self.dropped += max(0, len(unacked) - room)
+            self._pending.extendleft(reversed(unacked[max(0, len(unacked) - room):] if room else []))
+            if self._pending:
+                self._ready.set()
+
+
+HostSummary = namedtuple('HostSummary', ['name', 'address', 'connected', 'last_seen', 'latest', 'rejected'])
+
+
+def _checked_values(sample):
+    """history_values() of a received Snapshot; TypeError or AttributeError if a field the
+    dashboard reads is missing or not a number"""
+    values = history_values(sample)
+    if not isinstance(sample.time, (int, float)) or not all(
+            value is None or isinstance(value, (int, float)) for value in values.values()):
+        raise TypeError("Snapshot field is not a number")
+    return values
+
+
+class _Host:
+    def __init__(self, name, history):
+        self.name = name
+        self.address = None
+        self.connection = None
+        self.last_seen = None
+        self.latest = None
+        self.received = 0
+        # Samples that were not a Snapshot of this version, acknowledged but not stored
+        self.rejected = 0
+        # Recent history columns, for the fleet grid and to seed a host's graphs
+        self.history = history
+        self.subscribers = []
+
+
+# Accepts agents on an asyncio server running in its own thread. The dashboard reads
+# host state through the thread-safe methods below; nothing here touches Tk.
+class FleetAggregator:
+    # Samples kept per host, and how long a connected host may stay silent before it is stale
+    RECENT = 300
+    STALE_AFTER = 10.0
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT):
+        # Imported here so agents never load NumPy
+        from history import HistoryStore
+        self._history_store = HistoryStore
+        self.host = host
+        self.port = port
+        self.hosts = {}
+        # Bumped when a host connects or disconnects, so readers can skip unchanged state
+        self.version = 0
+        self.batches = 0
+        self._lock = Lock()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._error = None
+        self._connections = set()
+
+    def start(self):
+        started = Event()
+        self._error = None
+        self._thread = Thread(target=self._serve, args=(started,), name="fleet-aggregator", daemon=True)
+        self._thread.start()
+        started.wait()
+        if self._error is not None:
+            self._thread = None
+            raise self._error
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _serve(self, started):
+        loop = asyncio.new_event_loop()
+        try:
+            self._server = loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        except OSError as e:
+            self._error = e
+            loop.close()
+            started.set()
+            return
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._loop = loop
+        started.set()
+        try:
+            loop.run_forever()
+        finally:
+            # Closing the connections ends their handlers, which then clean up
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            tasks = asyncio.all_tasks(loop)
+            if tasks:
+                loop.run_until_complete(asyncio.wait(tasks, timeout=2.0))
+            loop.close()
+            self._loop = None
+
+    async def _handle(self, reader, writer):
+        decoder = Decoder()
+        host = None
+        self._connections.add(writer)
+        try:
+            kind, payload = await self._read_frame(reader)
+            hello = decoder.decode(payload)
+            if kind != HELLO or not isinstance(hello, dict) or hello.get('version') != PROTOCOL_VERSION:
+                return
+            host = self._connect(str(hello.get('host'))[:255], writer)
+            while True:
+                kind, payload = await self._read_frame(reader)
+                if kind != BATCH or len(payload) < _SEQ.size:
+                    return
+                samples = decoder.decode(decompress(payload[_SEQ.size:]))
+                if not isinstance(samples, list):
+                    return
+                self._receive(host, samples)
+                # Acknowledged only once stored, so a busy aggregator slows its agents down
+                writer.write(frame(ACK, payload[:_SEQ.size]))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, zlib.error):
+            pass
+        except (TypeError, AttributeError):
+            # A Snapshot whose fields have the wrong types; nothing of it was stored
+            pass
+        finally:
+            self._connections.discard(writer)
+            if host is not None:
+                self._disconnect(host, writer)
+            writer.close()
+
+    async def _read_frame(self, reader):
+        kind, length = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+        if length > MAX_FRAME:
+            raise ValueError("Frame too large")
+        return kind, await reader.readexactly(length)
+
+    def _connect(self, name, writer):
+        with self._lock:
+            host = self.hosts.get(name)
+            if host is None:
+                host = self.hosts[name] = _Host(name, self._history_store(HISTORY_COLUMNS, self.RECENT))
+            # A reconnect may arrive before the old connection is noticed to be dead
+            host.connection = writer
+            host.address = writer.get_extra_info('peername')
+            self.version += 1
+        return host
+
+    def _disconnect(self, host, writer):
+        with self._lock:
+            if host.connection is writer:
+                host.connection = None
+                self.version += 1
+
+    def _receive(self, host, samples):
+        with self._lock:
+            for sample in samples:
+                if not isinstance(sample, Snapshot):
+                    # Decoded with other field names: an agent running another version
+                    host.rejected += 1
+                    continue
+                # Checked before anything is kept, so the dashboard never reads a malformed sample
+                values = _checked_values(sample)
+                if host.latest is not None and sample.time <= host.latest.time:
+                    # Sent again after a reconnect
+                    continue
+                host.history.append(sample.time, values)
+                host.latest = sample
+                host.received += 1
+                for subscriber in host.subscribers:
+                    _offer(subscriber, sample)
+            host.last_seen = time.time()
+            self.batches += 1
+
+    def summary(self):
+        """HostSummary for every host seen so far, by name"""
+        with self._lock:
+            return [
+                HostSummary(
+                    host.name, host.address, host.connection is not None, host.last_seen, host.latest, host.rejected
+                )
+                for _, host in sorted(self.hosts.items())
+            ]
+
+    def is_stale(self, summary, now=None):
+        now = time.time() if now is None else now
+        return summary.last_seen is None or now - summary.last_seen > self.STALE_AFTER
+
+    def latest(self, name):
+        with self._lock:
+            host = self.hosts.get(name)
+            return host.latest if host is not None else None
+
+    def recent(self, name):
+        """(times, rows) copies of a host's recent history columns, oldest first"""
+        with self._lock:
+            store = self.hosts[name].history
+            times = store.times().copy()
+            rows = [store.column(column).copy() for column in store.columns]
+        return times, list(zip(*rows))
+
+    def subscribe(self, name, maxsize=120):
+        """Queue that receives every new sample from host ``name``"""
+        subscriber = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            self.hosts[name].subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, name, subscriber):
+        with self._lock:
+            host = self.hosts.get(name)
+            if host is not None and subscriber in host.subscribers:
+                host.subscribers.remove(subscriber)
+
+
+def print_fleet(aggregator, out=sys.stdout):
+    now = time.time()
+    for host in aggregator.summary():
+        state = "down" if not host.connected else "stale" if aggregator.is_stale(host, now) else "up"
+        latest = host.latest
+        usage = (
+            f"cpu {latest.cpu_percent:5.1f}%  mem {latest.virtual.percent:5.1f}%  disk {latest.disk.percent:5.1f}%"
+            if latest is not None else "no samples"
+        )
+        rejected = f"  rejected {host.rejected}" if host.rejected else ""
+        print(f"{host.name:<24} {state:<5} {usage}{rejected}", file=out)
+    print(file=out, flush=True)
+
+
+def run_aggregator(args):
+    aggregator = FleetAggregator(args.host, args.port)
+    aggregator.start()
+    print(f"Aggregating on {aggregator.host}:{aggregator.port}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(args.every)
+            print_fleet(aggregator)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        aggregator.stop()
+
+
+def run_loadtest(args):
+    """Many agents on localhost, all fed by one collector, against one aggregator"""
+    aggregator = FleetAggregator("127.0.0.1", 0)
+    aggregator.start()
+    port = aggregator.port
+    collector = MetricsCollector(interval=args.interval)
+    agents = [FleetAgent("127.0.0.1", port, f"agent-{i:04d}", linger=args.linger) for i in range(args.agents)]
+    for agent in agents:
+        collector.listeners.append(agent.update)
+        agent.start()
+    collector.start()
+    started = time.monotonic()
+    restarted = args.restart_after is None
+    try:
+        while time.monotonic() - started < args.duration:
+            time.sleep(0.5)
+            if not restarted and time.monotonic() - started >= args.restart_after:
+                # Drop every connection, then come back on the same port
+                aggregator.stop()
+                time.sleep(1.0)
+                aggregator = FleetAggregator("127.0.0.1", port)
+                aggregator.start()
+                restarted = True
+        received = [host.received for host in aggregator.hosts.values()]
+        rejected = sum(host.rejected for host in aggregator.hosts.values())
+        connected = sum(host.connected for host in aggregator.summary())
+    finally:
+        collector.close()
+        for agent in agents:
+            agent.stop()
+        aggregator.stop()
+
+    print(f"agents: {len(agents)}  hosts seen: {len(received)}  connected at end: {connected}")
+    if received:
+        print(f"samples per host: min {min(received)}  max {max(received)}  batches: {aggregator.batches}  "
+              f"rejected: {rejected}")
+    print(f"agent connects: {sum(a.connects for a in agents)}  "
+          f"sent: {sum(a.sent for a in agents)}  dropped: {sum(a.dropped for a in agents)}")
+    return 0 if len(received) == len(agents) and connected == len(agents) else 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fleet aggregator and localhost load test")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    aggregate = commands.add_parser("aggregator", help="accept agents and print the fleet periodically")
+    aggregate.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    aggregate.add_argument("--port", type=int, default=DEFAULT_PORT)
+    aggregate.add_argument("--every", type=float, default=5.0, help="seconds between fleet printouts")
+
+    loadtest = commands.add_parser("loadtest", help="run many agents against an aggregator on localhost")
+    loadtest.add_argument("--agents", type=int, default=100)
+    loadtest.add_argument("--duration", type=float, default=20.0, help="seconds to run")
+    loadtest.add_argument("--interval", type=float, default=1.0, help="seconds between samples")
+    loadtest.add_argument("--linger", type=float, default=0.0, help="seconds agents wait to fill a batch")
+    loadtest.add_argument("--restart-after", type=float, default=None, metavar="SECONDS",
+                          help="restart the aggregator once, to exercise reconnects")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "aggregator":
+        run_aggregator(args)
+        return 0
+    return run_loadtest(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Headless system monitor: runs only the sampling engine, no Tk or matplotlib.
+
+    python headless.py --interval 1 --output metrics.jsonl
+    python headless.py --journal            # record the dashboard's history journal while it is closed
+    python headless.py --metrics-port 9464  # serve OpenMetrics on /metrics
+    python headless.py --interval 0.1 --rate processes=1 --rate disk_usage=10
+    python headless.py --alert "cpu > 90 for 30s hysteresis 5" --alert "swap_in_rate > 100 error"
+    python headless.py --output /dev/null --agent monitor-host:9470  # stream to a fleet aggregator
+
+The journal can be exported later with history_export.py (CSV, JSON Lines, Parquet or Arrow).
+"""
+import argparse
+import json
+import queue
+import sys
+
+from collector import MetricsCollector, HISTORY_COLUMNS, history_values, sample_to_record
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Collect system metrics without the GUI")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between samples")
+    parser.add_argument("--count", type=int, default=0, help="stop after this many samples (0 = run forever)")
+    parser.add_argument("--output", default="-", help="JSONL file to append to, '-' for stdout")
+    parser.add_argument("--journal", nargs="?", const="", default=None, metavar="PATH",
+                        help="also append to a history journal (default path if PATH is omitted)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve OpenMetrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="address for the metrics endpoint")
+    parser.add_argument("--rate", action="append", default=[], metavar="GROUP=SECONDS",
+                        help="sample one metric group (e.g. processes, disk_usage) at its own rate; repeatable")
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="read CPU, memory, network and disk counters through psutil instead of /proc")
+    parser.add_argument("--alert", action="append", default=[], metavar="RULE",
+                        help='alert rule, e.g. "cpu > 90 for 30s hysteresis 5 cooldown 5m error"; '
+                             'alerts are written to stderr; repeatable')
+    parser.add_argument("--agent", default=None, metavar="HOST:PORT",
+                        help="also stream samples to a fleet aggregator")
+    parser.add_argument("--agent-name", default=None, help="name shown for this host (default: hostname)")
+    parser.add_argument("--agent-linger", type=float, default=0.0, metavar="SECONDS",
+                        help="wait this long to batch samples before sending them to the aggregator")
+    args = parser.parse_args(argv)
+    try:
+        args.rate = {group: float(seconds) for group, _, seconds in (rate.partition("=") for rate in args.rate)}
+    except ValueError:
+        parser.error("--rate expects GROUP=SECONDS")
+    if args.agent is not None:
+        host, _, port = args.agent.rpartition(":")
+        try:
+            args.agent = (host or "127.0.0.1", int(port))
+        except ValueError:
+            parser.error("--agent expects HOST:PORT")
+    if args.alert:
+        # Like the journal, alerting needs NumPy, so it is only loaded when asked for
+        from alerts import parse_rule
+        try:
+            args.alert = [parse_rule(rule) for rule in args.alert]
+        except ValueError as e:
+            parser.error(str(e))
+    return args
+
+
+def open_history_store(path, interval):
+    # Imported here so plain JSONL collection never loads NumPy
+    from history import open_history
+    from journal import DEFAULT_PATH
+    return open_history(HISTORY_COLUMNS, path or DEFAULT_PATH, capacity=60, resolution=interval)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    history = open_history_store(args.journal, args.interval) if args.journal is not None else None
+    if history is not None and history.journal is None:
+        # Asked for explicitly, so no journal is an error (e.g. the dashboard is writing it)
+        return 1
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    alerts = None
+    if args.alert:
+        from alerts import AlertEngine
+        alerts = AlertEngine(args.alert)
+
+    collector = MetricsCollector(interval=args.interval, fast_path=not args.no_fast_path, sample_rates=args.rate)
+    exporter = None
+    if args.metrics_port is not None:
+        from exporter import MetricsExporter
+        exporter = MetricsExporter(args.metrics_host, args.metrics_port)
+        collector.listeners.append(exporter.update)
+        exporter.start()
+    agent = None
+    if args.agent is not None:
+        from fleet import FleetAgent
+        agent = FleetAgent(*args.agent, name=args.agent_name, linger=args.agent_linger)
+        collector.listeners.append(agent.update)
+        agent.start()
+    collector.start()
+    written = 0
+    try:
+        while not args.count or written < args.count:
+            try:
+                sample = collector.queue.get(timeout=max(1.0, 2 * args.interval))
+            except queue.Empty:
+                continue
+            out.write(json.dumps(sample_to_record(sample)) + "\n")
+            out.flush()
+            if history is not None or alerts is not None:
+                values = history_values(sample)
+                if history is not None:
+                    history.append(sample.time, values)
+                if alerts is not None:
+                    for alert in alerts.update(sample.time, values):
+                        print(f"{alert.rule.severity.upper()} {alert.state}: {alert.rule.name} ({alert.value:g})",
+                              file=sys.stderr, flush=True)
+            written += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.close()
+        if exporter is not None:
+            exporter.stop()
+        if agent is not None:
+            agent.stop()
+        if history is not None and history.journal is not None:
+            history.journal.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,395 @@
+import numpy as np
+
+from journal import MetricJournal, DEFAULT_PATH
+
+
+# Fixed-capacity, column-oriented ring buffer for sampled metrics
+class HistoryStore:
+    def __init__(self, columns, capacity=3600):
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self._index = {name: i for i, name in enumerate(self.columns)}
+
+        # Every sample is written twice (at i and i + capacity), so the newest
+        # samples always form one contiguous slice and windows are zero-copy views
+        self._time = np.zeros(2 * capacity)
+        self._data = np.full((len(self.columns), 2 * capacity), np.nan)
+        self._head = 0  # Next write position, in [0, capacity)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def last_time(self):
+        if not self._count:
+            return None
+        return self._time[self._head + self.capacity - 1]
+
+    def append(self, timestamp, values):
+        """Add one sample in O(1); missing columns are stored as NaN"""
+        self.append_row(timestamp, [values.get(name, np.nan) for name in self.columns])
+
+    def append_row(self, timestamp, row):
+        """Add one sample given as a sequence ordered like ``self.columns``"""
+        # Timestamps must never go backwards, or window lookups stop working
+        if self._count and timestamp < self.last_time:
+            timestamp = self.last_time
+
+        i = self._head
+        j = i + self.capacity
+        self._time[i] = self._time[j] = timestamp
+        self._data[:, i] = row
+        self._data[:, j] = row
+
+        self._head = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def extend(self, times, rows):
+        """Bulk-append samples; ``rows`` holds one row per timestamp"""
+        times = np.asarray(times, dtype=float)[-self.capacity:]
+        rows = np.asarray(rows, dtype=float)[-self.capacity:]
+        if not len(times):
+            return
+        if self._count:
+            times = np.maximum(times, self.last_time)
+
+        positions = (self._head + np.arange(len(times))) % self.capacity
+        for offset in (0, self.capacity):
+            self._time[positions + offset] = times
+            self._data[:, positions + offset] = rows.T
+
+        self._head = (self._head + len(times)) % self.capacity
+        self._count = min(self._count + len(times), self.capacity)
+
+    def add_columns(self, names):
+        """Add columns; samples already stored read as NaN in them"""
+        names = [name for name in names if name not in self._index]
+        if not names:
+            return
+        self._data = np.vstack([self._data, np.full((len(names), 2 * self.capacity), np.nan)])
+        for name in names:
+            self._index[name] = len(self.columns)
+            self.columns += (name,)
+
+    def remove_columns(self, names):
+        """Drop columns and everything stored in them"""
+        keep = [i for i, name in enumerate(self.columns) if name not in set(names)]
+        if len(keep) == len(self.columns):
+            return
+        self._data = self._data[keep]
+        self.columns = tuple(self.columns[i] for i in keep)
+        self._index = {name: i for i, name in enumerate(self.columns)}
+
+    def _bounds(self, count):
+        if count is None or count > self._count:
+            count = self._count
+        end = self._head + self.capacity
+        return end - count, end
+
+    def times(self, count=None):
+        start, end = self._bounds(count)
+        return self._time[start:end]
+
+    def block(self, count=None):
+        """View of every column, one row per column"""
+        start, end = self._bounds(count)
+        return self._data[:, start:end]
+
+    def column(self, name, count=None):
+        start, end = self._bounds(count)
+        return self._data[self._index[name], start:end]
+
+    def latest(self, name):
+        if not self._count:
+            return None
+        return self._data[self._index[name], self._head + self.capacity - 1]
+
+    def count_since(self, timestamp):
+        """Number of newest samples taken at or after ``timestamp``"""
+        times = self.times()
+        return len(times) - int(np.searchsorted(times, timestamp, side='left'))
+
+    def window(self, seconds, columns=None):
+        """Views of the samples from the last ``seconds`` seconds"""
+        if not self._count:
+            count = 0
+        else:
+            count = self.count_since(self.last_time - seconds)
+        names = self.columns if columns is None else columns
+        return self.times(count), {name: self.column(name, count) for name in names}
+
+
+# Downsampled copy of a HistoryStore: one min/max/mean bucket per `resolution` seconds
+class RollupTier:
+    def __init__(self, columns, resolution, capacity):
+        self.resolution = resolution
+        self.columns = tuple(columns)
+        self.mean = HistoryStore(columns, capacity)
+        self.min = HistoryStore(columns, capacity)
+        self.max = HistoryStore(columns, capacity)
+
+        # Accumulators for the bucket that is still filling up
+        self._bucket = None
+        self._sum = np.zeros(len(self.columns))
+        self._count = np.zeros(len(self.columns))
+        self._min = np.full(len(self.columns), np.inf)
+        self._max = np.full(len(self.columns), -np.inf)
+
+    def add(self, timestamp, row):
+        bucket = int(timestamp // self.resolution)
+        if self._bucket is not None and bucket != self._bucket:
+            self.flush()
+        self._bucket = bucket
+
+        row = np.asarray(row, dtype=float)
+        valid = ~np.isnan(row)
+        self._sum[valid] += row[valid]
+        self._count[valid] += 1
+        np.fmin(self._min, row, out=self._min)
+        np.fmax(self._max, row, out=self._max)
+
+    def add_columns(self, names):
+        names = [name for name in names if name not in self.columns]
+        if not names:
+            return
+        for store in (self.mean, self.min, self.max):
+            store.add_columns(names)
+        self.columns += tuple(names)
+        self._sum = np.append(self._sum, np.zeros(len(names)))
+        self._count = np.append(self._count, np.zeros(len(names)))
+        self._min = np.append(self._min, np.full(len(names), np.inf))
+        self._max = np.append(self._max, np.full(len(names), -np.inf))
+
+    def remove_columns(self, names):
+        keep = [i for i, name in enumerate(self.columns) if name not in set(names)]
+        if len(keep) == len(self.columns):
+            return
+        for store in (self.mean, self.min, self.max):
+            store.remove_columns(names)
+        self.columns = tuple(self.columns[i] for i in keep)
+        self._sum = self._sum[keep]
+        self._count = self._count[keep]
+        self._min = self._min[keep]
+        self._max = self._max[keep]
+
+    def extend(self, times, rows):
+        """Bulk version of add(), aggregating whole buckets with reduceat"""
+        times = np.asarray(times, dtype=float)
+        rows = np.asarray(rows, dtype=float)
+        if not len(times):
+            return
+        self.flush()
+
+        buckets = (times // self.resolution).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        valid = ~np.isnan(rows)
+        sums = np.add.reduceat(np.where(valid, rows, 0.0), starts, axis=0)
+        counts = np.add.reduceat(valid.astype(float), starts, axis=0)
+        lows = np.fmin.reduceat(rows, starts, axis=0)
+        highs = np.fmax.reduceat(rows, starts, axis=0)
+
+        # Every bucket but the last is complete
+        closed = buckets[starts[:-1]] * self.resolution
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums[:-1] / counts[:-1]
+        self.mean.extend(closed, means)
+        self.min.extend(closed, lows[:-1])
+        self.max.extend(closed, highs[:-1])
+
+        # The last one stays open for the samples that follow
+        self._bucket = int(buckets[starts[-1]])
+        self._sum[:] = sums[-1]
+        self._count[:] = counts[-1]
+        self._min[:] = np.where(np.isnan(lows[-1]), np.inf, lows[-1])
+        self._max[:] = np.where(np.isnan(highs[-1]), -np.inf, highs[-1])
+
+    def _open_bucket(self):
+        empty = self._count == 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self._sum / self._count
+        low = np.where(empty, np.nan, self._min)
+        high = np.where(empty, np.nan, self._max)
+        return self._bucket * self.resolution, mean, low, high
+
+    def flush(self):
+        """Close the open bucket and store its aggregates"""
+        if self._bucket is None:
+            return
+        timestamp, mean, low, high = self._open_bucket()
+        self.mean.append_row(timestamp, mean)
+        self.min.append_row(timestamp, low)
+        self.max.append_row(timestamp, high)
+
+        self._bucket = None
+        self._sum.fill(0)
+        self._count.fill(0)
+        self._min.fill(np.inf)
+        self._max.fill(-np.inf)
+
+    def window(self, seconds, columns, stat='mean'):
+        """Closed buckets from the last ``seconds`` seconds plus the open one"""
+        store = getattr(self, stat)
+        if self._bucket is None:
+            return store.window(seconds, columns)
+
+        timestamp, *stats = self._open_bucket()
+        current = dict(zip(('mean', 'min', 'max'), stats))[stat]
+        count = store.count_since(timestamp - seconds)
+        times = np.append(store.times(count), timestamp)
+        return times, {
+            name: np.append(store.column(name, count), current[store._index[name]])
+            for name in columns
+        }
+
+
+# Raw samples plus rollup tiers, so any zoom level plots a bounded number of points.
+# The columns it is created with are kept for good; columns added later (per-interface
+# and per-device series) are dropped once they have had no reading for SERIES_EXPIRY
+# seconds, and the least recently seen go first beyond MAX_SERIES of them.
+class TieredHistory:
+    # (bucket seconds, buckets kept)
+    DEFAULT_TIERS = ((5, 720), (15, 960), (60, 1440))
+    MAX_SERIES = 256
+    SERIES_EXPIRY = 3600
+
+    def __init__(self, columns, capacity=3600, resolution=1.0, tiers=DEFAULT_TIERS, max_points=120, journal=None):
+        self.columns = tuple(columns)
+        self.permanent = frozenset(self.columns)
+        self.raw = HistoryStore(columns, capacity)
+        self.resolution = resolution  # Sampling interval of the raw store
+        self.tiers = [RollupTier(columns, res, cap) for res, cap in tiers]
+        self.max_points = max_points
+        # Time of the latest reading in each column
+        self.last_seen = np.full(len(self.columns), -np.inf)
+        # Optional MetricJournal that keeps every sample on disk
+        self.journal = journal
+        if self.journal is not None:
+            self._write_journal(self.journal.add_columns, self.columns)
+
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def last_time(self):
+        return self.raw.last_time
+
+    def add_columns(self, names):
+        """Start recording new series, e.g. for a network interface that just appeared"""
+        names = [name for name in names if name not in self.columns]
+        if not names:
+            return
+        if self.journal is not None:
+            self._write_journal(self.journal.add_columns, names)
+        self.columns += tuple(names)
+        self.raw.add_columns(names)
+        for tier in self.tiers:
+            tier.add_columns(names)
+        self.last_seen = np.append(self.last_seen, np.full(len(names), -np.inf))
+
+    def remove_columns(self, names):
+        """Stop recording series and forget what is stored for them"""
+        names = set(names) & set(self.columns)
+        if not names:
+            return
+        keep = [i for i, name in enumerate(self.columns) if name not in names]
+        self.columns = tuple(self.columns[i] for i in keep)
+        self.last_seen = self.last_seen[keep]
+        self.raw.remove_columns(names)
+        for tier in self.tiers:
+            tier.remove_columns(names)
+        if self.journal is not None:
+            self.journal.remove_columns(names)
+
+    def expire(self, now, keep=(), room=0):
+        """Drop added series without a reading for SERIES_EXPIRY seconds, and the least recently
+        seen beyond MAX_SERIES - ``room``; series in ``keep`` stay. Returns the dropped names."""
+        candidates = sorted(
+            (seen, name) for seen, name in zip(self.last_seen.tolist(), self.columns)
+            if name not in self.permanent and name not in keep
+        )
+        added = sum(1 for name in self.columns if name not in self.permanent)
+        excess = added + room - self.MAX_SERIES
+        dropped = [
+            name for i, (seen, name) in enumerate(candidates)
+            if i < excess or seen < now - self.SERIES_EXPIRY
+        ]
+        self.remove_columns(dropped)
+        return dropped
+
+    def append(self, timestamp, values):
+        # Unknown keys become new columns instead of being dropped. Series grow only
+        # then, so that is also when the ones that have gone quiet are expired.
+        new_columns = [name for name in values if name not in self.raw._index]
+        if new_columns:
+            self.expire(timestamp, values, len(new_columns))
+            self.add_columns(new_columns)
+        row = np.array([values.get(name, np.nan) for name in self.columns], dtype=float)
+        self.last_seen[~np.isnan(row)] = timestamp
+        self.raw.append_row(timestamp, row)
+        for tier in self.tiers:
+            tier.add(timestamp, row)
+        if self.journal is not None:
+            self._write_journal(self.journal.append, timestamp, row, self.columns)
+
+    def _write_journal(self, write, *args):
+        # A full disk or a failing journal costs persistence, never the samples in memory
+        try:
+            write(*args)
+        except (OSError, ValueError) as e:
+            print(f"History journal disabled: {e}")
+            journal, self.journal = self.journal, None
+            try:
+                journal.close()
+            except (OSError, ValueError):
+                pass
+
+    def restore(self, seconds):
+        """Reload the last ``seconds`` seconds of samples from the journal, including
+        the added series that have readings in that window"""
+        if self.journal is None:
+            return 0
+        extra = tuple(name for name in self.journal.columns if name and name not in self.raw._index)
+        times, rows = self.journal.tail(seconds, self.columns + extra)
+        recorded = ~np.isnan(rows)
+        keep = recorded.any(axis=0)
+        keep[:len(self.columns)] = True
+        self.add_columns([name for name, present in zip(extra, keep[len(self.columns):]) if present])
+        rows, recorded = rows[:, keep], recorded[:, keep]
+        self.extend(times, rows)
+        if len(times):
+            # Time of the last reading in each column, counting back from the end
+            last = len(times) - 1 - np.argmax(recorded[::-1], axis=0)
+            seen = np.where(recorded.any(axis=0), times[last], -np.inf)
+            self.last_seen = np.fmax(self.last_seen, seen)
+            self.expire(times[-1])
+        return len(times)
+
+    def extend(self, times, rows):
+        """Bulk-load samples ordered like ``self.columns`` into the raw store and every tier"""
+        self.raw.extend(times, rows)
+        for tier in self.tiers:
+            tier.extend(times, rows)
+
+    def latest(self, name):
+        return self.raw.latest(name)
+
+    def window(self, seconds, columns=None, stat='mean'):
+        """Series for the last ``seconds`` seconds at the finest fitting resolution"""
+        columns = self.columns if columns is None else tuple(columns)
+        if seconds / self.resolution <= self.max_points:
+            return self.raw.window(seconds, columns)
+        for tier in self.tiers:
+            if seconds / tier.resolution <= self.max_points:
+                return tier.window(seconds, columns, stat)
+        return self.tiers[-1].window(seconds, columns, stat)
+
+
+def open_history(columns, journal_path=DEFAULT_PATH, **kwargs):
+    """TieredHistory backed by a MetricJournal at ``journal_path``"""
+    try:
+        journal = MetricJournal(journal_path, columns)
+    except OSError as e:
+        print(f"History journal unavailable: {e}")
+        journal = None
+    return TieredHistory(columns, journal=journal, **kwargs)
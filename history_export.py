@@ -0,0 +1,316 @@
+"""Export recorded history to CSV, JSON Lines, Parquet or Arrow, a chunk at a time.
+
+    python history_export.py week.parquet --since 7d
+    python history_export.py cpu.csv --columns "cpu,memory,net.*" --since 2024-05-01T00:00 --until 2024-05-02
+    python history_export.py --list-columns
+
+Rows are read straight from the journal's memory map (or the in-memory history) and
+converted one chunk at a time, so exporting days of samples never holds more than
+CHUNK_ROWS rows in Python objects. Parquet and Arrow need pyarrow.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from threading import Thread, Event
+
+import numpy as np
+
+from journal import MetricJournal, DEFAULT_PATH
+
+
+CHUNK_ROWS = 8192
+
+
+def journal_segments(path=DEFAULT_PATH):
+    """(columns, starts, times, rows) for the previous and the current journal file, oldest first;
+    column i only holds readings from row ``starts[i]`` on"""
+    segments = []
+    for candidate in (path + '.1', path):
+        stored = MetricJournal.read_records(candidate)
+        if stored is not None:
+            columns, starts, records = stored
+            segments.append((columns, starts, records[:, 0], records[:, 1:]))
+    return segments
+
+
+def history_segments(history):
+    """Segments for a TieredHistory: its journal if it has one, else the raw samples in memory"""
+    if history.journal is not None:
+        history.journal.flush()
+        return journal_segments(history.journal.path)
+    # The ring buffer keeps being written on the Tk thread, so the export gets its own copy
+    raw = history.raw
+    return [(raw.columns, [0] * len(raw.columns), raw.times().copy(), raw.block().T.copy())]
+
+
+def available_columns(segments):
+    return list(dict.fromkeys(name for columns, _, _, _ in segments for name in columns if name))
+
+
+def select_columns(columns, patterns=None):
+    """Columns matching comma-separated glob patterns such as "cpu, net.*"; all if none are given"""
+    patterns = [pattern.strip() for pattern in (patterns or "").split(",") if pattern.strip()]
+    if not patterns:
+        return list(columns)
+    selected = [name for name in columns if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)]
+    if not selected:
+        raise ValueError(f"No columns match {', '.join(patterns)}")
+    return selected
+
+
+def iter_chunks(segments, columns, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    """(times, values) per chunk of up to ``chunk_rows`` rows in [start, end]; values has one
+    column per entry of ``columns``, NaN where a segment does not record it"""
+    for segment_columns, starts, times, rows in segments:
+        lo, hi = _row_range(times, start, end)
+        index = {name: i for i, name in enumerate(segment_columns) if name}
+        wanted = [i for i, name in enumerate(columns) if name in index]
+        picks = [index[columns[i]] for i in wanted]
+        for first in range(lo, hi, chunk_rows):
+            last = min(first + chunk_rows, hi)
+            values = np.full((last - first, len(columns)), np.nan)
+            values[:, wanted] = rows[first:last, picks]
+            # Rows from before a series took its slot belong to another series
+            for i, slot in zip(wanted, picks):
+                if starts[slot] > first:
+                    values[:starts[slot] - first, i] = np.nan
+            yield np.asarray(times[first:last]), values
+
+
+def _row_range(times, start, end):
+    lo = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+    hi = len(times) if end is None else int(np.searchsorted(times, end, side='right'))
+    return lo, max(lo, hi)
+
+
+def count_rows(segments, start=None, end=None):
+    total = 0
+    for _, _, times, _ in segments:
+        lo, hi = _row_range(times, start, end)
+        total += hi - lo
+    return total
+
+
+class CSVWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.file.write(','.join(['time'] + list(columns)) + '\n')
+        self.formats = ['%.3f'] + ['%.10g'] * len(columns)
+
+    def write(self, times, values):
+        np.savetxt(self.file, np.column_stack([times, values]), fmt=self.formats, delimiter=',')
+
+    def close(self):
+        self.file.close()
+
+
+class JSONLWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.columns = list(columns)
+
+    def write(self, times, values):
+        # Only this chunk becomes Python objects; NaN (no reading) becomes null
+        for timestamp, row in zip(times.tolist(), values.tolist()):
+            record = {'time': timestamp}
+            record.update((name, None if value != value else value) for name, value in zip(self.columns, row))
+            self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow export need pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+# Columnar formats: one record batch (and, for Parquet, one row group) per chunk
+class ArrowWriter:
+    def __init__(self, path, columns):
+        self.pa = _import_pyarrow()
+        self.columns = list(columns)
+        self.schema = self.pa.schema(
+            [('time', self.pa.timestamp('us', tz='UTC'))] + [(name, self.pa.float64()) for name in self.columns]
+        )
+        self._open(path)
+
+    def _open(self, path):
+        import pyarrow.ipc
+        self.writer = pyarrow.ipc.new_file(path, self.schema)
+
+    def batch(self, times, values):
+        arrays = [self.pa.array((times * 1e6).astype(np.int64), self.pa.timestamp('us', tz='UTC'))]
+        # from_pandas turns NaN into null
+        arrays += [self.pa.array(values[:, i], from_pandas=True) for i in range(len(self.columns))]
+        return self.pa.record_batch(arrays, schema=self.schema)
+
+    def write(self, times, values):
+        self.writer.write_batch(self.batch(times, values))
+
+    def close(self):
+        self.writer.close()
+
+
+class ParquetWriter(ArrowWriter):
+    def _open(self, path):
+        import pyarrow.parquet
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+
+
+WRITERS = {'csv': CSVWriter, 'jsonl': JSONLWriter, 'parquet': ParquetWriter, 'arrow': ArrowWriter}
+EXTENSIONS = {
+    '.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet',
+    '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow'
+}
+
+
+def format_for(path, format=None):
+    """Export format named by ``format`` or else by the file extension"""
+    format = format or EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if format not in WRITERS:
+        raise ValueError(f"Unknown export format for {path}; use one of {', '.join(WRITERS)}")
+    return format
+
+
+# Runs one export on a background thread. The file appears under its final name
+# only once it is complete; a failed or cancelled export leaves nothing behind.
+class ExportJob:
+    def __init__(self, segments, path, columns=None, start=None, end=None, format=None, chunk_rows=CHUNK_ROWS):
+        self.segments = segments
+        self.path = path
+        self.format = format_for(path, format)
+        if self.format in ('parquet', 'arrow'):
+            # Fail here rather than on the worker thread
+            _import_pyarrow()
+        self.columns = available_columns(segments) if columns is None else list(columns)
+        self.start_time = start
+        self.end_time = end
+        self.chunk_rows = chunk_rows
+        self.total_rows = count_rows(segments, start, end)
+        self.rows_written = 0
+        self.error = None
+        self._cancel = Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def progress(self):
+        return self.rows_written / self.total_rows if self.total_rows else 1.0
+
+    def start(self):
+        self._thread = Thread(target=self.run, name="history-export", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self):
+        partial = self.path + '.partial'
+        writer = None
+        try:
+            writer = WRITERS[self.format](partial, self.columns)
+            for times, values in iter_chunks(self.segments, self.columns, self.start_time, self.end_time,
+                                             self.chunk_rows):
+                if self._cancel.is_set():
+                    break
+                writer.write(times, values)
+                self.rows_written += len(times)
+            writer.close()
+            writer = None
+            if self._cancel.is_set():
+                os.remove(partial)
+            else:
+                os.replace(partial, self.path)
+        except Exception as e:
+            self.error = e
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+            if os.path.exists(partial):
+                os.remove(partial)
+
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_time(text, now=None):
+    """Epoch seconds from "90m" / "7d" (that long ago), an ISO date or time, or epoch seconds"""
+    if text is None:
+        return None
+    now = time.time() if now is None else now
+    if text[-1:] in _UNITS and text[:-1].replace('.', '', 1).isdigit():
+        return now - float(text[:-1]) * _UNITS[text[-1]]
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    # Naive times are local, like the dashboard's clock
+    return datetime.fromisoformat(text).timestamp()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export recorded metrics history")
+    parser.add_argument("output", nargs="?", help="file to write; the extension picks the format")
+    parser.add_argument("--journal", default=DEFAULT_PATH, help="history journal to read")
+    parser.add_argument("--format", choices=sorted(WRITERS), default=None, help="override the extension")
+    parser.add_argument("--since", default=None, help="start: 7d, 12h, 90m ago, an ISO time, or epoch seconds")
+    parser.add_argument("--until", default=None, help="end, in the same forms as --since")
+    parser.add_argument("--columns", default=None, help="comma-separated column globs, e.g. 'cpu,net.*'")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--list-columns", action="store_true", help="print the recorded columns and exit")
+    args = parser.parse_args(argv)
+    if args.output is None and not args.list_columns:
+        parser.error("an output file is required")
+    try:
+        args.since = parse_time(args.since)
+        args.until = parse_time(args.until)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    segments = journal_segments(args.journal)
+    if not segments:
+        print(f"No history journal at {args.journal}", file=sys.stderr)
+        return 1
+    columns = available_columns(segments)
+    if args.list_columns:
+        print("\n".join(columns))
+        return 0
+
+    try:
+        job = ExportJob(segments, args.output, select_columns(columns, args.columns), args.since, args.until,
+                        args.format, args.chunk_rows)
+    except (ValueError, ImportError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    # Run in this thread; the background thread is for the dashboard
+    job.run()
+    if job.error is not None:
+        print(f"Export failed: {job.error}", file=sys.stderr)
+        return 1
+    print(f"Exported {job.rows_written:,} rows x {len(job.columns)} columns to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
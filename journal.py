@@ -0,0 +1,337 @@
+import errno
+import os
+import struct
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".system_monitor", "metrics.journal")
+
+
+def _reserve(f, size):
+    """Extend ``f`` to ``size`` bytes with its blocks allocated"""
+    # A sparse file would only find out the disk is full when a write through the
+    # memory map hits a hole, and that is a SIGBUS rather than an exception
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                raise
+    f.truncate(size)
+
+
+def _lock(path):
+    """Open ``path`` and take an exclusive lock on it without waiting; OSError if it is held"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        os.close(fd)
+        raise OSError(errno.EAGAIN, "Journal is in use by another process", path) from None
+    return fd
+
+
+# Append-only, memory-mapped file of fixed-size records: [timestamp, slot values...].
+# Each slot holds one named series from the record at which the name was assigned
+# (its start) onwards; earlier values in that slot belong to whatever held it before.
+# Series come and go (per-interface and per-device columns) without starting a new
+# file: a new series takes a spare slot or the slot of one that has been retired.
+class MetricJournal:
+    MAGIC = b"OSELJNL1"
+    VERSION = 3
+    # Room for a thousand or so slot names
+    HEADER_SIZE = 65536
+    # Header: magic, version, slot count, record count, length of the slot table
+    HEADER_FORMAT = "<8sIIQI"
+    COUNT_OFFSET = 16
+    # The file grows a day of 1 Hz records at a time
+    GROW_RECORDS = 86400
+    # Free slots reserved whenever the record width is chosen
+    SPARE_SLOTS = 16
+    # Widening stops here, so the slot table always fits in the header and a stream of
+    # short-lived series (container veths) costs a handful of copies, not one per batch
+    MAX_SLOTS = 512
+
+    def __init__(self, path=DEFAULT_PATH, columns=(), max_records=7 * 86400):
+        self.path = path
+        self.max_records = max_records
+        self._header = None
+        self._records = None
+        self._count = None
+        # Series this writer is recording; the other named slots may be reused
+        self._live = set()
+        self._order = (None, None, None)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One writer per journal: the file is replaced on rotation, so the lock lives beside it
+        self._lock_fd = _lock(path + '.lock')
+        try:
+            self._open(columns)
+        except Exception:
+            self._release()
+            raise
+
+    def _open(self, columns):
+        stored = self.read_slots(self.path)
+        if stored is None:
+            # Missing or unreadable: start afresh
+            self._rotate()
+            self._create(tuple(columns))
+        else:
+            self._set_slots(*stored)
+        self._map()
+        self.add_columns(columns)
+
+    def __len__(self):
+        return int(self._count[0])
+
+    @classmethod
+    def read_slots(cls, path):
+        """(slot names, slot starts) stored in a journal file, or None if there is no usable journal;
+        never-used slots are named "" """
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(cls.HEADER_SIZE)
+            magic, version, nslots, _, names_len = struct.unpack_from(cls.HEADER_FORMAT, header)
+            if magic != cls.MAGIC or version not in (2, cls.VERSION):
+                return None
+            start = struct.calcsize(cls.HEADER_FORMAT)
+            table = header[start:start + names_len].decode('utf-8')
+            lines = table.split('\n') if nslots else []
+            if len(lines) != nslots:
+                return None
+            if version == 2:
+                # Version 2 had one column per slot, all from the first record
+                return tuple(lines), [0] * nslots
+            names, starts = zip(*(line.split('\t') for line in lines)) if lines else ((), ())
+            return tuple(names), [int(first) for first in starts]
+        except (OSError, struct.error, UnicodeDecodeError, ValueError):
+            return None
+
+    @classmethod
+    def read_records(cls, path):
+        """(slot names, slot starts, records) of a journal file mapped read-only, or None if
+        there is no usable journal"""
+        stored = cls.read_slots(path)
+        if stored is None:
+            return None
+        columns, starts = stored
+        with open(path, 'rb') as f:
+            count = struct.unpack_from(cls.HEADER_FORMAT, f.read(struct.calcsize(cls.HEADER_FORMAT)))[3]
+        # One record per row: [timestamp, slot values...]
+        width = len(columns) + 1
+        count = min(count, (os.path.getsize(path) - cls.HEADER_SIZE) // (8 * width))
+        if count <= 0:
+            return columns, starts, np.empty((0, width))
+        records = np.memmap(path, dtype='<f8', mode='r', offset=cls.HEADER_SIZE, shape=(count, width))
+        return columns, starts, records
+
+    def _set_slots(self, columns, starts):
+        self.columns = tuple(columns)
+        self.starts = list(starts)
+        self._slot = {name: slot for slot, name in enumerate(self.columns) if name}
+        self.record_size = 8 * (len(self.columns) + 1)
+        self._order = (None, None, None)
+
+    def _header_bytes(self, columns, starts, count):
+        table = '\n'.join(f"{name}\t{first}" for name, first in zip(columns, starts)).encode('utf-8')
+        header = struct.pack(self.HEADER_FORMAT, self.MAGIC, self.VERSION, len(columns), count, len(table)) + table
+        if len(header) > self.HEADER_SIZE:
+            raise ValueError("Too many journal slots to fit in the header")
+        return header.ljust(self.HEADER_SIZE, b'\0')
+
+    def _write_file(self, path, columns, starts, count, capacity):
+        header = self._header_bytes(columns, starts, count)
+        try:
+            with open(path, 'wb') as f:
+                f.write(header)
+                _reserve(f, self.HEADER_SIZE + capacity * 8 * (len(columns) + 1))
+        except OSError:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+    def _create(self, columns):
+        columns = tuple(columns) + ('',) * self.SPARE_SLOTS
+        self._write_file(self.path, columns, [0] * len(columns), 0, self.GROW_RECORDS)
+        self._set_slots(columns, [0] * len(columns))
+
+    def _write_header(self):
+        header = self._header_bytes(self.columns, self.starts, len(self))
+        # Everything but the record count, which appends keep updating
+        self._header[:self.COUNT_OFFSET] = np.frombuffer(header[:self.COUNT_OFFSET], dtype=np.uint8)
+        self._header[self.COUNT_OFFSET + 8:] = np.frombuffer(header[self.COUNT_OFFSET + 8:], dtype=np.uint8)
+        self._header.flush()
+
+    def add_columns(self, names):
+        """Start recording series; new names take a free slot, widening the records if none is left.
+        Once the records are ``MAX_SLOTS`` wide, names beyond the free slots are not recorded."""
+        names = [name for name in dict.fromkeys(names) if name]
+        self._live.update(name for name in names if name in self._slot)
+        names = [name for name in names if name not in self._slot]
+        if not names:
+            return
+        # Never-used slots first, then those of retired series (the oldest assignment first)
+        free = sorted(
+            (slot for slot, name in enumerate(self.columns) if name not in self._live),
+            key=lambda slot: (self.columns[slot] != '', self.starts[slot])
+        )
+        if len(free) < len(names) and len(self.columns) < self.MAX_SLOTS:
+            # Doubling keeps the number of widening copies logarithmic in the width
+            needed = len(self.columns) + len(names) - len(free) + self.SPARE_SLOTS
+            self._widen(min(self.MAX_SLOTS, max(2 * len(self.columns), needed)))
+            return self.add_columns(names)
+        names = names[:len(free)]
+        if not names:
+            return
+
+        columns = list(self.columns)
+        starts = list(self.starts)
+        count = len(self)
+        for name, slot in zip(names, free):
+            columns[slot] = name
+            starts[slot] = count
+        self._header_bytes(columns, starts, count)  # Fails before anything changes
+        self._set_slots(columns, starts)
+        self._live.update(names)
+        self._write_header()
+
+    def remove_columns(self, names):
+        """Stop recording series; their slots keep their data until a new series reuses them"""
+        self._live.difference_update(names)
+
+    def _widen(self, width):
+        # Copy every record into a wider file, so no history is lost when slots run out
+        count = len(self)
+        columns = self.columns + ('',) * (width - len(self.columns))
+        starts = self.starts + [count] * (width - len(self.columns))
+        partial = self.path + '.partial'
+        self._write_file(partial, columns, starts, count, count + self.GROW_RECORDS)
+        if count:
+            wider = np.memmap(partial, dtype='<f8', mode='r+', offset=self.HEADER_SIZE, shape=(count, width + 1))
+            old_width = len(self.columns) + 1
+            for first in range(0, count, self.GROW_RECORDS):
+                last = min(first + self.GROW_RECORDS, count)
+                wider[first:last, :old_width] = self._records[first:last]
+                wider[first:last, old_width:] = np.nan
+            wider.flush()
+            del wider
+        self._unmap()
+        os.replace(partial, self.path)
+        self._set_slots(columns, starts)
+        self._map()
+
+    def _rotate(self):
+        # Keep exactly one previous journal around
+        if os.path.exists(self.path):
+            os.replace(self.path, self.path + '.1')
+
+    def _map(self):
+        capacity = (os.path.getsize(self.path) - self.HEADER_SIZE) // self.record_size
+        self._header = np.memmap(self.path, dtype=np.uint8, mode='r+', shape=(self.HEADER_SIZE,))
+        self._count = self._header[self.COUNT_OFFSET:self.COUNT_OFFSET + 8].view('<u8')
+        self._records = np.memmap(
+            self.path, dtype='<f8', mode='r+', offset=self.HEADER_SIZE,
+            shape=(capacity, len(self.columns) + 1)
+        )
+        # Bring an older header up to this version
+        self._write_header()
+
+    def _unmap(self):
+        self.flush()
+        self._records = None
+        self._count = None
+        self._header = None
+
+    def _grow(self):
+        self._unmap()
+        size = os.path.getsize(self.path)
+        try:
+            with open(self.path, 'r+b') as f:
+                try:
+                    _reserve(f, size + self.GROW_RECORDS * self.record_size)
+                except OSError:
+                    # Leave the journal as it was, readable up to its last record
+                    f.truncate(size)
+                    raise
+        finally:
+            self._map()
+
+    def slots(self, columns):
+        """Slot of each of ``columns``, which must all be recorded"""
+        return np.array([self._slot[name] for name in columns], dtype=np.intp)
+
+    def append(self, timestamp, row, columns=None):
+        """Write one record given ordered like ``columns`` (by default ``self.columns``); values of
+        columns without a slot are dropped"""
+        count = len(self)
+        if count >= self.max_records:
+            # Start a new file holding just the live series
+            self._unmap()
+            self._rotate()
+            self._create(name for name in self.columns if name in self._live)
+            self._map()
+            count = 0
+        elif count >= len(self._records):
+            self._grow()
+
+        # Keep timestamps sorted so they double as the index
+        if count and timestamp < self._records[count - 1, 0]:
+            timestamp = self._records[count - 1, 0]
+        record = self._records[count]
+        record[0] = timestamp
+        if columns is None:
+            record[1:] = row
+        else:
+            # The slot order is only looked up again when the column tuple changes
+            if self._order[0] is not columns:
+                recorded = [i for i, name in enumerate(columns) if name in self._slot]
+                picks = None if len(recorded) == len(columns) else np.array(recorded, dtype=np.intp)
+                self._order = (columns, self.slots([columns[i] for i in recorded]) + 1, picks)
+            _, slots, picks = self._order
+            record[1:] = np.nan
+            record[slots] = row if picks is None else np.asarray(row, dtype=float)[picks]
+        # Publish the record only after it has been fully written
+        self._count[0] = count + 1
+
+    def tail(self, seconds, columns=None):
+        """Timestamps and values of the records from the last ``seconds`` seconds, values ordered
+        like ``columns`` (by default every named slot) and NaN where a series was not recorded"""
+        columns = tuple(name for name in self.columns if name) if columns is None else tuple(columns)
+        count = len(self)
+        times = self._records[:count, 0]
+        start = int(np.searchsorted(times, times[-1] - seconds, side='left')) if count else 0
+        rows = np.full((count - start, len(columns)), np.nan)
+        for i, name in enumerate(columns):
+            slot = self._slot.get(name)
+            if slot is not None:
+                first = max(self.starts[slot], start)
+                rows[first - start:, i] = self._records[first:count, 1 + slot]
+        return times[start:], rows
+
+    def flush(self):
+        if self._records is not None:
+            self._records.flush()
+            self._header.flush()
+
+    def _release(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def close(self):
+        self._unmap()
+        self._release()
@@ -0,0 +1,246 @@
+import os
+from collections import namedtuple
+
+
+# A /proc file opened once and re-read from offset 0 on every tick
+class ProcFile:
+    BUFFER_SIZE = 65536
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def read(self):
+        # pread() rewinds and reads in one syscall; loop only for unusually large files
+        data = os.pread(self.fd, self.BUFFER_SIZE, 0)
+        while len(data) % self.BUFFER_SIZE == 0 and data:
+            chunk = os.pread(self.fd, self.BUFFER_SIZE, len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def open_optional(path):
+    try:
+        return ProcFile(path)
+    except OSError:
+        return None
+
+
+def parse_fields(data, wanted, separator=b' '):
+    """Pick integer fields out of "name value" lines, e.g. /proc/vmstat or /proc/meminfo"""
+    values = {}
+    for line in data.splitlines():
+        name, _, rest = line.partition(separator)
+        if name in wanted:
+            values[name] = int(rest.split()[0])
+            if len(values) == len(wanted):
+                break
+    return values
+
+
+# Linux virtual memory figures; rates are per second, pressure is the PSI avg10 percentage
+VMStats = namedtuple('VMStats', [
+    'committed', 'commit_limit', 'peak_committed', 'page_faults', 'major_faults',
+    'swap_in', 'swap_out', 'pressure_some', 'pressure_full'
+])
+
+
+def read_pressure(proc_file):
+    """(some, full) avg10 percentages from a /proc/pressure file, or (None, None)"""
+    if proc_file is None:
+        return None, None
+    some = full = None
+    for line in proc_file.read().splitlines():
+        kind, _, rest = line.partition(b' ')
+        avg10 = float(rest.split(b' ', 1)[0].partition(b'=')[2])
+        if kind == b'some':
+            some = avg10
+        elif kind == b'full':
+            full = avg10
+    return some, full
+
+
+# Turns parsed /proc/meminfo and /proc/vmstat fields into VMStats; keeps the counter state
+class VMCounters:
+    MEMINFO_FIELDS = {b'Committed_AS', b'CommitLimit'}
+    VMSTAT_FIELDS = {b'pgfault', b'pgmajfault', b'pswpin', b'pswpout'}
+
+    def __init__(self):
+        self.peak_committed = 0
+        self._last = None
+        self._last_time = None
+
+    def update(self, now, meminfo, vmstat, pressure):
+        committed = meminfo.get(b'Committed_AS', 0) * 1024
+        self.peak_committed = max(self.peak_committed, committed)
+
+        counters = tuple(vmstat.get(name, 0) for name in (b'pgfault', b'pgmajfault', b'pswpin', b'pswpout'))
+        rates = (0.0, 0.0, 0.0, 0.0)
+        if self._last is not None and now > self._last_time:
+            elapsed = now - self._last_time
+            rates = tuple(max(0, new - old) / elapsed for new, old in zip(counters, self._last))
+        self._last = counters
+        self._last_time = now
+
+        return VMStats(
+            committed,
+            meminfo.get(b'CommitLimit', 0) * 1024,
+            self.peak_committed,
+            *rates,
+            *pressure
+        )
+
+
+# Virtual memory backend for Linux: /proc/meminfo, /proc/vmstat and PSI
+class LinuxVirtualMemory:
+    def __init__(self):
+        self.meminfo = ProcFile('/proc/meminfo')
+        self.vmstat = ProcFile('/proc/vmstat')
+        # Pressure stall information needs Linux 4.20+ with PSI enabled
+        self.pressure = open_optional('/proc/pressure/memory')
+        self.counters = VMCounters()
+
+    def sample(self, now):
+        return self.counters.update(
+            now,
+            parse_fields(self.meminfo.read(), VMCounters.MEMINFO_FIELDS, b':'),
+            parse_fields(self.vmstat.read(), VMCounters.VMSTAT_FIELDS),
+            read_pressure(self.pressure)
+        )
+
+    def close(self):
+        for proc_file in (self.meminfo, self.vmstat, self.pressure):
+            if proc_file is not None:
+                proc_file.close()
+
+
+# Field layouts of the psutil tuples the dashboard consumes, so either source can feed it
+CPUTimesPercent = namedtuple('CPUTimesPercent', [
+    'user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal', 'guest', 'guest_nice'
+])
+VirtualMemory = namedtuple('VirtualMemory', [
+    'total', 'available', 'percent', 'used', 'free', 'active', 'inactive', 'buffers', 'cached', 'shared', 'slab'
+])
+SwapMemory = namedtuple('SwapMemory', ['total', 'used', 'free', 'percent', 'sin', 'sout'])
+NetIOCounters = namedtuple('NetIOCounters', [
+    'bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv', 'errin', 'errout', 'dropin', 'dropout'
+])
+DiskIOCounters = namedtuple('DiskIOCounters', [
+    'read_count', 'write_count', 'read_bytes', 'write_bytes', 'read_time', 'write_time',
+    'read_merged_count', 'write_merged_count', 'busy_time'
+])
+
+
+def _percent(part, total):
+    return round(part / total * 100, 1) if total > 0 else 0.0
+
+
+# Hot-tick metrics straight from /proc through descriptors opened once, in place of
+# psutil's open/parse/close per call. Same interface as collector.PsutilSource.
+class ProcSource:
+    # /proc/diskstats always counts 512-byte sectors, whatever the device's sector size
+    SECTOR_SIZE = 512
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+    MEMINFO_FIELDS = {
+        b'MemTotal', b'MemFree', b'MemAvailable', b'Buffers', b'Cached', b'SReclaimable',
+        b'Shmem', b'Active', b'Inactive', b'Slab', b'SwapTotal', b'SwapFree'
+    } | VMCounters.MEMINFO_FIELDS
+
+    def __init__(self):
+        self.stat = ProcFile('/proc/stat')
+        self.meminfo = ProcFile('/proc/meminfo')
+        self.vmstat = ProcFile('/proc/vmstat')
+        self.net_dev = ProcFile('/proc/net/dev')
+        self.diskstats = ProcFile('/proc/diskstats')
+        self.pressure = open_optional('/proc/pressure/memory')
+        self.vm_counters = VMCounters()
+        self._last_cpu = None
+
+    def cpu(self):
+        """(overall percent, per-CPU percents, CPUTimesPercent) since the previous call"""
+        # One read of /proc/stat replaces psutil's three; "cpu" comes first, then "cpu0", "cpu1", ...
+        current = []
+        for line in self.stat.read().splitlines():
+            if not line.startswith(b'cpu'):
+                break
+            current.append([int(field) for field in line.split()[1:11]])
+        last = self._last_cpu if self._last_cpu is not None and len(self._last_cpu) == len(current) else current
+        self._last_cpu = current
+
+        percents = []
+        for new, old in zip(current, last):
+            deltas = [max(0, a - b) for a, b in zip(new, old)]
+            # guest and guest_nice are already included in user and nice
+            total = sum(deltas[:8])
+            percents.append(_percent(total - deltas[3] - deltas[4], total))
+        deltas = [max(0, a - b) for a, b in zip(current[0], last[0])]
+        deltas += [0] * (10 - len(deltas))
+        total = sum(deltas[:8])
+        times_percent = CPUTimesPercent(*(_percent(delta, total) for delta in deltas))
+        return percents[0], percents[1:], times_percent
+
+    def memory(self, now):
+        """(VirtualMemory, SwapMemory, VMStats) from one read of meminfo and vmstat"""
+        meminfo = parse_fields(self.meminfo.read(), self.MEMINFO_FIELDS, b':')
+        vmstat = parse_fields(self.vmstat.read(), VMCounters.VMSTAT_FIELDS)
+        kib = {name: value * 1024 for name, value in meminfo.items()}
+
+        # Same arithmetic as psutil, so switching sources does not shift the numbers
+        total = kib.get(b'MemTotal', 0)
+        free = kib.get(b'MemFree', 0)
+        buffers = kib.get(b'Buffers', 0)
+        cached = kib.get(b'Cached', 0) + kib.get(b'SReclaimable', 0)
+        available = kib.get(b'MemAvailable', free + cached)
+        used = total - available
+        virtual = VirtualMemory(
+            total, available, _percent(total - available, total), used, free,
+            kib.get(b'Active', 0), kib.get(b'Inactive', 0), buffers, cached,
+            kib.get(b'Shmem', 0), kib.get(b'Slab', 0)
+        )
+
+        swap_total = kib.get(b'SwapTotal', 0)
+        swap_free = kib.get(b'SwapFree', 0)
+        swap = SwapMemory(
+            swap_total, swap_total - swap_free, swap_free, _percent(swap_total - swap_free, swap_total),
+            vmstat.get(b'pswpin', 0) * self.PAGE_SIZE, vmstat.get(b'pswpout', 0) * self.PAGE_SIZE
+        )
+        return virtual, swap, self.vm_counters.update(now, meminfo, vmstat, read_pressure(self.pressure))
+
+    def net_io_counters(self):
+        """Per-interface counters from /proc/net/dev"""
+        counters = {}
+        # Two header lines, then "  name: rx bytes packets errs drop ... tx bytes packets errs drop ..."
+        for line in self.net_dev.read().splitlines()[2:]:
+            name, _, fields = line.partition(b':')
+            f = fields.split()
+            counters[name.strip().decode()] = NetIOCounters(
+                int(f[8]), int(f[0]), int(f[9]), int(f[1]), int(f[2]), int(f[10]), int(f[3]), int(f[11])
+            )
+        return counters
+
+    def disk_io_counters(self):
+        """Per-device counters from /proc/diskstats"""
+        counters = {}
+        # major minor name reads merged sectors ms writes merged sectors ms in-flight io_ms ...
+        for line in self.diskstats.read().splitlines():
+            f = line.split()
+            if len(f) < 14:
+                # Partition lines on pre-2.6.25 kernels carry only four counters
+                continue
+            counters[f[2].decode()] = DiskIOCounters(
+                int(f[3]), int(f[7]), int(f[5]) * self.SECTOR_SIZE, int(f[9]) * self.SECTOR_SIZE,
+                int(f[6]), int(f[10]), int(f[4]), int(f[8]), int(f[12])
+            )
+        return counters
+
+    def close(self):
+        for proc_file in (self.stat, self.meminfo, self.vmstat, self.net_dev, self.diskstats, self.pressure):
+            if proc_file is not None:
+                proc_file.close()
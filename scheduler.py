@@ -0,0 +1,40 @@
+import time
+
+
+# Fixed-rate ticks on the monotonic clock. Deadlines are origin + n * interval, so the
+# time spent collecting never accumulates into drift the way sleep(interval) does.
+class TickScheduler:
+    def __init__(self, interval, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self.tick = -1
+        # Ticks skipped because a previous one overran by a whole interval or more
+        self.missed = 0
+        # How late the current tick started, in seconds
+        self.lateness = 0.0
+        self._origin = None
+
+    def start(self, origin=None):
+        """Schedule tick 0 at ``origin`` (monotonic seconds, default now)"""
+        self._origin = self.clock() if origin is None else origin
+        self.tick = -1
+        self.missed = 0
+        self.lateness = 0.0
+
+    @property
+    def deadline(self):
+        """Monotonic time the current tick was due"""
+        return self._origin + self.tick * self.interval
+
+    def wait(self, stop_event):
+        """Sleep until the next tick is due; False if ``stop_event`` was set instead"""
+        self.tick += 1
+        now = self.clock()
+        current = int((now - self._origin) // self.interval)
+        if current > self.tick:
+            # Too late for this tick and maybe more: skip to the newest one rather than
+            # firing a burst of back-to-back samples to catch up
+            self.missed += current - self.tick
+            self.tick = current
+        self.lateness = max(0.0, now - self.deadline)
+        return not stop_event.wait(max(0.0, self.deadline - now))
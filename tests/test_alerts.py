@@ -0,0 +1,104 @@
+import math
+
+import pytest
+
+from alerts import AlertEngine, Rule, parse_rule
+from history import HistoryStore
+
+
+def run(engine, values, start=0.0):
+    """Feed one sample per second of ``values`` for column "cpu"; (time, state) of every alert"""
+    alerts = []
+    for i, value in enumerate(values):
+        alerts += [(alert.time, alert.state) for alert in engine.update(start + i, {'cpu': value})]
+    return alerts
+
+
+def test_fires_after_duration():
+    engine = AlertEngine([Rule("high", "cpu", ">", 90, duration=3)])
+    assert run(engine, [95, 95, 95, 95]) == [(3.0, 'firing')]
+
+
+def test_short_breach_does_not_fire():
+    engine = AlertEngine([Rule("high", "cpu", ">", 90, duration=3)])
+    assert run(engine, [95, 95, 50, 95, 95]) == []
+
+
+def test_hysteresis():
+    engine = AlertEngine([Rule("high", "cpu", ">", 90, hysteresis=5)])
+    # Back under the threshold but not by the hysteresis: still firing
+    assert run(engine, [95, 88, 86, 85]) == [(0.0, 'firing'), (3.0, 'resolved')]
+
+
+def test_cooldown():
+    engine = AlertEngine([Rule("high", "cpu", ">", 90, cooldown=10)])
+    alerts = run(engine, [95, 50, 95, 50] + [50] * 8 + [95])
+    assert alerts == [(0.0, 'firing'), (1.0, 'resolved'), (12.0, 'firing')]
+
+
+def test_below_rule():
+    engine = AlertEngine([Rule("low", "cpu", "<", 10, hysteresis=2)])
+    assert run(engine, [5, 11, 13]) == [(0.0, 'firing'), (2.0, 'resolved')]
+
+
+def test_missing_value_keeps_breach_running():
+    engine = AlertEngine([Rule("high", "cpu", ">", 90, duration=3)])
+    assert run(engine, [95, math.nan, 95, 95]) == [(3.0, 'firing')]
+
+
+def test_column_states():
+    engine = AlertEngine([
+        Rule("warn", "cpu", ">", 80),
+        Rule("err", "cpu", ">", 95, severity="error"),
+        Rule("mem", "memory", ">", 90),
+    ])
+    engine.update(0.0, {'cpu': 90, 'memory': 10})
+    assert engine.column_states() == {'cpu': 'warning', 'memory': 'success'}
+    engine.update(1.0, {'cpu': 99, 'memory': 10})
+    assert engine.column_states()['cpu'] == 'error'
+
+
+def primed(values, rule):
+    store = HistoryStore(['cpu'], capacity=60)
+    for i, value in enumerate(values):
+        store.append(float(i), {'cpu': value})
+    engine = AlertEngine([rule])
+    engine.prime(store, now=float(len(values) - 1))
+    return engine
+
+
+def test_prime_picks_up_running_breach():
+    rule = Rule("high", "cpu", ">", 90, duration=5)
+    engine = primed([50, 95, 95, 95], rule)
+    # The breach began at t=1, so it is due at t=6
+    assert run(engine, [95, 95, 95], start=4.0) == [(6.0, 'firing')]
+
+
+def test_prime_matches_update_on_gaps():
+    rule = Rule("high", "cpu", ">", 90, duration=5)
+    values = [50, 95, math.nan, 95, math.nan]
+    live = AlertEngine([rule])
+    run(live, values)
+    engine = primed(values, rule)
+    # The breach began at t=1 in both, so neither fires before t=6
+    assert run(engine, [95], start=5.0) == run(live, [95], start=5.0) == []
+    assert run(engine, [95], start=6.0) == run(live, [95], start=6.0) == [(6.0, 'firing')]
+
+
+def test_prime_ignores_leading_gap():
+    rule = Rule("high", "cpu", ">", 90, duration=5)
+    engine = primed([math.nan, math.nan, 95], rule)
+    # A gap before the breach does not count towards it
+    assert run(engine, [95] * 5, start=3.0) == [(7.0, 'firing')]
+
+
+def test_parse_rule():
+    rule = parse_rule("cpu > 90% for 30s hysteresis 5 cooldown 5m error")
+    assert rule == Rule(rule.name, 'cpu', '>', 90.0, 30.0, 5.0, 300.0, 'error')
+    with pytest.raises(ValueError):
+        parse_rule("cpu >> 90")
+
+
+def test_rejects_unknown_severity():
+    with pytest.raises(ValueError):
+        AlertEngine([Rule("x", "cpu", ">", 1, severity="fatal")])
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+from collector import MonitorStats
+from exporter import render_openmetrics, _label
+from procfs import NetIOCounters, VMStats
+
+
+def sample(vm=None, monitor=None):
+    usage = SimpleNamespace(total=100, used=40, free=60, percent=40.0)
+    return SimpleNamespace(
+        cpu_percent=12.5, cpu_freq=2400.0, core_count=4, thread_count=8,
+        virtual=SimpleNamespace(total=1000, available=600, used=400, percent=40.0),
+        swap=SimpleNamespace(total=200, used=50, free=150, percent=25.0),
+        disk_usage={'/': usage, '/mnt/"odd"': usage},
+        net_pernic={'eth0': NetIOCounters(10, 20, 1, 2, 3, 4, 5, 6)},
+        monitor=monitor or MonitorStats(1.5, 4096, None, None, None, None, 2, 0),
+        vm=vm
+    )
+
+
+def metrics(text):
+    """{sample line name with labels: value} of the rendered exposition"""
+    lines = text.decode('utf-8').splitlines()
+    return dict(line.rsplit(' ', 1) for line in lines if not line.startswith('#'))
+
+
+def test_render_openmetrics():
+    text = render_openmetrics(sample())
+    assert text.endswith(b'# EOF\n')
+    values = metrics(text)
+    assert values['system_cpu_usage_percent'] == '12.5'
+    assert values['system_cpu_frequency_hertz'] == '2400000000.0'
+    assert values['system_memory_bytes{state="used"}'] == '400'
+    assert values['system_disk_bytes{mountpoint="/",state="free"}'] == '60'
+    assert values['system_network_received_bytes_total{interface="eth0"}'] == '20'
+    assert values['system_network_errors_total{interface="eth0"}'] == '7'
+    assert values['system_network_dropped_packets_total{interface="eth0"}'] == '11'
+    assert values['system_monitor_missed_ticks_total'] == '2'
+
+
+def test_every_family_has_type_and_help():
+    lines = render_openmetrics(sample()).decode('utf-8').splitlines()
+    types = [line.split()[2] for line in lines if line.startswith('# TYPE')]
+    helps = [line.split()[2] for line in lines if line.startswith('# HELP')]
+    assert types == helps
+    assert len(set(types)) == len(types)
+    for name in metrics(render_openmetrics(sample())):
+        assert any(name.startswith(family) for family in types)
+
+
+def test_label_values_are_escaped():
+    assert _label('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+    assert 'system_disk_usage_percent{mountpoint="/mnt/\\"odd\\""}' in metrics(render_openmetrics(sample()))
+
+
+def test_optional_families():
+    values = metrics(render_openmetrics(sample()))
+    assert not any(name.startswith('system_monitor_tick_duration') for name in values)
+    assert not any(name.startswith('system_memory_committed') for name in values)
+
+    vm = VMStats(500, 900, 600, 30.0, 10.0, 1.0, 2.0, None, None)
+    monitor = MonitorStats(1.5, 4096, 0.01, 0.05, 0.002, 0.004, 0, 1)
+    values = metrics(render_openmetrics(sample(vm, monitor)))
+    assert values['system_monitor_tick_duration_seconds{quantile="0.99"}'] == '0.05'
+    assert values['system_paging_faults_rate{type="minor"}'] == '20.0'
+    assert values['system_swap_io_pages_rate{direction="out"}'] == '2.0'
+    # No PSI on this kernel, so no pressure family
+    assert not any(name.startswith('system_memory_pressure') for name in values)
+
+    values = metrics(render_openmetrics(sample(vm._replace(pressure_some=1.5, pressure_full=0.5))))
+    assert values['system_memory_pressure_percent{kind="full"}'] == '0.5'
@@ -0,0 +1,124 @@
+import struct
+import zlib
+from collections import namedtuple
+
+import pytest
+
+from collector import NicRates, ProcessRow, Snapshot
+from fleet import Encoder, Decoder, FleetAggregator, decompress, MAX_FRAME
+
+
+def round_trip(value, encoder=None, decoder=None):
+    encoder = encoder or Encoder()
+    decoder = decoder or Decoder()
+    return decoder.decode(encoder.encode(value))
+
+
+def test_round_trip_plain_values():
+    value = {
+        'none': None, 'flags': [True, False], 'int': -2 ** 40, 'big': 2 ** 70, 'float': 1.5,
+        'text': 'héllo', 'nested': {'list': [1, [2, [3]]]}, 1: 'int key'
+    }
+    expected = dict(value, big=float(2 ** 70))
+    assert round_trip(value) == expected
+
+
+def test_known_types_decode_as_local_classes():
+    rates = {'eth0': NicRates(1.0, 2.0, 3.0, 4.0, 0.0, 0.0)}
+    rows = [ProcessRow(1, 'init', 'root', 0.5, 1024, 0.0)]
+    decoded = round_trip([rates, rows])
+    assert decoded == [rates, rows]
+    assert type(decoded[0]['eth0']) is NicRates
+    assert type(decoded[1][0]) is ProcessRow
+
+
+def test_unknown_types_become_namedtuples():
+    Point = namedtuple('Point', ['x', 'y'])
+    decoded = round_trip(Point(1, 2))
+    assert decoded == (1, 2)
+    assert decoded._fields == ('x', 'y')
+
+
+def test_types_are_defined_once_per_connection():
+    Point = namedtuple('Point', ['x', 'y'])
+    encoder, decoder = Encoder(), Decoder()
+    first = encoder.encode(Point(1, 2))
+    second = encoder.encode(Point(3, 4))
+    assert len(second) < len(first)
+    assert decoder.decode(first) == (1, 2)
+    assert decoder.decode(second) == (3, 4)
+    # A fresh decoder has not seen the definition
+    with pytest.raises(ValueError):
+        Decoder().decode(second)
+
+
+def test_numpy_scalars_are_encoded():
+    np = pytest.importorskip('numpy')
+    assert round_trip([np.int64(3), np.float32(0.5)]) == [3, 0.5]
+
+
+def test_rejects_unencodable():
+    with pytest.raises(TypeError):
+        Encoder().encode(object())
+
+
+@pytest.mark.parametrize('payload', [
+    b'',
+    b'X',
+    b'i\x01\x02',
+    b's' + struct.pack('<I', 10) + b'abc',
+    b'l' + struct.pack('<I', 1000),
+    b'm' + struct.pack('<I', 1) + b'l' + struct.pack('<I', 0) + b'N',
+    b'r' + struct.pack('<I', 0),
+    b'D' + struct.pack('<I', 5) + b's\x01\x00\x00\x00P' + b'l\x00\x00\x00\x00',
+    b'\xff\xfe',
+    b'NN',
+    b's' + struct.pack('<I', 2) + b'\xff\xfe',
+])
+def test_rejects_malformed(payload):
+    with pytest.raises(ValueError):
+        Decoder().decode(payload)
+
+
+def test_rejects_deep_nesting():
+    payload = (b'l' + struct.pack('<I', 1)) * (Decoder.MAX_DEPTH + 2) + b'N'
+    with pytest.raises(ValueError):
+        Decoder().decode(payload)
+
+
+def test_decompress_limits_size():
+    assert decompress(zlib.compress(b'abc')) == b'abc'
+    with pytest.raises(ValueError):
+        decompress(zlib.compress(b'\0' * (MAX_FRAME + 1)))
+
+
+Usage = namedtuple('Usage', ['percent'])
+
+
+def snapshot(time, **fields):
+    values = dict.fromkeys(Snapshot._fields, 0.0)
+    values.update(time=time, virtual=Usage(40.0), disk=Usage(50.0), vm=None, net_rates={}, disk_io={})
+    values.update(fields)
+    return Snapshot(**values)
+
+
+class FakeWriter:
+    def get_extra_info(self, name):
+        return ('192.0.2.1', 50000)
+
+
+def test_aggregator_stores_valid_samples_only():
+    aggregator = FleetAggregator()
+    host = aggregator._connect('web-1', FakeWriter())
+    Other = namedtuple('Snapshot', ['time', 'cpu_percent'])
+    aggregator._receive(host, [snapshot(1.0), Other(2.0, 5.0), snapshot(1.0)])
+    assert (host.received, host.rejected) == (1, 1)
+
+    # A field of the wrong type fails the batch before it becomes the host's latest sample
+    with pytest.raises(TypeError):
+        aggregator._receive(host, [snapshot(3.0, cpu_percent='high')])
+    with pytest.raises(AttributeError):
+        aggregator._receive(host, [snapshot(4.0, virtual=1.0)])
+    assert host.latest.time == 1.0
+    assert len(host.history) == 1
+    assert aggregator.summary()[0].rejected == 1
@@ -0,0 +1,117 @@
+import numpy as np
+
+from history import HistoryStore, RollupTier, TieredHistory
+
+
+def test_store_wraps_around():
+    store = HistoryStore(['a', 'b'], capacity=4)
+    for i in range(10):
+        store.append(float(i), {'a': i, 'b': -i})
+    assert len(store) == 4
+    assert store.times().tolist() == [6, 7, 8, 9]
+    assert store.column('a').tolist() == [6, 7, 8, 9]
+    assert store.column('b', 2).tolist() == [-8, -9]
+    assert store.latest('a') == 9
+    assert store.last_time == 9
+
+
+def test_store_missing_values_are_nan():
+    store = HistoryStore(['a', 'b'], capacity=4)
+    store.append(0.0, {'a': 1})
+    assert np.isnan(store.latest('b'))
+
+
+def test_store_times_never_go_backwards():
+    store = HistoryStore(['a'], capacity=4)
+    store.append(5.0, {'a': 1})
+    store.append(3.0, {'a': 2})
+    assert store.times().tolist() == [5, 5]
+
+
+def test_store_extend_matches_append():
+    appended = HistoryStore(['a', 'b'], capacity=5)
+    extended = HistoryStore(['a', 'b'], capacity=5)
+    rows = [(i, 2 * i) for i in range(8)]
+    appended.append_row(-1.0, (0, 0))
+    extended.append_row(-1.0, (0, 0))
+    for i, row in enumerate(rows):
+        appended.append_row(float(i), row)
+    extended.extend(np.arange(8.0), rows)
+    assert appended.times().tolist() == extended.times().tolist()
+    assert np.array_equal(appended.block(), extended.block())
+
+
+def test_store_window():
+    store = HistoryStore(['a'], capacity=100)
+    for i in range(50):
+        store.append(float(i), {'a': i})
+    times, series = store.window(10)
+    assert times.tolist() == list(range(39, 50))
+    assert series['a'].tolist() == list(range(39, 50))
+
+
+def test_store_add_and_remove_columns():
+    store = HistoryStore(['a'], capacity=4)
+    store.append(0.0, {'a': 1})
+    store.add_columns(['b'])
+    store.append(1.0, {'a': 2, 'b': 3})
+    assert np.isnan(store.column('b')[0]) and store.latest('b') == 3
+    store.remove_columns(['a'])
+    assert store.columns == ('b',)
+    assert store.latest('b') == 3
+
+
+def test_rollup_buckets():
+    tier = RollupTier(['a'], resolution=5, capacity=3)
+    for i in range(30):
+        tier.add(float(i), [i])
+    # Buckets 0-24 closed; only the newest three are kept, bucket 25 is still open
+    assert tier.mean.times().tolist() == [10, 15, 20]
+    assert tier.mean.column('a').tolist() == [12, 17, 22]
+    assert tier.min.column('a').tolist() == [10, 15, 20]
+    assert tier.max.column('a').tolist() == [14, 19, 24]
+    times, series = tier.window(100, ['a'])
+    assert times.tolist() == [10, 15, 20, 25]
+    assert series['a'].tolist() == [12, 17, 22, 27]
+
+
+def test_rollup_extend_matches_add():
+    added = RollupTier(['a', 'b'], resolution=5, capacity=10)
+    extended = RollupTier(['a', 'b'], resolution=5, capacity=10)
+    times = np.arange(0.0, 37.0)
+    rows = np.column_stack([times, np.where(times % 3 == 0, np.nan, times)])
+    for timestamp, row in zip(times, rows):
+        added.add(timestamp, row)
+    extended.extend(times, rows)
+    added.flush()
+    extended.flush()
+    for stat in ('mean', 'min', 'max'):
+        assert np.array_equal(getattr(added, stat).block(), getattr(extended, stat).block(), equal_nan=True)
+
+
+def test_tiered_window_picks_resolution():
+    history = TieredHistory(['a'], capacity=3600, tiers=((5, 100), (60, 100)), max_points=120)
+    for i in range(1000):
+        history.append(float(i), {'a': i})
+    assert len(history.window(100)[0]) == 101  # raw
+    assert len(history.window(500)[0]) <= 102  # 5 s buckets
+    assert len(history.window(3000)[0]) <= 52  # 60 s buckets
+
+
+def test_tiered_expires_quiet_series():
+    history = TieredHistory(['cpu'], capacity=10)
+    history.SERIES_EXPIRY = 100
+    history.append(0.0, {'cpu': 1, 'net.a.rx': 1})
+    history.append(50.0, {'cpu': 1, 'net.b.rx': 1})
+    assert history.columns == ('cpu', 'net.a.rx', 'net.b.rx')
+    # A new series shows up after net.a has been quiet for longer than the expiry
+    history.append(120.0, {'cpu': 1, 'net.b.rx': 1, 'net.c.rx': 1})
+    assert history.columns == ('cpu', 'net.b.rx', 'net.c.rx')
+
+
+def test_tiered_caps_added_series():
+    history = TieredHistory(['cpu'], capacity=10)
+    history.MAX_SERIES = 3
+    for i in range(6):
+        history.append(float(i), {'cpu': 1, f'net.{i}.rx': 1})
+    assert history.columns == ('cpu', 'net.3.rx', 'net.4.rx', 'net.5.rx')
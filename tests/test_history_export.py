@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from history_export import ExportJob, count_rows, iter_chunks, parse_time, select_columns
+
+
+def segment(columns, starts, times, rows):
+    return tuple(columns), list(starts), np.asarray(times, dtype=float), np.asarray(rows, dtype=float)
+
+
+def collect(chunks):
+    chunks = list(chunks)
+    return np.concatenate([t for t, _ in chunks]), np.concatenate([v for _, v in chunks])
+
+
+def test_chunks_cover_the_range():
+    seg = segment(['a', 'b'], [0, 0], range(10), [[i, -i] for i in range(10)])
+    chunks = list(iter_chunks([seg], ['b', 'a'], chunk_rows=4))
+    assert [len(times) for times, _ in chunks] == [4, 4, 2]
+    times, values = collect(chunks)
+    assert times.tolist() == list(range(10))
+    assert values[:, 1].tolist() == list(range(10))
+    assert values[:, 0].tolist() == [-i for i in range(10)]
+
+
+def test_time_range_is_inclusive():
+    seg = segment(['a'], [0], range(10), [[i] for i in range(10)])
+    times, values = collect(iter_chunks([seg], ['a'], start=2.5, end=6))
+    assert times.tolist() == [3, 4, 5, 6]
+    assert count_rows([seg], 2.5, 6) == 4
+    assert list(iter_chunks([seg], ['a'], start=20)) == []
+
+
+def test_rows_before_slot_start_are_masked():
+    # Slot 1 belonged to another series until row 3
+    seg = segment(['a', 'b'], [0, 3], range(6), [[i, 100 + i] for i in range(6)])
+    times, values = collect(iter_chunks([seg], ['a', 'b'], chunk_rows=2))
+    assert np.isnan(values[:3, 1]).all()
+    assert values[3:, 1].tolist() == [103, 104, 105]
+
+
+def test_missing_columns_and_segments():
+    old = segment(['a', ''], [0, 0], [0, 1], [[1, 9], [2, 9]])
+    new = segment(['a', 'b'], [0, 0], [2, 3], [[3, 30], [4, 40]])
+    times, values = collect(iter_chunks([old, new], ['a', 'b', 'c']))
+    assert times.tolist() == [0, 1, 2, 3]
+    assert values[:, 0].tolist() == [1, 2, 3, 4]
+    # An unnamed slot is never exported, and "c" is recorded nowhere
+    assert np.isnan(values[:2, 1]).all() and values[2:, 1].tolist() == [30, 40]
+    assert np.isnan(values[:, 2]).all()
+
+
+def test_select_columns():
+    columns = ['cpu', 'memory', 'net.eth0.rx', 'net.lo.rx']
+    assert select_columns(columns) == columns
+    assert select_columns(columns, 'cpu, net.*') == ['cpu', 'net.eth0.rx', 'net.lo.rx']
+    with pytest.raises(ValueError):
+        select_columns(columns, 'disk.*')
+
+
+def test_parse_time():
+    assert parse_time('90m', now=10000) == 10000 - 5400
+    assert parse_time('1.5h', now=10000) == 10000 - 5400
+    assert parse_time('1700000000') == 1700000000.0
+    assert parse_time(None) is None
+
+
+def test_export_job_writes_csv(tmp_path):
+    seg = segment(['a', 'b'], [0, 1], [0, 1, 2], [[1, 5], [2, 6], [3, 7]])
+    path = str(tmp_path / 'out.csv')
+    job = ExportJob([seg], path, chunk_rows=2)
+    job.run()
+    assert job.error is None and job.progress == 1.0
+    with open(path) as f:
+        assert f.read().splitlines() == ['time,a,b', '0.000,1,nan', '1.000,2,6', '2.000,3,7']
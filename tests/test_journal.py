@@ -0,0 +1,150 @@
+import struct
+
+import numpy as np
+import pytest
+
+from history import open_history
+from journal import MetricJournal
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "metrics.journal")
+
+
+def test_reopen_keeps_records(path):
+    journal = MetricJournal(path, ['a', 'b'])
+    for i in range(5):
+        journal.append(float(i), [i, 2 * i], ('a', 'b'))
+    journal.close()
+
+    journal = MetricJournal(path, ['a', 'b'])
+    assert len(journal) == 5
+    times, rows = journal.tail(2, ['b', 'a'])
+    assert times.tolist() == [2, 3, 4]
+    assert rows.tolist() == [[4, 2], [6, 3], [8, 4]]
+    journal.close()
+
+
+def test_restore_into_history(path):
+    history = open_history(['cpu'], path, capacity=100)
+    for i in range(10):
+        history.append(float(i), {'cpu': i, 'net.eth0.rx': 10 + i})
+    history.journal.close()
+
+    history = open_history(['cpu'], path, capacity=100)
+    assert history.restore(3600) == 10
+    assert history.columns == ('cpu', 'net.eth0.rx')
+    assert history.raw.column('net.eth0.rx').tolist() == list(range(10, 20))
+    history.journal.close()
+
+
+def test_new_columns_keep_earlier_records(path):
+    history = open_history(['cpu'], path, capacity=100)
+    history.append(0.0, {'cpu': 1})
+    history.append(1.0, {'cpu': 2, 'net.a.rx': 1})
+    history.append(2.0, {'cpu': 3, 'net.a.rx': 1, 'net.b.rx': 1})
+    assert len(history.journal) == 3
+    times, rows = history.journal.tail(10, ['cpu', 'net.a.rx', 'net.b.rx'])
+    assert rows[:, 0].tolist() == [1, 2, 3]
+    assert np.isnan(rows[0, 1]) and rows[1, 1] == 1
+    assert np.isnan(rows[1, 2]) and rows[2, 2] == 1
+    history.journal.close()
+
+
+def test_retired_slot_is_reused(path, monkeypatch):
+    monkeypatch.setattr(MetricJournal, 'SPARE_SLOTS', 0)
+    journal = MetricJournal(path, ['a'])
+    journal.add_columns(['x'])
+    width = len(journal.columns)
+    journal.append(0.0, [1, 5], ('a', 'x'))
+    journal.remove_columns(['x'])
+    journal.add_columns(['y'])
+    journal.append(1.0, [2, 7], ('a', 'y'))
+    assert len(journal.columns) == width
+    times, rows = journal.tail(10, ['x', 'y'])
+    # x's reading is gone with its slot; y only has readings from when it took the slot
+    assert np.isnan(rows[:, 0]).all()
+    assert np.isnan(rows[0, 1]) and rows[1, 1] == 7
+    journal.close()
+
+
+def test_widening_keeps_records(path):
+    journal = MetricJournal(path, ['a'])
+    spare = len(journal.columns) - 1
+    for i in range(3):
+        journal.append(float(i), [i], ('a',))
+    names = [f'n{i}' for i in range(spare + 1)]
+    journal.add_columns(names)
+    assert len(journal.columns) > spare + 1
+    journal.append(3.0, list(range(len(names) + 1)), ('a', *names))
+    journal.close()
+
+    columns, starts, records = MetricJournal.read_records(path)
+    slot = columns.index('a') + 1
+    assert records[:, slot].tolist() == [0, 1, 2, 0]
+    assert records[-1, columns.index(names[-1]) + 1] == len(names)
+
+
+def test_widening_doubles_up_to_a_limit(path, monkeypatch):
+    monkeypatch.setattr(MetricJournal, 'SPARE_SLOTS', 2)
+    monkeypatch.setattr(MetricJournal, 'MAX_SLOTS', 12)
+    journal = MetricJournal(path, ['a'])
+    widths = []
+    for i in range(12):
+        journal.add_columns([f'n{i}'])
+        widths.append(len(journal.columns))
+    assert sorted(set(widths)) == [3, 6, 12]
+    assert 'n11' not in journal.columns
+
+    # At the limit a new series takes the oldest retired slot, or goes unrecorded
+    journal.remove_columns(['n0', 'n5'])
+    journal.add_columns(['x', 'y', 'z'])
+    assert len(journal.columns) == 12
+    assert journal.columns.index('x') == 1 and journal.columns.index('y') == 6
+    assert 'z' not in journal.columns
+    journal.append(0.0, [1, 2, 3], ('a', 'z', 'x'))
+    assert journal.tail(10, ['a', 'z', 'x'])[1][0, [0, 2]].tolist() == [1, 3]
+    journal.close()
+
+
+def test_rotation_starts_a_new_file(path):
+    journal = MetricJournal(path, ['a'], max_records=3)
+    for i in range(5):
+        journal.append(float(i), [i], ('a',))
+    assert len(journal) == 2
+    journal.close()
+    assert len(MetricJournal.read_records(path + '.1')[2]) == 3
+
+
+def test_reads_version_2(path):
+    names = b'a\nb'
+    header = struct.pack(MetricJournal.HEADER_FORMAT, MetricJournal.MAGIC, 2, 2, 2, len(names)) + names
+    records = np.array([[0.0, 1, 2], [1.0, 3, 4]])
+    with open(path, 'wb') as f:
+        f.write(header.ljust(MetricJournal.HEADER_SIZE, b'\0'))
+        f.write(records.astype('<f8').tobytes())
+
+    journal = MetricJournal(path, ['a', 'b'])
+    assert len(journal) == 2
+    assert journal.tail(10, ['a', 'b'])[1].tolist() == [[1, 2], [3, 4]]
+    journal.close()
+    assert MetricJournal.read_slots(path) == (('a', 'b'), [0, 0])
+
+
+def test_unreadable_journal_is_set_aside(path):
+    with open(path, 'wb') as f:
+        f.write(b'not a journal')
+    journal = MetricJournal(path, ['a'])
+    assert len(journal) == 0
+    journal.close()
+    with open(path + '.1', 'rb') as f:
+        assert f.read() == b'not a journal'
+
+
+def test_second_writer_is_refused(path):
+    journal = MetricJournal(path, ['a'])
+    with pytest.raises(OSError):
+        MetricJournal(path, ['a'])
+    journal.close()
+    MetricJournal(path, ['a']).close()
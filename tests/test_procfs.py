@@ -0,0 +1,168 @@
+import pytest
+
+import procfs
+from procfs import ProcFile, ProcSource, VMCounters, parse_fields, read_pressure
+
+
+class FakeProcFile:
+    """Stands in for ProcFile; serves the bytes in ``FILES`` and can be rewritten between reads"""
+    FILES = {}
+
+    def __init__(self, path):
+        if path not in self.FILES:
+            raise FileNotFoundError(path)
+        self.path = path
+
+    def read(self):
+        return self.FILES[self.path]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def files(monkeypatch):
+    # No PSI file: like a kernel without pressure stall information
+    paths = ('/proc/stat', '/proc/meminfo', '/proc/vmstat', '/proc/net/dev', '/proc/diskstats')
+    monkeypatch.setattr(FakeProcFile, 'FILES', dict.fromkeys(paths, b''))
+    monkeypatch.setattr(procfs, 'ProcFile', FakeProcFile)
+    return FakeProcFile.FILES
+
+
+MEMINFO = b"""MemTotal:       16000000 kB
+MemFree:         2000000 kB
+MemAvailable:    8000000 kB
+Buffers:          500000 kB
+Cached:          4000000 kB
+SwapCached:            0 kB
+Active:          6000000 kB
+Inactive:        3000000 kB
+SwapTotal:       4000000 kB
+SwapFree:        3000000 kB
+Shmem:            100000 kB
+Slab:             700000 kB
+SReclaimable:     400000 kB
+CommitLimit:    12000000 kB
+Committed_AS:   10000000 kB
+"""
+
+VMSTAT = b"""nr_free_pages 500000
+pgfault 1000
+pgmajfault 10
+pswpin 4
+pswpout 8
+"""
+
+NET_DEV = b"""Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo:    1000      10    0    0    0     0          0         0     1000      10    0    0    0     0       0          0
+  eth0: 5000000    4000    1    2    0     0          0         0   200000    1500    3    4    0     0       0          0
+"""
+
+DISKSTATS = b"""   8       0 sda 100 5 2000 30 50 6 1000 40 0 60 70
+   8       1 sda1 4 8 12 16
+ 259       0 nvme0n1 10 1 80 3 20 2 160 4 0 9 7 0 0 0 0
+"""
+
+
+def stat(*cpus):
+    """/proc/stat text with the aggregate "cpu" line followed by one line per CPU"""
+    lines = [b'cpu  ' + b' '.join(str(v).encode() for v in cpus[0])]
+    lines += [b'cpu%d ' % i + b' '.join(str(v).encode() for v in times) for i, times in enumerate(cpus[1:])]
+    return b'\n'.join(lines + [b'intr 12345', b'ctxt 678']) + b'\n'
+
+
+def test_proc_file_rereads_from_start(tmp_path):
+    path = tmp_path / 'counters'
+    path.write_bytes(b'x' * (ProcFile.BUFFER_SIZE + 10))
+    proc_file = ProcFile(str(path))
+    assert len(proc_file.read()) == ProcFile.BUFFER_SIZE + 10
+    path.write_bytes(b'changed')
+    assert proc_file.read() == b'changed'
+    proc_file.close()
+    proc_file.close()
+
+
+def test_open_optional_missing_file(tmp_path):
+    assert procfs.open_optional(str(tmp_path / 'absent')) is None
+
+
+def test_parse_fields():
+    assert parse_fields(VMSTAT, {b'pgfault', b'pswpout'}) == {b'pgfault': 1000, b'pswpout': 8}
+    assert parse_fields(MEMINFO, {b'MemTotal', b'Nope'}, b':') == {b'MemTotal': 16000000}
+
+
+def test_read_pressure(files):
+    files['/proc/pressure/memory'] = (
+        b"some avg10=1.50 avg60=0.80 avg300=0.20 total=12345\n"
+        b"full avg10=0.25 avg60=0.10 avg300=0.00 total=678\n"
+    )
+    assert read_pressure(FakeProcFile('/proc/pressure/memory')) == (1.5, 0.25)
+    assert read_pressure(None) == (None, None)
+
+
+def test_vm_counters_rates():
+    counters = VMCounters()
+    meminfo = {b'Committed_AS': 100, b'CommitLimit': 200}
+    first = counters.update(10.0, meminfo, {b'pgfault': 1000, b'pgmajfault': 10}, (None, None))
+    assert (first.page_faults, first.major_faults) == (0.0, 0.0)
+    assert (first.committed, first.commit_limit) == (102400, 204800)
+
+    second = counters.update(12.0, {b'Committed_AS': 50}, {b'pgfault': 1400, b'pgmajfault': 4}, (2.0, 1.0))
+    assert second.page_faults == 200.0
+    # A counter that went backwards (reset) gives 0, not a negative rate
+    assert second.major_faults == 0.0
+    assert second.peak_committed == 102400
+    assert (second.pressure_some, second.pressure_full) == (2.0, 1.0)
+
+
+def test_cpu_percent_between_calls(files):
+    files['/proc/stat'] = stat([100, 0, 100, 800, 0, 0, 0, 0, 0, 0], [50, 0, 50, 400, 0, 0, 0, 0, 0, 0],
+                               [50, 0, 50, 400, 0, 0, 0, 0, 0, 0])
+    source = ProcSource()
+    # Nothing to compare the first reading with yet
+    assert source.cpu()[:2] == (0.0, [0.0, 0.0])
+
+    # cpu0 busy for the whole interval, cpu1 idle; iowait counts as idle
+    files['/proc/stat'] = stat([200, 0, 100, 900, 0, 0, 0, 0, 0, 0], [150, 0, 50, 400, 0, 0, 0, 0, 0, 0],
+                               [50, 0, 50, 500, 0, 0, 0, 0, 0, 0])
+    overall, per_cpu, times = source.cpu()
+    assert overall == 50.0 and per_cpu == [100.0, 0.0]
+    assert times.user == 50.0 and times.idle == 50.0 and times.guest == 0.0
+
+
+def test_memory_matches_psutil_arithmetic(files):
+    files['/proc/meminfo'] = MEMINFO
+    files['/proc/vmstat'] = VMSTAT
+    source = ProcSource()
+    virtual, swap, vm = source.memory(0.0)
+    assert virtual.total == 16000000 * 1024
+    assert virtual.available == 8000000 * 1024
+    assert virtual.used == 8000000 * 1024
+    assert virtual.percent == 50.0
+    assert virtual.cached == 4400000 * 1024
+    assert swap.used == 1000000 * 1024 and swap.percent == 25.0
+    assert swap.sin == 4 * ProcSource.PAGE_SIZE
+    assert vm.commit_limit == 12000000 * 1024
+    assert vm.pressure_some is None
+
+
+def test_net_io_counters(files):
+    files['/proc/net/dev'] = NET_DEV
+    counters = ProcSource().net_io_counters()
+    assert set(counters) == {'lo', 'eth0'}
+    eth0 = counters['eth0']
+    assert (eth0.bytes_recv, eth0.bytes_sent) == (5000000, 200000)
+    assert (eth0.packets_recv, eth0.packets_sent) == (4000, 1500)
+    assert (eth0.errin, eth0.errout, eth0.dropin, eth0.dropout) == (1, 3, 2, 4)
+
+
+def test_disk_io_counters(files):
+    files['/proc/diskstats'] = DISKSTATS
+    counters = ProcSource().disk_io_counters()
+    # Short partition lines from old kernels are skipped
+    assert set(counters) == {'sda', 'nvme0n1'}
+    sda = counters['sda']
+    assert (sda.read_count, sda.write_count) == (100, 50)
+    assert (sda.read_bytes, sda.write_bytes) == (2000 * 512, 1000 * 512)
+    assert (sda.read_merged_count, sda.write_merged_count, sda.busy_time) == (5, 6, 60)
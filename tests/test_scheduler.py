@@ -0,0 +1,79 @@
+import pytest
+
+from scheduler import TickScheduler
+
+
+class FakeClock:
+    """Monotonic clock that only moves when told to, or when something waits on it"""
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeEvent:
+    """threading.Event whose wait() advances the fake clock instead of sleeping"""
+    def __init__(self, clock):
+        self.clock = clock
+        self.waits = []
+        self.is_set = False
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+        if not self.is_set:
+            self.clock.now += timeout
+        return self.is_set
+
+
+def test_ticks_follow_the_grid():
+    clock = FakeClock()
+    scheduler = TickScheduler(1.0, clock)
+    scheduler.start()
+    event = FakeEvent(clock)
+    assert scheduler.wait(event)
+    assert (scheduler.tick, scheduler.deadline) == (0, 100.0)
+    for work in (0.3, 0.7, 0.1):
+        # Time spent working is taken off the next sleep, so deadlines do not drift
+        clock.now += work
+        assert scheduler.wait(event)
+    assert scheduler.tick == 3
+    assert clock.now == pytest.approx(103.0) and scheduler.deadline == 103.0
+    assert event.waits[1:] == pytest.approx([0.7, 0.3, 0.9])
+    assert scheduler.missed == 0 and scheduler.lateness == 0.0
+
+
+def test_overrun_skips_missed_ticks():
+    clock = FakeClock()
+    scheduler = TickScheduler(1.0, clock)
+    scheduler.start()
+    event = FakeEvent(clock)
+    scheduler.wait(event)
+    clock.now += 3.5
+    assert scheduler.wait(event)
+    # Ticks 1 and 2 are skipped rather than fired back to back
+    assert (scheduler.tick, scheduler.missed) == (3, 2)
+    assert scheduler.lateness == 0.5
+    assert event.waits[-1] == 0.0
+    assert scheduler.wait(event)
+    assert scheduler.tick == 4 and clock.now == 104.0
+
+
+def test_stop_event_ends_the_wait():
+    clock = FakeClock()
+    scheduler = TickScheduler(1.0, clock)
+    scheduler.start(origin=90.0)
+    event = FakeEvent(clock)
+    event.is_set = True
+    assert not scheduler.wait(event)
+
+
+def test_start_resets_counters():
+    clock = FakeClock()
+    scheduler = TickScheduler(0.5, clock)
+    scheduler.start()
+    clock.now += 10
+    scheduler.wait(FakeEvent(clock))
+    assert scheduler.missed > 0
+    scheduler.start()
+    assert (scheduler.tick, scheduler.missed, scheduler.lateness) == (-1, 0, 0.0)